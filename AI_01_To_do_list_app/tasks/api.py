@@ -0,0 +1,447 @@
+import hashlib
+import json
+from collections import deque
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from functools import wraps
+
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import parse_etags
+from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_http_methods
+
+from .cache import invalidate_task_list, list_version
+from .models import DeletedTask, Task
+from .pagination import InvalidCursor, after_key, decode_cursor, decode_position, encode_cursor, encode_position
+from .views import filter_tasks, toggle_task
+
+# Fields a client can ask for with ?fields=; id is always included
+API_FIELDS = ['id', 'title', 'description', 'completed', 'due_date', 'created_at', 'updated_at']
+
+# Fields a client can set; the others are read-only and ignored when sent
+WRITABLE_FIELDS = ['title', 'description', 'completed', 'due_date']
+
+# Tasks per page of the list (?limit=)
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+# Days deletion tombstones are kept (see the prune_tombstones command); a
+# client that syncs less often than this must reload the whole list
+TOMBSTONE_RETENTION_DAYS = 30
+
+# Rows read from the database cursor at a time while streaming a page
+STREAM_CHUNK_SIZE = 200
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class ApiError(Exception):
+    """A request the API refuses; becomes a JSON {"error": ...} response"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class ApiJSONEncoder(json.JSONEncoder):
+    """Dates and datetimes as full-precision ISO 8601 (updated_at round-trips exactly)"""
+
+    def default(self, o):
+        if isinstance(o, (date, datetime)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def dumps(data):
+    return json.dumps(data, cls=ApiJSONEncoder)
+
+
+def api_view(*methods):
+    """CSRF-exempt JSON endpoint for the given methods that turns ApiError into a response"""
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            try:
+                return view(request, *args, **kwargs)
+            except ApiError as e:
+                return JsonResponse({'error': str(e)}, status=e.status)
+
+        # No CSRF token: every request body must be sent as application/json
+        # (see parse_body), which a cross-site form can't do and a cross-site
+        # script can't without a CORS preflight this app never allows
+        return csrf_exempt(require_http_methods(list(methods))(wrapped))
+    return decorator
+
+
+def parse_fields(request):
+    """
+    The fields a client asked for with ?fields=title,completed (default: all).
+
+    Raises:
+        ApiError: If a field is unknown
+    """
+    value = request.GET.get('fields')
+    if not value:
+        return API_FIELDS
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in API_FIELDS]
+    if unknown:
+        raise ApiError(f"Unknown fields: {', '.join(unknown)}; expected some of {', '.join(API_FIELDS)}")
+    return ['id'] + [name for name in API_FIELDS if name in fields and name != 'id']
+
+
+def parse_limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError("limit must be a number")
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ApiError(f"limit must be between 1 and {MAX_LIMIT}")
+    return limit
+
+
+def parse_body(request):
+    """
+    The JSON object a POST or PATCH sends.
+
+    Raises:
+        ApiError: 415 unless sent as application/json, 400 unless a JSON object
+    """
+    if request.content_type != 'application/json':
+        raise ApiError("The request body must be sent as Content-Type: application/json", status=415)
+    try:
+        data = json.loads(request.body or b'null')
+    except ValueError:
+        raise ApiError("The request body is not valid JSON")
+    if not isinstance(data, dict):
+        raise ApiError("The request body must be a JSON object")
+    return data
+
+
+def parse_task_fields(data, partial):
+    """
+    Validated model field values from a request body.
+
+    Args:
+        data: Decoded JSON object
+        partial: True for PATCH (any subset), False for create (title required)
+
+    Raises:
+        ApiError: For unknown fields or invalid values
+    """
+    unknown = [name for name in data if name not in API_FIELDS]
+    if unknown:
+        raise ApiError(f"Unknown fields: {', '.join(unknown)}")
+
+    changes = {}
+    if 'title' in data or not partial:
+        title = data.get('title')
+        if not isinstance(title, str) or not title.strip():
+            raise ApiError("title must be a non-empty string")
+        if len(title) > Task._meta.get_field('title').max_length:
+            raise ApiError("title is too long")
+        changes['title'] = title.strip()
+    if 'description' in data:
+        if data['description'] is not None and not isinstance(data['description'], str):
+            raise ApiError("description must be a string or null")
+        changes['description'] = data['description']
+    if 'completed' in data:
+        if not isinstance(data['completed'], bool):
+            raise ApiError("completed must be true or false")
+        changes['completed'] = data['completed']
+    if 'due_date' in data:
+        due_date = data['due_date']
+        if due_date is not None:
+            try:
+                due_date = parse_date(due_date) if isinstance(due_date, str) else None
+            except ValueError:
+                due_date = None
+            if due_date is None:
+                raise ApiError("due_date must be YYYY-MM-DD or null")
+        changes['due_date'] = due_date
+    if partial and not changes:
+        raise ApiError(f"Nothing to update; writable fields are {', '.join(WRITABLE_FIELDS)}")
+    return changes
+
+
+def task_data(task, fields=API_FIELDS):
+    return {name: task.pk if name == 'id' else getattr(task, name) for name in fields}
+
+
+def task_etag(task, fields=API_FIELDS):
+    """
+    ETag of one task: its id and updated_at in microseconds.
+
+    Partial representations (?fields=) get a suffix so they don't
+    validate each other; If-Match only looks at the version part.
+    """
+    version = (task.updated_at - EPOCH) // timedelta(microseconds=1)
+    tag = f'{task.pk}-{version}'
+    if fields != API_FIELDS:
+        tag += '-' + hashlib.md5(','.join(fields).encode()).hexdigest()[:8]
+    return f'"{tag}"'
+
+
+def if_match_version(request, pk):
+    """
+    The updated_at an If-Match header requires, or None without one (or for *).
+
+    Raises:
+        ApiError: 412 if the header names another task or no version at all
+    """
+    header = request.headers.get('If-Match')
+    if not header:
+        return None
+    tags = parse_etags(header)
+    if tags == ['*']:
+        return None
+    for tag in tags:
+        parts = tag.removeprefix('W/').strip('"').split('-')
+        if len(parts) >= 2 and parts[0] == str(pk) and parts[1].isdigit():
+            return EPOCH + timedelta(microseconds=int(parts[1]))
+    raise ApiError("If-Match does not match this task", status=412)
+
+
+def task_response(task, status=200, fields=API_FIELDS):
+    response = JsonResponse(task_data(task, fields), encoder=ApiJSONEncoder, status=status)
+    response['ETag'] = task_etag(task, fields)
+    return response
+
+
+def missing_or_conflict(pk, status):
+    """The error for a conditional write that matched no row: 404 if the task is gone"""
+    if not Task.objects.filter(pk=pk).exists():
+        return ApiError(f"Task {pk} not found", status=404)
+    if status == 409:
+        return ApiError("The task's status has changed since it was read", status=409)
+    return ApiError("The task has changed since it was read", status=412)
+
+
+def collection_etag(request):
+    """ETag of a list or sync page: the task list version plus the query (GET only)"""
+    if request.method != 'GET':
+        return None
+    key = f'{list_version()}|{request.get_full_path()}'
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def parse_since(value):
+    """
+    Where a sync resumes: a next_updated_since token, or an ISO 8601 datetime.
+
+    Returns:
+        (timestamp, task id, tombstone id) to continue after
+
+    Raises:
+        ApiError: If the value is neither
+    """
+    try:
+        moment = parse_datetime(value)
+    except ValueError:
+        moment = None
+    if moment is not None:
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment, dt_timezone.utc)
+        return moment, 0, 0
+    try:
+        return decode_position(value, ids=2)
+    except InvalidCursor:
+        pass
+    try:
+        # Tokens from before tombstones were paged only had the task position
+        return *decode_cursor(value), 0
+    except InvalidCursor:
+        raise ApiError("updated_since must be an ISO 8601 datetime or a next_updated_since token")
+
+
+class SyncPage:
+    """
+    One delta sync page: changed tasks and deletions merged in time order.
+
+    Tasks come before tombstones with the same timestamp, and `limit` counts
+    both. next_updated_since records the position in both (timestamp, last
+    task id and last tombstone id at that timestamp), so no page repeats or
+    skips either, however many tasks were deleted since the last sync.
+    """
+
+    def __init__(self, since, tombstones, limit):
+        """
+        Args:
+            since: Position to continue after, from parse_since()
+            tombstones: (deleted_at, id, task_id) of up to limit + 1 tombstones after it
+            limit: Changes per page
+        """
+        self.moment, self.task_pk, self.deleted_pk = since
+        self.tombstones = deque(tombstones)
+        self.limit = limit
+        self.deleted = []
+        self.count = 0
+        self.has_more = False
+
+    def move_to(self, moment):
+        if moment > self.moment:
+            self.moment, self.task_pk, self.deleted_pk = moment, 0, 0
+
+    def take_tombstones(self, before=None):
+        """Add the tombstones older than `before` (all if None) while the page has room"""
+        while self.tombstones and (before is None or self.tombstones[0][0] < before):
+            if self.count == self.limit:
+                self.has_more = True
+                return
+            deleted_at, pk, task_id = self.tombstones.popleft()
+            self.move_to(deleted_at)
+            self.deleted_pk = pk
+            self.deleted.append(task_id)
+            self.count += 1
+
+    def tasks(self, rows):
+        """The tasks of the page, from rows in (updated_at, id) order"""
+        for task in rows:
+            self.take_tombstones(before=task.updated_at)
+            if self.count == self.limit:
+                self.has_more = True
+                return
+            self.move_to(task.updated_at)
+            self.task_pk = task.pk
+            self.count += 1
+            yield task
+        self.take_tombstones()
+
+    def tail(self, last, has_more):
+        # stream_page() has drained tasks() by now; its has_more only counts tasks
+        return {
+            'deleted': self.deleted,
+            'has_more': self.has_more,
+            'next_updated_since': encode_position(self.moment, self.task_pk, self.deleted_pk),
+        }
+
+
+def stream_page(tasks, fields, limit, tail):
+    """
+    Serialize a page of tasks as it is read from the database.
+
+    The page is never held in memory as a whole: rows come from the
+    database cursor STREAM_CHUNK_SIZE at a time and go out one JSON object
+    at a time. `tail(last_task, has_more)` supplies the keys that follow
+    "results" (they depend on the last row, so they come at the end).
+    """
+    yield '{"results": ['
+    count = 0
+    last = None
+    has_more = False
+    for task in tasks:
+        if count == limit:
+            has_more = True
+            break
+        yield (',' if count else '') + dumps(task_data(task, fields))
+        last = task
+        count += 1
+    yield '], ' + dumps(tail(last, has_more))[1:]
+
+
+@api_view('GET', 'POST')
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=collection_etag)
+def task_collection(request):
+    """
+    GET: a page of tasks, newest first, or the changes since updated_since.
+    POST: create a task from a JSON object (title required).
+    """
+    if request.method == 'POST':
+        task = Task.objects.create(**parse_task_fields(parse_body(request), partial=False))
+        response = task_response(task, status=201)
+        response['Location'] = reverse('api_task_detail', args=[task.pk])
+        return response
+
+    fields = parse_fields(request)
+    limit = parse_limit(request)
+    tasks, filters = filter_tasks(Task.objects.all(), request.GET)
+
+    since_value = request.GET.get('updated_since')
+    if since_value:
+        if filters:
+            # A task that stops matching a filter would never be reported as changed
+            raise ApiError("updated_since cannot be combined with filters")
+        since, task_pk, deleted_pk = parse_since(since_value)
+        tombstones = after_key(DeletedTask.objects.order_by('deleted_at', 'id'),
+                               'deleted_at', since, deleted_pk, descending=False)
+        page = SyncPage((since, task_pk, deleted_pk),
+                        tombstones.values_list('deleted_at', 'id', 'task_id')[:limit + 1], limit)
+        tasks = after_key(tasks.only(*fields, 'updated_at').order_by('updated_at', 'id'),
+                          'updated_at', since, task_pk, descending=False)
+        rows = page.tasks(tasks[:limit + 1].iterator(chunk_size=STREAM_CHUNK_SIZE))
+        tail = page.tail
+    else:
+        tasks = tasks.only(*fields, 'created_at').order_by('-created_at', '-id')
+        if request.GET.get('cursor'):
+            try:
+                tasks = after_key(tasks, 'created_at', *decode_cursor(request.GET['cursor']))
+            except InvalidCursor as e:
+                raise ApiError(str(e))
+
+        def tail(last, has_more):
+            return {'has_more': has_more, 'next_cursor': encode_cursor(last) if has_more else None}
+
+        rows = tasks[:limit + 1].iterator(chunk_size=STREAM_CHUNK_SIZE)
+    return StreamingHttpResponse(stream_page(rows, fields, limit, tail), content_type='application/json')
+
+
+@api_view('GET', 'PATCH', 'DELETE')
+@cache_control(private=True, no_cache=True)
+def task_detail(request, pk):
+    """
+    GET: one task (?fields= works as for the list; If-None-Match gives 304).
+    PATCH: change some fields; with If-Match, only if the task is unchanged (else 412).
+    DELETE: delete the task; If-Match works as for PATCH.
+    """
+    if request.method == 'GET':
+        fields = parse_fields(request)
+        task = Task.objects.only(*fields, 'updated_at').filter(pk=pk).first()
+        if task is None:
+            raise ApiError(f"Task {pk} not found", status=404)
+        etag = task_etag(task, fields)
+        # Weak comparison, as If-None-Match requires: W/"..." (e.g. after gzip) matches too
+        tags = [tag.removeprefix('W/') for tag in parse_etags(request.headers.get('If-None-Match', ''))]
+        if etag in tags or tags == ['*']:
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+        return task_response(task, fields=fields)
+
+    tasks = Task.objects.filter(pk=pk)
+    version = if_match_version(request, pk)
+    if version is not None:
+        tasks = tasks.filter(updated_at=version)
+
+    if request.method == 'DELETE':
+        if not tasks.delete(ids=[pk])[0]:
+            raise missing_or_conflict(pk, 412)
+        return HttpResponse(status=204)
+
+    changes = parse_task_fields(parse_body(request), partial=True)
+    # One conditional UPDATE; update() skips auto_now and post_save, so both are done here
+    if not tasks.update(updated_at=timezone.now(), **changes):
+        raise missing_or_conflict(pk, 412)
+    invalidate_task_list()
+    return task_response(Task.objects.get(pk=pk))
+
+
+@api_view('POST')
+def task_toggle(request, pk):
+    """
+    Flip a task's completed flag.
+
+    The body is a JSON object, {} to just flip the flag. Send
+    {"completed": <the value the client has>} to only flip it from that
+    value; if the task already has the other one, the answer is 409.
+    """
+    seen = parse_body(request).get('completed')
+    if seen is not None and not isinstance(seen, bool):
+        raise ApiError("completed must be true or false")
+    if not toggle_task(pk, seen):
+        raise missing_or_conflict(pk, 409)
+    return task_response(Task.objects.get(pk=pk))
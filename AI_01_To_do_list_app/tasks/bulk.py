@@ -0,0 +1,188 @@
+import csv
+import json
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .cache import invalidate_task_list
+from .models import Task
+
+# Most task ids one bulk request may name (below DATA_UPLOAD_MAX_NUMBER_FIELDS)
+MAX_BULK_IDS = 500
+
+# Tasks inserted per bulk_create() call when importing
+IMPORT_BATCH_SIZE = 500
+
+BULK_ACTIONS = ['complete', 'reopen', 'reschedule', 'delete']
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'on'}
+FALSE_VALUES = {'', '0', 'false', 'no', 'n', 'off'}
+
+
+class BulkError(ValueError):
+    """A bulk request that cannot be applied (unknown action, bad ids or date)"""
+
+
+def parse_ids(values):
+    """
+    Task ids from request values, in order and without repeats.
+
+    Raises:
+        BulkError: If an id is not a positive integer, or there are too many
+    """
+    ids = []
+    for value in values:
+        try:
+            pk = int(value)
+        except (TypeError, ValueError):
+            raise BulkError(f"Invalid task id: {value!r}")
+        if pk < 1:
+            raise BulkError(f"Invalid task id: {value!r}")
+        ids.append(pk)
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > MAX_BULK_IDS:
+        raise BulkError(f"At most {MAX_BULK_IDS} tasks per request, got {len(ids)}")
+    return ids
+
+
+def apply_bulk_action(action, ids, due_date=None):
+    """
+    Apply one action to many tasks with a single UPDATE or DELETE.
+
+    Runs in one transaction: one query finds which of the tasks exist, one
+    query changes them all. updated_at is set explicitly, since
+    QuerySet.update() bypasses auto_now.
+
+    Args:
+        action: One of BULK_ACTIONS
+        ids: Task ids (see parse_ids())
+        due_date: New due date for 'reschedule' (None clears it)
+
+    Returns:
+        One {'id': ..., 'status': ...} per id, in the given order; status is
+        'updated', 'deleted' or 'not_found'
+
+    Raises:
+        BulkError: If the action is unknown
+    """
+    if action not in BULK_ACTIONS:
+        raise BulkError(f"Unknown action {action!r}, expected one of {', '.join(BULK_ACTIONS)}")
+
+    with transaction.atomic():
+        tasks = Task.objects.filter(pk__in=ids)
+        # Locks the rows on databases that can, so the statuses stay true
+        found = set(tasks.select_for_update().values_list('pk', flat=True))
+        if action == 'delete':
+            tasks.delete(ids=found)
+            status = 'deleted'
+        else:
+            changes = {
+                'complete': {'completed': True},
+                'reopen': {'completed': False},
+                'reschedule': {'due_date': due_date},
+            }[action]
+            tasks.update(updated_at=timezone.now(), **changes)
+            invalidate_task_list()
+            status = 'updated'
+
+    return [{'id': pk, 'status': status if pk in found else 'not_found'} for pk in ids]
+
+
+def parse_bool(value):
+    """Read a CSV/JSON completed flag ('yes', 'false', 1, True, ...)"""
+    if isinstance(value, bool):
+        return value
+    text = str(value if value is not None else '').strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f"invalid completed value {value!r}")
+
+
+def task_from_row(row):
+    """
+    Build an unsaved Task from an imported row.
+
+    Raises:
+        ValueError: If the row has no title or an invalid field
+    """
+    title = (row.get('title') or '').strip()
+    if not title:
+        raise ValueError("missing title")
+    if len(title) > Task._meta.get_field('title').max_length:
+        raise ValueError("title is too long")
+    due_date = row.get('due_date') or None
+    if due_date is not None:
+        parsed = parse_date(str(due_date))
+        if parsed is None:
+            raise ValueError(f"invalid due_date {due_date!r}")
+        due_date = parsed
+    return Task(
+        title=title,
+        description=row.get('description') or '',
+        completed=parse_bool(row.get('completed')),
+        due_date=due_date,
+    )
+
+
+def read_rows(file, format):
+    """
+    Rows of an import file, read lazily where the format allows it.
+
+    Args:
+        file: Text file object
+        format: 'csv' (with a header row), 'json' (an array of objects) or
+            'jsonl' (one object per line)
+
+    Yields:
+        (line or item number, row dict)
+    """
+    if format == 'csv':
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+    elif format == 'jsonl':
+        for number, line in enumerate(file, start=1):
+            if line.strip():
+                yield number, json.loads(line)
+    elif format == 'json':
+        rows = json.load(file)
+        if not isinstance(rows, list):
+            raise ValueError("a JSON import must be an array of task objects")
+        yield from enumerate(rows, start=1)
+    else:
+        raise ValueError(f"Unknown import format {format!r}, expected csv, json or jsonl")
+
+
+def import_tasks(rows, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Create tasks from (number, row) pairs with one bulk_create() per batch.
+
+    Rows are validated as they are read and only batch_size tasks are held
+    in memory at a time. Invalid rows are skipped and reported; everything
+    is imported in one transaction.
+
+    Returns:
+        (created count, list of (row number, error message))
+    """
+    created = 0
+    errors = []
+    rows = iter(rows)
+    with transaction.atomic():
+        while batch_rows := list(islice(rows, batch_size)):
+            batch = []
+            for number, row in batch_rows:
+                try:
+                    if not isinstance(row, dict):
+                        raise ValueError("not an object")
+                    batch.append(task_from_row(row))
+                except ValueError as e:
+                    errors.append((number, str(e)))
+            Task.objects.bulk_create(batch)
+            created += len(batch)
+        if created:
+            invalidate_task_list()
+    return created, errors
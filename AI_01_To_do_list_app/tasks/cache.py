@@ -0,0 +1,102 @@
+import hashlib
+import uuid
+
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import transaction
+from django.template.loader import get_template
+
+# Names the current state of the task table; replaced on every change
+LIST_VERSION_KEY = 'tasks:list-version'
+
+# Bump when task_row.html changes, so fragments rendered by the old one are not reused
+FRAGMENT_VERSION = 1
+
+# Seconds a rendered task row / a page's row list stays cached. Both are keyed
+# by version, so these only bound memory, never staleness.
+FRAGMENT_TIMEOUT = 24 * 60 * 60
+PAGE_TIMEOUT = 10 * 60
+
+
+def list_version():
+    """The current list version (created on first use)"""
+    version = cache.get(LIST_VERSION_KEY)
+    if version is None:
+        cache.add(LIST_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(LIST_VERSION_KEY)
+    return version
+
+
+def bump_list_version():
+    # A fresh random value rather than incr(): two processes bumping at the
+    # same time can't end up on a version a reader already cached a page under
+    cache.set(LIST_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def invalidate_task_list():
+    """
+    Mark every cached task list page as outdated.
+
+    Called by the post_save signal, by TaskQuerySet.delete() and by code that
+    changes tasks with QuerySet.update() or bulk_create(), which send no signals.
+    Bumps now (seen at once outside transactions and in tests) and again
+    on commit, so a page rendered from the uncommitted state meanwhile is
+    not served afterwards.
+    """
+    bump_list_version()
+    transaction.on_commit(bump_list_version)
+
+
+def page_key(version, request):
+    """Cache key of one task list page: the list version plus the query string"""
+    query = hashlib.md5(request.GET.urlencode().encode()).hexdigest()
+    return f'tasks:page:{version}:{query}'
+
+
+def fragment_key(task):
+    """Cache key of a task's rendered row; a saved change moves updated_at"""
+    return f'tasks:row:{FRAGMENT_VERSION}:{task.pk}:{task.updated_at.timestamp()}'
+
+
+def render_rows(tasks, context):
+    """
+    Rendered task_row.html of every task, reusing cached fragments.
+
+    Returns:
+        (rows, keys): the HTML of each row and the fragment keys, in order
+    """
+    keys = [fragment_key(task) for task in tasks]
+    cached = cache.get_many(keys)
+    missing = {}
+    template = get_template('tasks/task_row.html')
+    rows = []
+    for key, task in zip(keys, tasks):
+        if key not in cached:
+            cached[key] = missing[key] = template.render({'task': task, **context})
+        rows.append(cached[key])
+    if missing:
+        cache.set_many(missing, timeout=FRAGMENT_TIMEOUT)
+    return rows, keys
+
+
+def cached_rows(keys):
+    """The rows for fragment keys, or None if any has been evicted"""
+    cached = cache.get_many(keys)
+    if len(cached) < len(keys):
+        return None
+    return [cached[key] for key in keys]
+
+
+def list_etag(request):
+    """
+    ETag of the task list page a request would get, from the cache alone.
+
+    None while flash messages are waiting to be shown, so the page is
+    rendered and they aren't lost behind a 304. The CSRF secret is part of
+    the tag because the page's forms embed a token derived from it.
+    """
+    if len(get_messages(request)):
+        return None
+    parts = [list_version(), str(FRAGMENT_VERSION), request.get_full_path(),
+             request.META.get('CSRF_COOKIE', '')]
+    return hashlib.md5('|'.join(parts).encode()).hexdigest()
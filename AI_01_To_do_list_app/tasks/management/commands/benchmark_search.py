@@ -0,0 +1,78 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+
+from tasks.models import Task
+from tasks.search import search_tasks
+
+COMMON_WORDS = [
+    'buy', 'call', 'email', 'review', 'report', 'meeting', 'invoice', 'groceries',
+    'plan', 'fix', 'write', 'send', 'book', 'pay', 'clean', 'update', 'prepare',
+    'schedule', 'order', 'check', 'draft', 'budget', 'client', 'team', 'project',
+]
+
+QUERIES = ['report', 'quarterly budget', 'zebra', 'unmatchedword']
+
+
+def like_search(queryset, text):
+    """What the admin did before: LIKE '%word%' on both columns for every word"""
+    for word in text.split():
+        queryset = queryset.filter(Q(title__icontains=word) | Q(description__icontains=word))
+    return queryset.order_by('-created_at', '-id')
+
+
+class Command(BaseCommand):
+    help = "Compare full-text search against LIKE scans on a throwaway database of generated tasks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help="Tasks to generate")
+        parser.add_argument('--repeat', type=int, default=3, help="Timed runs per query (best is kept)")
+
+    def handle(self, *args, rows, repeat, **options):
+        # The test database machinery gives a fresh, migrated database
+        # (in memory on SQLite) and never touches the real one
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.populate(rows)
+            self.stdout.write(f"{'query':<20} {'matches':>8} {'LIKE ms':>10} {'full-text ms':>13}")
+            for text in QUERIES:
+                like_ms, matches = self.time_page(like_search(Task.objects.all(), text), repeat)
+                fts_ms, fts_matches = self.time_page(search_tasks(Task.objects.all(), text), repeat)
+                self.stdout.write(f"{text:<20} {fts_matches:>8} {like_ms:>10.1f} {fts_ms:>13.1f}"
+                                  + ("" if matches == fts_matches else f"  (LIKE: {matches})"))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def populate(self, rows):
+        rng = random.Random(0)
+        start = time.perf_counter()
+        batch = []
+        for i in range(rows):
+            words = rng.choices(COMMON_WORDS, k=3)
+            # A few rare words so some queries are selective
+            if i % 1000 == 0:
+                words.append('zebra')
+            if i % 97 == 0:
+                words += ['quarterly', 'budget']
+            batch.append(Task(
+                title=' '.join(words).capitalize(),
+                description=' '.join(rng.choices(COMMON_WORDS, k=12)),
+            ))
+            if len(batch) == 10_000:
+                Task.objects.bulk_create(batch)
+                batch = []
+        Task.objects.bulk_create(batch)
+        self.stdout.write(f"Generated {rows} tasks in {time.perf_counter() - start:.1f}s")
+
+    def time_page(self, queryset, repeat):
+        """Best time (ms) to count the matches and load the first page, as a list view does"""
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            matches = queryset.count()
+            list(queryset[:50])
+            best = min(best, (time.perf_counter() - start) * 1000)
+        return best, matches
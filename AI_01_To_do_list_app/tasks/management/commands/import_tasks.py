@@ -0,0 +1,36 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.bulk import IMPORT_BATCH_SIZE, import_tasks, read_rows
+
+# Invalid rows listed in the output (the rest are only counted)
+MAX_ERRORS_SHOWN = 20
+
+
+class Command(BaseCommand):
+    help = (
+        "Import tasks from a CSV file (with a title,description,completed,due_date header), "
+        "a JSON array or JSON Lines"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import")
+        parser.add_argument('--format', choices=['csv', 'json', 'jsonl'],
+                            help="File format (default: from the file extension)")
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+                            help="Tasks inserted per query")
+
+    def handle(self, *args, path, format, batch_size, **options):
+        format = format or Path(path).suffix.lstrip('.').lower()
+        try:
+            with open(path, encoding='utf-8', newline='') as file:
+                created, errors = import_tasks(read_rows(file, format), batch_size=batch_size)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for number, message in errors[:MAX_ERRORS_SHOWN]:
+            self.stderr.write(f"Row {number}: {message}")
+        if len(errors) > MAX_ERRORS_SHOWN:
+            self.stderr.write(f"... and {len(errors) - MAX_ERRORS_SHOWN} more invalid rows")
+        self.stdout.write(self.style.SUCCESS(f"Imported {created} tasks, skipped {len(errors)} invalid rows"))
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from tasks.api import TOMBSTONE_RETENTION_DAYS
+from tasks.models import DeletedTask
+
+
+class Command(BaseCommand):
+    help = "Delete the tombstones of tasks deleted more than --days ago (run it daily, e.g. from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=TOMBSTONE_RETENTION_DAYS,
+                            help="Days tombstones are kept")
+
+    def handle(self, *args, days, **options):
+        if days < 1:
+            raise CommandError("--days must be at least 1")
+        cutoff = timezone.now() - timedelta(days=days)
+        pruned, _ = DeletedTask.objects.filter(deleted_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {pruned} tombstones older than {days} days"))
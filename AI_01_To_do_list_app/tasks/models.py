@@ -1,7 +1,38 @@
-from django.db import models
+from django.db import models, transaction
+
+from .cache import invalidate_task_list
+from .search import FullTextField
 
 # Create your models here.
 
+class TaskQuerySet(models.QuerySet):
+    
+    def delete(self, ids=None):
+        """
+        Delete the tasks, leave tombstones for delta sync and invalidate the cached list.
+        
+        Task has no delete signal receivers, so the DELETE stays one
+        statement; the tombstones are one INSERT. Every delete path
+        (Task.delete(), the admin, the API, bulk actions) ends up here.
+        
+        Args:
+            ids: The tasks' ids, if the caller already has them (saves a SELECT)
+        """
+        # No savepoint of its own when called inside a transaction
+        with transaction.atomic(using=self.db, savepoint=False):
+            if ids is None:
+                ids = list(self.values_list('pk', flat=True))
+            result = super().delete()
+            if result[0]:
+                DeletedTask.objects.using(self.db).bulk_create([DeletedTask(task_id=pk) for pk in ids])
+        if result[0]:
+            invalidate_task_list()
+        return result
+    
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
 class Task(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True, null=True)
@@ -10,8 +41,58 @@ class Task(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TaskQuerySet.as_manager()
+    
     def __str__(self):
         return self.title
     
+    def delete(self, using=None, keep_parents=False):
+        """Delete through TaskQuerySet.delete(), so the tombstone and invalidation aren't skipped"""
+        result = Task.objects.using(using or self._state.db).filter(pk=self.pk).delete(ids=[self.pk])
+        self.pk = None
+        return result
+    
+    class Meta:
+        # id breaks ties between tasks created in the same instant, so the
+        # order is total and the task list can paginate on (created_at, id)
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='task_created_id_idx'),
+            models.Index(fields=['completed', '-created_at', '-id'], name='task_completed_created_idx'),
+            models.Index(fields=['due_date'], name='task_due_date_idx'),
+            # Delta sync: tasks changed since a point, oldest change first
+            models.Index(fields=['updated_at', 'id'], name='task_updated_id_idx'),
+        ]
+
+
+class DeletedTask(models.Model):
+    """
+    Tombstone of a deleted task, so delta sync clients learn about the deletion.
+
+    Written by TaskQuerySet.delete() with one INSERT per delete rather than
+    by a post_delete receiver, which would cost queries per deleted row.
+    """
+    task_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    def __str__(self):
+        return f"Task {self.task_id} deleted at {self.deleted_at}"
+
+
+class TaskFts(models.Model):
+    """
+    The tasks_task_fts FTS5 table (SQLite only, created by migration 0004).
+
+    Unmanaged and read-only: triggers keep it in sync with tasks_task. It
+    is a model so search_tasks() can join it without extra(); on_delete is
+    DO_NOTHING so it doesn't stop task deletes from being one statement.
+    """
+    task = models.OneToOneField(
+        Task, primary_key=True, db_column='rowid', db_constraint=False,
+        on_delete=models.DO_NOTHING, related_name='fts_entry',
+    )
+    document = FullTextField(db_column='tasks_task_fts')
+    
     class Meta:
-        ordering = ['-created_at']
+        managed = False
+        db_table = 'tasks_task_fts'
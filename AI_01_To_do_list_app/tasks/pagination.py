@@ -0,0 +1,100 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+
+# Tasks shown per page of the task list
+PAGE_SIZE = 50
+
+
+class InvalidCursor(ValueError):
+    """A cursor that was not produced by encode_cursor()"""
+
+
+def encode_cursor(task, field='created_at'):
+    """Opaque cursor pointing just after `task` in (field, id) order"""
+    return encode_position(getattr(task, field), task.pk)
+
+
+def decode_cursor(cursor):
+    """Return the (timestamp, id) a cursor points after, or raise InvalidCursor"""
+    return decode_position(cursor)
+
+
+def encode_position(moment, *pks):
+    """Opaque token for a (timestamp, id, ...) position"""
+    raw = '|'.join([moment.isoformat(), *map(str, pks)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_position(token, ids=1):
+    """Return the (timestamp, id, ...) of a token with `ids` ids, or raise InvalidCursor"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        moment, *pks = raw.split('|')
+        if len(pks) != ids:
+            raise ValueError(f"expected {ids} ids")
+        return datetime.fromisoformat(moment), *map(int, pks)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursor(f"Invalid cursor: {token!r}") from e
+
+
+def after_key(queryset, field, value, pk, descending=True):
+    """
+    Rows that come after (value, pk) in (field, id) order.
+
+    The plain bound on `field` lets the database seek into an index on
+    (field, id); the OR alone would make it scan from the first row.
+    """
+    if descending:
+        return queryset.filter(**{f'{field}__lte': value}).filter(
+            Q(**{f'{field}__lt': value}) | Q(id__lt=pk)
+        )
+    return queryset.filter(**{f'{field}__gte': value}).filter(
+        Q(**{f'{field}__gt': value}) | Q(id__gt=pk)
+    )
+
+
+def keyset_page(queryset, cursor=None, page_size=PAGE_SIZE):
+    """
+    One page of tasks, newest first, starting after `cursor`.
+
+    Rows are located with a range condition on (created_at, id) instead of
+    OFFSET, so every page costs the same no matter how deep it is, and
+    tasks added meanwhile don't shift later pages. The lookup is backed by
+    the task_created_id_idx index (or task_completed_created_idx when the
+    list is filtered on completion).
+
+    Returns:
+        (tasks, next_cursor); next_cursor is None on the last page
+
+    Raises:
+        InvalidCursor: If the cursor cannot be decoded
+    """
+    queryset = queryset.order_by('-created_at', '-id')
+    if cursor:
+        queryset = after_key(queryset, 'created_at', *decode_cursor(cursor))
+    # One extra row tells whether there is a next page without a COUNT(*)
+    tasks = list(queryset[:page_size + 1])
+    if len(tasks) <= page_size:
+        return tasks, None
+    tasks = tasks[:page_size]
+    return tasks, encode_cursor(tasks[-1])
+
+
+def ranked_page(queryset, page=1, page_size=PAGE_SIZE):
+    """
+    One numbered page of an already ordered queryset (e.g. search results).
+
+    Ranked results have no stable key to seek on, so this uses OFFSET;
+    the database has to rank every match anyway, so deep pages cost little more.
+
+    Returns:
+        (tasks, next_page); next_page is None on the last page
+    """
+    start = (page - 1) * page_size
+    tasks = list(queryset[start:start + page_size + 1])
+    if len(tasks) <= page_size:
+        return tasks, None
+    return tasks[:page_size], page + 1
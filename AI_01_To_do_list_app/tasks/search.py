@@ -0,0 +1,108 @@
+import re
+
+from django.db import connections
+from django.db.models import FloatField, Lookup, Q, TextField, Value
+from django.db.models.expressions import RawSQL
+
+# Relative weight of a match in the title vs the description (SQLite bm25)
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+# Postgres text search configuration
+SEARCH_CONFIG = 'english'
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class FullTextField(TextField):
+    """
+    The hidden column an FTS5 table has under its own name.
+
+    Only there to be filtered on with __match (it holds no data of its own).
+    """
+
+
+@FullTextField.register_lookup
+class Match(Lookup):
+    """field__match=query: an FTS5 MATCH on the joined full-text table"""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+def fts_query(text):
+    """
+    Turn user input into an FTS5 MATCH expression.
+
+    Every word must match (words are quoted, so FTS5 operators and stray
+    quotes in the input are searched for literally instead of raising a
+    syntax error). Returns '' if the input has no words.
+    """
+    return ' '.join(f'"{word}"' for word in WORD_RE.findall(text))
+
+
+def search_vector():
+    """
+    The Postgres tsvector a task is searched by.
+
+    The task_search_vector_idx GIN index (migration 0004) is built from this
+    same expression; Postgres only uses the index for a query whose
+    expression matches it exactly.
+    """
+    from django.contrib.postgres.search import SearchVector
+
+    return SearchVector('title', 'description', config=SEARCH_CONFIG)
+
+
+def search_tasks(queryset, text):
+    """
+    Filter tasks to those matching a full-text search, best matches first.
+
+    On SQLite the query runs against the tasks_task_fts FTS5 table and is
+    ranked with bm25 (title matches weigh TITLE_WEIGHT times as much); on
+    Postgres it uses the task_search_vector_idx GIN index and ts_rank.
+    Other databases fall back to a case-insensitive substring match.
+
+    Every task in the result carries a `search_rank` attribute (higher is
+    better) that the queryset is ordered by; newer tasks win ties.
+
+    Args:
+        queryset: Task queryset to search (filters, .only() etc. are kept)
+        text: What the user typed
+
+    Returns:
+        The filtered queryset (empty if `text` has no words)
+    """
+    if not WORD_RE.search(text):
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField())).none()
+
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        # Joining the FTS table keeps this a single query that composes with
+        # the list filters; the MATCH drives it and each hit is a rowid lookup
+        queryset = queryset.filter(fts_entry__document__match=fts_query(text)).annotate(
+            # bm25() only works in the query that MATCHes, so it is raw SQL
+            # on the joined table (an annotation, so order_by() can use it)
+            search_rank=RawSQL(
+                '-bm25(tasks_task_fts, %s, %s)', (TITLE_WEIGHT, DESCRIPTION_WEIGHT),
+                output_field=FloatField(),
+            )
+        )
+    elif vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        vector = search_vector()
+        query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+        # Filtering on the bare vector expression lets Postgres use the GIN index
+        queryset = queryset.alias(search_vector=vector).filter(search_vector=query).annotate(
+            search_rank=SearchRank(vector, query)
+        )
+    else:
+        for word in WORD_RE.findall(text):
+            queryset = queryset.filter(Q(title__icontains=word) | Q(description__icontains=word))
+        queryset = queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    return queryset.order_by('-search_rank', '-created_at', '-id')
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_task_list
+from .models import Task
+
+
+# No delete receivers: any would make QuerySet.delete() fetch and delete
+# tasks one by one. TaskQuerySet.delete() invalidates the list instead.
+@receiver(post_save, sender=Task)
+def task_changed(sender, **kwargs):
+    """Any saved task outdates the cached task list pages"""
+    invalidate_task_list()
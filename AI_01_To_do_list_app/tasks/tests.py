@@ -1,7 +1,25 @@
-from django.test import TestCase, Client
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from datetime import date, timedelta
-from .models import Task
+from unittest import skipUnless
+from .models import DeletedTask, Task
+import importlib
+import io
+import json
+import os
+import tempfile
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from . import api
+from .bulk import MAX_BULK_IDS, import_tasks, read_rows
+from .cache import fragment_key
+from .pagination import PAGE_SIZE, encode_cursor, decode_cursor
+from .search import fts_query, search_tasks, search_vector
 
 # Create your tests here.
 
@@ -51,6 +69,8 @@ class TaskListViewTest(TestCase):
     """Test the task list view"""
     
     def setUp(self):
+        # Rolled-back test data doesn't bump the list version, so start clean
+        cache.clear()
         self.client = Client()
         self.url = reverse('task_list')
     
@@ -70,6 +90,513 @@ class TaskListViewTest(TestCase):
         self.assertContains(response, "No tasks yet")
 
 
+class TaskListPaginationTest(TestCase):
+    """Test keyset pagination and filters of the task list"""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.url = reverse('task_list')
+    
+    def create_tasks(self, count, **fields):
+        Task.objects.bulk_create([Task(title=f"Task {i}", **fields) for i in range(count)])
+    
+    def collect_pages(self, query=''):
+        """Follow the "Older" links and return the titles of every page"""
+        pages = []
+        url = f"{self.url}?{query}"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([task.title for task in response.context['tasks']])
+            next_query = response.context['next_query']
+            url = f"{self.url}?{next_query}" if next_query else None
+        return pages
+    
+    def test_pages_cover_every_task_once(self):
+        """Test pages hold PAGE_SIZE tasks, newest first, without gaps or repeats"""
+        self.create_tasks(PAGE_SIZE + 5)
+        pages = self.collect_pages()
+        self.assertEqual([len(page) for page in pages], [PAGE_SIZE, 5])
+        titles = [title for page in pages for title in page]
+        self.assertEqual(titles, [task.title for task in Task.objects.all()])
+        self.assertEqual(len(set(titles)), PAGE_SIZE + 5)
+    
+    def test_tasks_created_at_the_same_time_are_not_skipped(self):
+        """Test ties on created_at are broken by id"""
+        self.create_tasks(PAGE_SIZE + 5)
+        Task.objects.update(created_at=timezone.now())
+        titles = [title for page in self.collect_pages() for title in page]
+        self.assertEqual(len(set(titles)), PAGE_SIZE + 5)
+    
+    def test_cursor_round_trip(self):
+        """Test a cursor decodes to the task's (created_at, id)"""
+        task = Task.objects.create(title="Cursor")
+        self.assertEqual(decode_cursor(encode_cursor(task)), (task.created_at, task.pk))
+    
+    def test_invalid_cursor_returns_400(self):
+        """Test a tampered cursor is rejected"""
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_filter_completed(self):
+        """Test completed=1/0 keeps done/open tasks and survives paging"""
+        self.create_tasks(PAGE_SIZE + 1, completed=True)
+        Task.objects.create(title="Open task")
+        pages = self.collect_pages('completed=1')
+        self.assertEqual([len(page) for page in pages], [PAGE_SIZE, 1])
+        self.assertNotIn("Open task", [title for page in pages for title in page])
+        self.assertEqual(self.collect_pages('completed=0'), [["Open task"]])
+    
+    def test_filter_due_date_range(self):
+        """Test due_after/due_before keep tasks due in the inclusive range"""
+        today = date.today()
+        Task.objects.create(title="Past", due_date=today - timedelta(days=1))
+        Task.objects.create(title="Today", due_date=today)
+        Task.objects.create(title="Next week", due_date=today + timedelta(days=7))
+        Task.objects.create(title="No date")
+        response = self.client.get(self.url, {
+            'due_after': today.isoformat(),
+            'due_before': (today + timedelta(days=7)).isoformat(),
+        })
+        titles = [task.title for task in response.context['tasks']]
+        self.assertEqual(titles, ["Next week", "Today"])
+    
+    def test_invalid_filters_are_ignored(self):
+        """Test unparseable filter values show every task"""
+        Task.objects.create(title="Task")
+        response = self.client.get(self.url, {'completed': 'maybe', 'due_after': '2025-13-40'})
+        self.assertContains(response, "Task")
+        self.assertEqual(response.context['filters'], {})
+    
+    def test_no_matching_tasks_message(self):
+        """Test an empty filtered list says so instead of "No tasks yet"."""
+        Task.objects.create(title="Open task")
+        response = self.client.get(self.url, {'completed': '1'})
+        self.assertContains(response, "No tasks match these filters")
+    
+    def test_description_is_not_loaded(self):
+        """Test the list loads a preview of the description, not the column"""
+        Task.objects.create(title="Long", description="x" * 1000)
+        response = self.client.get(self.url)
+        task = response.context['tasks'][0]
+        self.assertIn('description', task.get_deferred_fields())
+        self.assertContains(response, "x" * 299 + "…")
+        self.assertNotContains(response, "x" * 301)
+    
+    @skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN is SQLite syntax")
+    def test_pages_use_the_composite_index(self):
+        """Test the page query walks a (created_at, id) index instead of sorting"""
+        task = Task.objects.create(title="Task")
+        # Which of the two the planner picks for the filtered query depends on statistics
+        for filters in ({}, {'completed': False}):
+            queryset = Task.objects.filter(created_at__lte=task.created_at, **filters).filter(
+                Q(created_at__lt=task.created_at) | Q(id__lt=task.pk)
+            )
+            sql, params = queryset.order_by('-created_at', '-id')[:PAGE_SIZE].query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+                plan = " ".join(str(row[-1]) for row in cursor.fetchall())
+            self.assertRegex(plan, r"task_(created_id|completed_created)_idx")
+            self.assertNotIn("TEMP B-TREE", plan)
+
+
+class TaskSearchTest(TestCase):
+    """Test full-text search of tasks"""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.url = reverse('task_list')
+    
+    def search(self, text, queryset=None):
+        return [task.title for task in search_tasks(queryset or Task.objects.all(), text)]
+    
+    def test_fts_query_quotes_words(self):
+        """Test user input becomes quoted words, so FTS5 syntax is searched literally"""
+        self.assertEqual(fts_query('buy "milk" AND eggs*'), '"buy" "milk" "AND" "eggs"')
+        self.assertEqual(fts_query('!!!'), '')
+    
+    def test_matches_title_and_description(self):
+        """Test every word must appear in the title or the description"""
+        Task.objects.create(title="Buy milk", description="From the corner shop")
+        Task.objects.create(title="Call mom", description="About the shop")
+        Task.objects.create(title="Buy stamps")
+        self.assertEqual(self.search("buy shop"), ["Buy milk"])
+        self.assertEqual(sorted(self.search("shop")), ["Buy milk", "Call mom"])
+    
+    def test_stemming(self):
+        """Test different forms of a word match each other"""
+        Task.objects.create(title="Running errands")
+        self.assertEqual(self.search("errand runs"), ["Running errands"])
+    
+    def test_title_matches_rank_first(self):
+        """Test a match in the title outranks one in the description"""
+        Task.objects.create(title="Call the bank")
+        Task.objects.create(title="Errands", description="Post office, then the bank")
+        self.assertEqual(self.search("bank"), ["Call the bank", "Errands"])
+    
+    def test_index_follows_changes(self):
+        """Test updates, bulk operations and deletes are reflected in the index"""
+        task = Task.objects.create(title="Water plants")
+        task.title = "Feed the cat"
+        task.save()
+        self.assertEqual(self.search("plants"), [])
+        self.assertEqual(self.search("cat"), ["Feed the cat"])
+        
+        Task.objects.filter(pk=task.pk).update(description="And the dog")
+        self.assertEqual(self.search("dog"), ["Feed the cat"])
+        Task.objects.bulk_create([Task(title="Walk the dog")])
+        self.assertEqual(sorted(self.search("dog")), ["Feed the cat", "Walk the dog"])
+        
+        Task.objects.filter(title="Walk the dog").delete()
+        task.delete()
+        self.assertEqual(self.search("dog"), [])
+    
+    def test_search_combines_with_filters(self):
+        """Test search results respect the other list filters"""
+        Task.objects.create(title="Report draft", completed=True)
+        Task.objects.create(title="Report final")
+        response = self.client.get(self.url, {'q': 'report', 'completed': '0'})
+        self.assertEqual([task.title for task in response.context['tasks']], ["Report final"])
+    
+    def test_search_view_pages(self):
+        """Test search results are paged with ?page="""
+        Task.objects.bulk_create([Task(title=f"Invoice {i}") for i in range(PAGE_SIZE + 3)])
+        response = self.client.get(self.url, {'q': 'invoice'})
+        self.assertEqual(len(response.context['tasks']), PAGE_SIZE)
+        self.assertIn('page=2', response.context['next_query'])
+        response = self.client.get(self.url, {'q': 'invoice', 'page': '2'})
+        self.assertEqual(len(response.context['tasks']), 3)
+        self.assertIsNone(response.context['next_query'])
+    
+    def test_search_view_odd_input(self):
+        """Test punctuation-only or operator-like queries don't error"""
+        Task.objects.create(title="Task")
+        for text in ['"', 'AND OR NOT', '***', '(']:
+            response = self.client.get(self.url, {'q': text})
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(self.url, {'q': 'x', 'page': 'two'}).status_code, 400)
+    
+    def test_admin_search(self):
+        """Test the admin search box uses the full-text index and ranks results"""
+        User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.login(username='admin', password='password')
+        Task.objects.create(title="Errands", description="Post office, then the bank")
+        Task.objects.create(title="Call the bank")
+        Task.objects.create(title="Unrelated")
+        response = self.client.get(reverse('admin:tasks_task_changelist'), {'q': 'bank'})
+        self.assertEqual(response.status_code, 200)
+        titles = [task.title for task in response.context['cl'].result_list]
+        self.assertEqual(titles, ["Call the bank", "Errands"])
+        # A column sort wins over the rank
+        response = self.client.get(reverse('admin:tasks_task_changelist'), {'q': 'bank', 'o': '-1'})
+        titles = [task.title for task in response.context['cl'].result_list]
+        self.assertEqual(titles, ["Errands", "Call the bank"])
+    
+    def test_postgres_index_matches_query_expression(self):
+        """Test the GIN index is built on the exact expression Postgres searches by"""
+        migration = importlib.import_module('tasks.migrations.0004_task_search')
+        self.assertEqual(migration.search_index().expressions, (search_vector(),))
+
+
+class TaskBulkViewTest(TestCase):
+    """Test the bulk complete/reopen/reschedule/delete endpoint"""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.url = reverse('task_bulk')
+        Task.objects.bulk_create([Task(title=f"Task {i}") for i in range(5)])
+        self.ids = list(Task.objects.order_by('id').values_list('id', flat=True))
+    
+    def post(self, **data):
+        return self.client.post(self.url, data)
+    
+    def test_complete_many_in_constant_queries(self):
+        """Test completing tasks costs the same queries for 5 tasks as for 1"""
+        # SAVEPOINT, SELECT ids, UPDATE, RELEASE SAVEPOINT
+        with self.assertNumQueries(4):
+            response = self.post(action='complete', ids=self.ids)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['changed'], 5)
+        self.assertEqual(Task.objects.filter(completed=True).count(), 5)
+    
+    def test_per_item_results(self):
+        """Test every requested id gets a status, in request order"""
+        response = self.post(action='complete', ids=[self.ids[1], 9999, self.ids[0]])
+        self.assertEqual(response.json()['results'], [
+            {'id': self.ids[1], 'status': 'updated'},
+            {'id': 9999, 'status': 'not_found'},
+            {'id': self.ids[0], 'status': 'updated'},
+        ])
+        self.assertEqual(Task.objects.filter(completed=True).count(), 2)
+    
+    def test_reopen_bumps_updated_at(self):
+        """Test bulk changes set updated_at although update() skips auto_now"""
+        Task.objects.update(completed=True, updated_at=timezone.now() - timedelta(days=1))
+        self.post(action='reopen', ids=self.ids[:2])
+        reopened = Task.objects.filter(completed=False)
+        self.assertEqual(reopened.count(), 2)
+        for task in reopened:
+            self.assertGreater(task.updated_at, timezone.now() - timedelta(minutes=1))
+    
+    def test_reschedule_and_clear(self):
+        """Test reschedule sets the due date, or clears it when empty"""
+        self.post(action='reschedule', ids=self.ids[:3], due_date='2026-03-01')
+        self.assertEqual(Task.objects.filter(due_date=date(2026, 3, 1)).count(), 3)
+        self.post(action='reschedule', ids=self.ids[:1], due_date='')
+        self.assertEqual(Task.objects.filter(due_date__isnull=False).count(), 2)
+    
+    def test_delete_many(self):
+        """Test delete removes the selected tasks only, in constant queries"""
+        # SAVEPOINT, SELECT ids, DELETE, INSERT tombstones, RELEASE SAVEPOINT
+        with self.assertNumQueries(5):
+            response = self.post(action='delete', ids=self.ids[:4])
+        self.assertEqual([r['status'] for r in response.json()['results']], ['deleted'] * 4)
+        self.assertEqual(list(Task.objects.values_list('id', flat=True)), self.ids[4:])
+        self.assertEqual(sorted(DeletedTask.objects.values_list('task_id', flat=True)), self.ids[:4])
+    
+    def test_invalid_requests_return_400(self):
+        """Test unknown actions, bad ids and bad dates are rejected without changes"""
+        for data in ({'action': 'archive', 'ids': self.ids},
+                     {'action': 'complete', 'ids': ['abc']},
+                     {'action': 'complete', 'ids': list(range(1, MAX_BULK_IDS + 2))},
+                     {'action': 'reschedule', 'ids': self.ids, 'due_date': '2026-02-30'}):
+            response = self.post(**data)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('error', response.json())
+        self.assertFalse(Task.objects.filter(completed=True).exists())
+    
+    def test_get_not_allowed(self):
+        """Test the endpoint only accepts POST"""
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+    
+    def test_form_redirects_back_with_message(self):
+        """Test the task list form is sent back to the list with a summary"""
+        response = self.post(action='complete', ids=self.ids[:2], next='/?completed=0')
+        self.assertRedirects(response, '/?completed=0', fetch_redirect_response=False)
+        response = self.client.get('/')
+        self.assertContains(response, "Complete: 2 of 2 selected tasks")
+    
+    def test_form_ignores_offsite_next(self):
+        """Test next cannot redirect to another site"""
+        response = self.post(action='complete', ids=self.ids[:1], next='https://example.com/')
+        self.assertRedirects(response, reverse('task_list'))
+
+
+class TaskAdminActionTest(TestCase):
+    """Test the bulk admin actions"""
+    
+    def setUp(self):
+        self.client = Client()
+        User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.login(username='admin', password='password')
+        self.url = reverse('admin:tasks_task_changelist')
+    
+    def run_action(self, action, tasks):
+        return self.client.post(self.url, {
+            'action': action,
+            '_selected_action': [task.pk for task in tasks],
+        })
+    
+    def test_mark_completed_and_open(self):
+        """Test completion actions change only the selected tasks"""
+        tasks = [Task.objects.create(title=f"Task {i}") for i in range(3)]
+        response = self.run_action('mark_completed', tasks[:2])
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Task.objects.filter(completed=True).count(), 2)
+        self.run_action('mark_open', tasks[:1])
+        self.assertEqual(Task.objects.filter(completed=True).count(), 1)
+    
+    def test_postpone_and_clear_due_date(self):
+        """Test due-date actions shift or clear the selected due dates"""
+        dated = Task.objects.create(title="Dated", due_date=date(2026, 1, 28))
+        undated = Task.objects.create(title="Undated")
+        self.run_action('postpone_week', [dated, undated])
+        dated.refresh_from_db()
+        undated.refresh_from_db()
+        self.assertEqual(dated.due_date, date(2026, 2, 4))
+        self.assertIsNone(undated.due_date)
+        self.run_action('clear_due_date', [dated])
+        dated.refresh_from_db()
+        self.assertIsNone(dated.due_date)
+
+
+class TaskImportTest(TestCase):
+    """Test bulk import from CSV and JSON"""
+    
+    CSV = (
+        "title,description,completed,due_date\n"
+        "Buy milk,,no,2026-01-05\n"
+        ",missing title,no,\n"
+        "Pay rent,Monthly,yes,\n"
+        "Bad date,,no,05/01/2026\n"
+        "Call mom,,,\n"
+    )
+    
+    def test_csv_import_skips_invalid_rows(self):
+        """Test valid rows are created and invalid ones reported by line"""
+        created, errors = import_tasks(read_rows(io.StringIO(self.CSV), 'csv'))
+        self.assertEqual(created, 3)
+        self.assertEqual([number for number, _ in errors], [3, 5])
+        rent = Task.objects.get(title="Pay rent")
+        self.assertTrue(rent.completed)
+        self.assertEqual(rent.description, "Monthly")
+        self.assertEqual(Task.objects.get(title="Buy milk").due_date, date(2026, 1, 5))
+    
+    def test_import_batches(self):
+        """Test rows are inserted with one query per batch"""
+        rows = [(i, {'title': f"Task {i}"}) for i in range(5)]
+        # SAVEPOINT, 3 INSERTs of at most 2 rows, RELEASE SAVEPOINT
+        with self.assertNumQueries(5):
+            created, errors = import_tasks(rows, batch_size=2)
+        self.assertEqual((created, errors), (5, []))
+    
+    def test_json_and_jsonl(self):
+        """Test JSON arrays and JSON Lines are both read"""
+        tasks = [{'title': "One", 'completed': True}, {'title': "Two", 'due_date': "2026-02-01"}]
+        import_tasks(read_rows(io.StringIO(json.dumps(tasks)), 'json'))
+        lines = "\n".join(json.dumps(task) for task in tasks) + "\n"
+        import_tasks(read_rows(io.StringIO(lines), 'jsonl'))
+        self.assertEqual(Task.objects.filter(title="One", completed=True).count(), 2)
+        self.assertEqual(Task.objects.filter(due_date=date(2026, 2, 1)).count(), 2)
+    
+    def test_import_command(self):
+        """Test the import_tasks management command"""
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write(self.CSV)
+        try:
+            out, err = io.StringIO(), io.StringIO()
+            call_command('import_tasks', f.name, stdout=out, stderr=err)
+        finally:
+            os.remove(f.name)
+        self.assertIn("Imported 3 tasks, skipped 2 invalid rows", out.getvalue())
+        self.assertIn("Row 3: missing title", err.getvalue())
+    
+    def test_malformed_file_imports_nothing(self):
+        """Test a JSON Lines file with a broken line is rolled back"""
+        lines = '{"title": "One"}\n{"title": \n'
+        with self.assertRaises(ValueError):
+            import_tasks(read_rows(io.StringIO(lines), 'jsonl'), batch_size=1)
+        self.assertEqual(Task.objects.count(), 0)
+
+
+class TaskListCacheTest(TestCase):
+    """Test the cached task list: row fragments, page cache, ETag/304 and invalidation"""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.url = reverse('task_list')
+        self.task = Task.objects.create(title="Cached task")
+        self.other = Task.objects.create(title="Other task")
+    
+    def test_repeat_visit_is_served_from_cache(self):
+        """Test an unchanged page is rendered without querying the database"""
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(first.content.count(b'Cached task'), second.content.count(b'Cached task'))
+        self.assertNotIn('tasks', second.context)
+    
+    def test_if_none_match_returns_304(self):
+        """Test a client with the current ETag gets a 304 without a database query"""
+        self.client.get(self.url)  # the first visit sets the CSRF cookie, which is part of the ETag
+        response = self.client.get(self.url)
+        self.assertIn('ETag', response)
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertIn('private', response['Cache-Control'])
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+    
+    def test_etag_depends_on_query_string(self):
+        """Test each page and filter has its own ETag"""
+        etag = self.client.get(self.url)['ETag']
+        self.assertNotEqual(self.client.get(self.url, {'completed': '1'})['ETag'], etag)
+    
+    def test_changes_invalidate_the_page(self):
+        """Test creating, toggling, editing and deleting all show up immediately"""
+        etag = self.client.get(self.url)['ETag']
+        self.client.post(reverse('task_create'), {'title': 'Brand new'})
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, "Brand new")
+        
+        self.client.post(reverse('task_toggle', args=[self.task.pk]), {'completed': '0'})
+        self.assertContains(self.client.get(self.url), "Mark Incomplete")
+        
+        self.client.post(reverse('task_update', args=[self.task.pk]), {'title': 'Renamed'})
+        self.assertContains(self.client.get(self.url), "Renamed")
+        
+        self.client.post(reverse('task_delete', args=[self.other.pk]))
+        self.assertNotContains(self.client.get(self.url), "Other task")
+    
+    def test_bulk_changes_invalidate_the_page(self):
+        """Test update()/bulk_create() paths, which send no signals, invalidate too"""
+        self.client.get(self.url)
+        self.client.post(reverse('task_bulk'), {'action': 'complete', 'ids': [self.task.pk]})
+        self.assertContains(self.client.get(self.url), "Mark Incomplete")
+        import_tasks([(1, {'title': 'Imported'})])
+        self.assertContains(self.client.get(self.url), "Imported")
+    
+    def test_plain_deletes_invalidate_and_leave_tombstones(self):
+        """Test Task.delete() and QuerySet.delete() outside the views invalidate too"""
+        etag = self.client.get(self.url)['ETag']
+        task_id = self.task.pk
+        self.task.delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, "Cached task")
+        
+        Task.objects.filter(title="Other task").delete()
+        self.assertNotContains(self.client.get(self.url), "Other task")
+        self.assertEqual(sorted(DeletedTask.objects.values_list('task_id', flat=True)),
+                         sorted([task_id, self.other.pk]))
+    
+    def test_only_changed_rows_are_rerendered(self):
+        """Test a change re-renders that task's row and reuses the others"""
+        self.client.get(self.url)
+        other_key = fragment_key(self.other)
+        cached_other = cache.get(other_key)
+        self.assertIsNotNone(cached_other)
+        
+        old_key = fragment_key(self.task)
+        self.client.post(reverse('task_toggle', args=[self.task.pk]), {'completed': '0'})
+        self.client.get(self.url)
+        self.task.refresh_from_db()
+        self.assertNotEqual(fragment_key(self.task), old_key)
+        self.assertIsNotNone(cache.get(fragment_key(self.task)))
+        self.assertEqual(cache.get(other_key), cached_other)
+    
+    def test_pending_messages_skip_the_etag(self):
+        """Test a page with a flash message is rendered, not answered with 304"""
+        etag = self.client.get(self.url)['ETag']
+        self.client.post(reverse('task_bulk'), {'action': 'complete', 'ids': [9999], 'next': self.url})
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "0 of 1 selected tasks")
+    
+    def test_rows_hold_no_csrf_token(self):
+        """Test the cached fragments can be shared between users"""
+        self.client.get(self.url)
+        self.assertNotIn('csrfmiddlewaretoken', cache.get(fragment_key(self.task)))
+    
+    def test_file_based_cache(self):
+        """Test the cache works with the file backend, no external server needed"""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            backend = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': cache_dir}
+            with override_settings(CACHES={'default': backend}):
+                self.client.get(self.url)
+                etag = self.client.get(self.url)['ETag']
+                with self.assertNumQueries(0):
+                    response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.client.post(reverse('task_create'), {'title': 'Filed'})
+                self.assertContains(self.client.get(self.url), "Filed")
+
+
 class TaskCreateViewTest(TestCase):
     """Test the task create view"""
     
@@ -152,6 +679,96 @@ class TaskUpdateViewTest(TestCase):
         self.assertEqual(response.status_code, 404)
 
 
+class TaskConcurrentUpdateTest(TestCase):
+    """Test single-query toggle/update and conflict detection"""
+    
+    def setUp(self):
+        self.client = Client()
+        self.task = Task.objects.create(title="Shared task", description="Original")
+        self.toggle_url = reverse('task_toggle', args=[self.task.pk])
+        self.update_url = reverse('task_update', args=[self.task.pk])
+    
+    def update_data(self, **overrides):
+        data = {
+            'title': 'Edited',
+            'description': 'Edited description',
+            'due_date': '',
+            'version': self.task.updated_at.isoformat(),
+        }
+        data.update(overrides)
+        return data
+    
+    def test_toggle_is_one_query(self):
+        """Test a toggle issues a single UPDATE"""
+        with self.assertNumQueries(1):
+            response = self.client.post(self.toggle_url, {'completed': '0'})
+        self.assertEqual(response.status_code, 302)
+        with self.assertNumQueries(1):
+            self.client.post(self.toggle_url)
+        self.task.refresh_from_db()
+        self.assertFalse(self.task.completed)
+    
+    def test_toggle_conflict_returns_409(self):
+        """Test a second "Mark Complete" click on an already completed task changes nothing"""
+        self.client.post(self.toggle_url, {'completed': '0'})
+        response = self.client.post(self.toggle_url, {'completed': '0'})
+        self.assertEqual(response.status_code, 409)
+        self.assertContains(response, "already marked complete", status_code=409)
+        self.task.refresh_from_db()
+        self.assertTrue(self.task.completed)
+    
+    def test_toggle_bumps_updated_at(self):
+        """Test the single UPDATE still moves updated_at"""
+        before = self.task.updated_at
+        self.client.post(self.toggle_url, {'completed': '0'})
+        self.task.refresh_from_db()
+        self.assertGreater(self.task.updated_at, before)
+    
+    def test_update_is_one_query(self):
+        """Test saving the edit form issues a single UPDATE"""
+        with self.assertNumQueries(1):
+            response = self.client.post(self.update_url, self.update_data())
+        self.assertEqual(response.status_code, 302)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.title, 'Edited')
+    
+    def test_update_form_carries_version(self):
+        """Test the edit form includes the task's updated_at"""
+        response = self.client.get(self.update_url)
+        self.assertContains(response, f'name="version" value="{self.task.updated_at.isoformat()}"')
+    
+    def test_stale_update_returns_409_and_keeps_edits(self):
+        """Test an edit based on an old version is refused, with the edits kept in the form"""
+        stale = self.update_data(title='Mine')
+        self.client.post(self.toggle_url)  # someone else changes the task meanwhile
+        response = self.client.post(self.update_url, stale)
+        self.assertEqual(response.status_code, 409)
+        self.assertContains(response, "changed by someone else", status_code=409)
+        self.assertContains(response, 'value="Mine"', status_code=409)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.title, "Shared task")
+        self.assertTrue(self.task.completed)
+        
+        # Saving again uses the new version and overwrites
+        response = self.client.post(self.update_url, self.update_data(
+            title='Mine', version=response.context['task'].updated_at.isoformat()
+        ))
+        self.assertEqual(response.status_code, 302)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.title, "Mine")
+    
+    def test_update_without_version_overwrites(self):
+        """Test clients that send no version keep the old last-write-wins behaviour"""
+        self.client.post(self.toggle_url)
+        response = self.client.post(self.update_url, self.update_data(version=''))
+        self.assertEqual(response.status_code, 302)
+    
+    def test_update_missing_task_returns_404(self):
+        """Test a POST for a deleted task is a 404, not a conflict"""
+        url = reverse('task_update', args=[9999])
+        self.assertEqual(self.client.post(url, self.update_data()).status_code, 404)
+
+
 class TaskDeleteViewTest(TestCase):
     """Test the task delete view"""
     
@@ -168,10 +785,11 @@ class TaskDeleteViewTest(TestCase):
         self.assertContains(response, "Task to Delete")
     
     def test_task_delete_post_deletes_task(self):
-        """Test POST deletes task"""
+        """Test POST deletes task and leaves a tombstone"""
         response = self.client.post(self.url)
         self.assertEqual(response.status_code, 302)
         self.assertEqual(Task.objects.count(), 0)
+        self.assertEqual(list(DeletedTask.objects.values_list('task_id', flat=True)), [self.task.pk])
     
     def test_task_delete_nonexistent_task_returns_404(self):
         """Test deleting non-existent task returns 404"""
@@ -212,6 +830,257 @@ class TaskToggleViewTest(TestCase):
         self.assertEqual(response.status_code, 404)
 
 
+class TaskApiTest(TestCase):
+    """Test the JSON API: CRUD, projection, cursor pages, delta sync and conditional requests"""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.url = reverse('api_task_list')
+        now = timezone.now()
+        for i in range(5):
+            task = Task.objects.create(title=f"Task {i}", description="Long text " * 50)
+            # auto_now_add ignores a given created_at, so set it afterwards
+            Task.objects.filter(pk=task.pk).update(created_at=now - timedelta(minutes=i))
+        self.task = Task.objects.get(title="Task 0")
+        self.detail_url = reverse('api_task_detail', args=[self.task.pk])
+    
+    def get_json(self, url, params=None, **headers):
+        response = self.client.get(url, params or {}, **headers)
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, json.loads(content) if content else None
+    
+    def send(self, method, url, data=None, **headers):
+        body = json.dumps(data) if data is not None else ''
+        return getattr(self.client, method)(url, body, content_type='application/json', **headers)
+    
+    def test_list_streams_newest_first(self):
+        """Test the list is a streamed JSON page in (-created_at, -id) order"""
+        response, data = self.get_json(self.url)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual([task['title'] for task in data['results']], [f"Task {i}" for i in range(5)])
+        self.assertFalse(data['has_more'])
+        self.assertIsNone(data['next_cursor'])
+    
+    def test_cursor_pagination(self):
+        """Test following next_cursor visits every task exactly once"""
+        titles = []
+        params = {'limit': 2}
+        while True:
+            response, data = self.get_json(self.url, params)
+            titles += [task['title'] for task in data['results']]
+            if not data['has_more']:
+                break
+            params['cursor'] = data['next_cursor']
+        self.assertEqual(titles, [f"Task {i}" for i in range(5)])
+    
+    def test_invalid_parameters_return_400(self):
+        """Test bad limits, cursors and fields are JSON errors"""
+        for params in ({'limit': '0'}, {'limit': 'x'}, {'cursor': 'garbage'}, {'fields': 'title,secret'},
+                       {'updated_since': 'yesterday'}, {'updated_since': '2024-01-01T00:00:00Z', 'completed': '1'}):
+            response, data = self.get_json(self.url, params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', data)
+    
+    def test_fields_projection_loads_only_those_columns(self):
+        """Test ?fields= shapes the objects and keeps other columns out of the SELECT"""
+        with CaptureQueriesContext(connection) as queries:
+            response, data = self.get_json(self.url, {'fields': 'title,completed'})
+        self.assertEqual(set(data['results'][0]), {'id', 'title', 'completed'})
+        sql = queries.captured_queries[-1]['sql']
+        self.assertNotIn('description', sql)
+        self.assertNotIn('due_date', sql)
+    
+    def test_list_etag_returns_304_until_a_change(self):
+        """Test an unchanged list answers If-None-Match with 304 and a change invalidates it"""
+        response, _ = self.get_json(self.url)
+        self.assertIn('private', response['Cache-Control'])
+        etag = response['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.send('patch', self.detail_url, {'title': 'Changed'})
+        response, data = self.get_json(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['results'][0]['title'], 'Changed')
+    
+    def test_updated_since_returns_changes_and_deletions(self):
+        """Test delta sync reports changed tasks oldest first plus deleted ids"""
+        _, data = self.get_json(self.url, {'updated_since': '2000-01-01T00:00:00Z'})
+        self.assertEqual(len(data['results']), 5)
+        self.assertEqual(data['deleted'], [])
+        token = data['next_updated_since']
+        
+        _, data = self.get_json(self.url, {'updated_since': token})
+        self.assertEqual(data['results'], [])
+        self.assertEqual(data['next_updated_since'], token)
+        
+        self.send('patch', self.detail_url, {'completed': True})
+        deleted = Task.objects.get(title="Task 3")
+        self.send('delete', reverse('api_task_detail', args=[deleted.pk]))
+        _, data = self.get_json(self.url, {'updated_since': token})
+        self.assertEqual([task['id'] for task in data['results']], [self.task.pk])
+        self.assertTrue(data['results'][0]['completed'])
+        self.assertEqual(data['deleted'], [deleted.pk])
+    
+    def test_updated_since_pages_through_equal_timestamps(self):
+        """Test sync pages don't skip or repeat tasks sharing an updated_at"""
+        Task.objects.update(updated_at=timezone.now())
+        seen = []
+        params = {'updated_since': '2000-01-01T00:00:00+00:00', 'limit': 2}
+        while True:
+            _, data = self.get_json(self.url, params)
+            seen += [task['id'] for task in data['results']]
+            if not data['has_more']:
+                break
+            params['updated_since'] = data['next_updated_since']
+        self.assertEqual(sorted(seen), sorted(Task.objects.values_list('id', flat=True)))
+        self.assertEqual(len(seen), len(set(seen)))
+    
+    def test_updated_since_pages_deletions(self):
+        """Test limit counts deletions too, and sync pages don't skip or repeat any"""
+        moment = timezone.now()
+        Task.objects.update(updated_at=moment)
+        gone = list(Task.objects.order_by('id').values_list('id', flat=True)[:3])
+        self.client.post(reverse('task_bulk'), {'action': 'delete', 'ids': gone})
+        DeletedTask.objects.update(deleted_at=moment)
+        seen, deleted = [], []
+        params = {'updated_since': '2000-01-01T00:00:00+00:00', 'limit': 2}
+        while True:
+            _, data = self.get_json(self.url, params)
+            self.assertLessEqual(len(data['results']) + len(data['deleted']), 2)
+            seen += [task['id'] for task in data['results']]
+            deleted += data['deleted']
+            params['updated_since'] = data['next_updated_since']
+            if not data['has_more']:
+                break
+        self.assertEqual(sorted(seen), sorted(Task.objects.values_list('id', flat=True)))
+        self.assertEqual(deleted, gone)
+        _, data = self.get_json(self.url, params)
+        self.assertEqual((data['results'], data['deleted']), ([], []))
+    
+    def test_prune_tombstones(self):
+        """Test prune_tombstones only removes tombstones older than --days"""
+        DeletedTask.objects.bulk_create([DeletedTask(task_id=1), DeletedTask(task_id=2)])
+        DeletedTask.objects.filter(task_id=1).update(deleted_at=timezone.now() - timedelta(days=8))
+        out = io.StringIO()
+        call_command('prune_tombstones', days=7, stdout=out)
+        self.assertIn("Deleted 1 tombstones", out.getvalue())
+        self.assertEqual(list(DeletedTask.objects.values_list('task_id', flat=True)), [2])
+    
+    def test_updated_since_uses_index(self):
+        """Test delta sync seeks into the (updated_at, id) index"""
+        since = timezone.now()
+        queryset = Task.objects.order_by('updated_at', 'id').filter(updated_at__gte=since).filter(
+            Q(updated_at__gt=since) | Q(id__gt=0)
+        )
+        plan = queryset.explain()
+        self.assertIn('task_updated_id_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+    
+    def test_detail_and_if_none_match(self):
+        """Test a task is returned with an ETag that answers If-None-Match with 304"""
+        response, data = self.get_json(self.detail_url)
+        self.assertEqual(data['title'], "Task 0")
+        self.assertEqual(data['updated_at'], self.task.updated_at.isoformat())
+        with self.assertNumQueries(1):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=f'"other", W/{response["ETag"]}')
+        self.assertEqual(response.status_code, 304)
+        
+        response, data = self.get_json(self.detail_url, {'fields': 'title'})
+        self.assertEqual(data, {'id': self.task.pk, 'title': "Task 0"})
+        self.assertEqual(self.client.get(reverse('api_task_detail', args=[9999])).status_code, 404)
+    
+    def test_create(self):
+        """Test POST creates a task and answers 201 with Location and ETag"""
+        response = self.send('post', self.url, {'title': '  New  ', 'due_date': '2030-01-02'})
+        self.assertEqual(response.status_code, 201)
+        task = Task.objects.get(title='New')
+        self.assertEqual(task.due_date, date(2030, 1, 2))
+        self.assertEqual(response['Location'], reverse('api_task_detail', args=[task.pk]))
+        self.assertEqual(response.json()['id'], task.pk)
+        self.assertIn('ETag', response)
+    
+    def test_create_validation(self):
+        """Test invalid bodies are rejected with 400 and nothing is created"""
+        for body in ({}, {'title': ''}, {'title': 'x' * 201}, {'title': 'ok', 'due_date': '2030-13-01'},
+                     {'title': 'ok', 'completed': 'yes'}, {'title': 'ok', 'owner': 'me'}, ['title']):
+            response = self.send('post', self.url, body)
+            self.assertEqual(response.status_code, 400, body)
+            self.assertIn('error', response.json())
+        response = self.client.post(self.url, 'not json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Task.objects.count(), 5)
+    
+    def test_patch_is_one_update(self):
+        """Test PATCH changes only the given fields with a single UPDATE plus the re-read"""
+        with self.assertNumQueries(2):
+            response = self.send('patch', self.detail_url, {'title': 'Patched', 'due_date': None})
+        self.assertEqual(response.status_code, 200)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.title, 'Patched')
+        self.assertEqual(response['ETag'], api.task_etag(self.task))
+    
+    def test_if_match_guards_writes(self):
+        """Test PATCH and DELETE with a stale If-Match get 412 and change nothing"""
+        etag = self.get_json(self.detail_url)[0]['ETag']
+        response = self.send('patch', self.detail_url, {'title': 'First'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        
+        response = self.send('patch', self.detail_url, {'title': 'Second'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        response = self.send('delete', self.detail_url, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.title, 'First')
+        
+        response = self.send('delete', self.detail_url, HTTP_IF_MATCH='"1-garbage"')
+        self.assertEqual(response.status_code, 412)
+        response = self.send('delete', self.detail_url, HTTP_IF_MATCH=api.task_etag(self.task))
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.send('delete', self.detail_url).status_code, 404)
+    
+    def test_toggle(self):
+        """Test toggle flips completed and answers 409 when the client's status is stale"""
+        url = reverse('api_task_toggle', args=[self.task.pk])
+        response = self.send('post', url, {})
+        self.assertTrue(response.json()['completed'])
+        response = self.send('post', url, {'completed': False})
+        self.assertEqual(response.status_code, 409)
+        response = self.send('post', url, {'completed': True})
+        self.assertFalse(response.json()['completed'])
+        self.assertEqual(self.send('post', reverse('api_task_toggle', args=[9999]), {}).status_code, 404)
+    
+    def test_writes_need_json_content_type(self):
+        """Test bodies a cross-site form could send are refused and change nothing"""
+        toggle_url = reverse('api_task_toggle', args=[self.task.pk])
+        response = self.client.post(self.url, {'title': 'Form'})
+        self.assertEqual(response.status_code, 415)
+        response = self.client.post(self.url, '{"title": "Text"}', content_type='text/plain')
+        self.assertEqual(response.status_code, 415)
+        response = self.client.patch(self.detail_url, '{"title": "Text"}', content_type='text/plain')
+        self.assertEqual(response.status_code, 415)
+        # A toggle needs a JSON object too, so an empty POST doesn't flip the task
+        self.assertEqual(self.client.post(toggle_url).status_code, 415)
+        self.assertEqual(self.send('post', toggle_url, []).status_code, 400)
+        self.assertEqual(Task.objects.count(), 5)
+        self.task.refresh_from_db()
+        self.assertEqual((self.task.title, self.task.completed), ("Task 0", False))
+    
+    def test_no_csrf_token_needed(self):
+        """Test API clients without a session can write JSON"""
+        client = Client(enforce_csrf_checks=True)
+        response = client.post(self.url, json.dumps({'title': 'No token'}), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+    
+    def test_method_not_allowed(self):
+        """Test unsupported methods get 405"""
+        self.assertEqual(self.client.put(self.url).status_code, 405)
+        self.assertEqual(self.client.get(reverse('api_task_toggle', args=[self.task.pk])).status_code, 405)
+
+
 class TaskURLTest(TestCase):
     """Test URL routing"""
     
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.task_list, name='task_list'),
@@ -7,4 +7,8 @@ urlpatterns = [
     path('update/<int:pk>/', views.task_update, name='task_update'),
     path('delete/<int:pk>/', views.task_delete, name='task_delete'),
     path('toggle/<int:pk>/', views.task_toggle, name='task_toggle'),
+    path('bulk/', views.task_bulk, name='task_bulk'),
+    path('api/tasks/', api.task_collection, name='api_task_list'),
+    path('api/tasks/<int:pk>/', api.task_detail, name='api_task_detail'),
+    path('api/tasks/<int:pk>/toggle/', api.task_toggle, name='api_task_toggle'),
 ]
@@ -1,13 +1,155 @@
+from django.contrib import messages
+from django.core.cache import cache
+from django.db.models import Case, Value, When
+from django.db.models.functions import Substr
+from django.http import HttpResponseBadRequest, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
-from django.views.decorators.http import require_http_methods
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_http_methods
+from .bulk import BulkError, apply_bulk_action, parse_ids
+from .cache import (
+    PAGE_TIMEOUT, cached_rows, invalidate_task_list, list_etag, list_version, page_key, render_rows
+)
 from .models import Task
+from .pagination import InvalidCursor, keyset_page, ranked_page
+from .search import search_tasks
 
 # Create your views here.
 
+# Columns the task list renders (updated_at keys the row cache); the full
+# description is not loaded
+LIST_FIELDS = ['id', 'title', 'completed', 'due_date', 'created_at', 'updated_at']
+
+# Characters of the description shown in the task list
+DESCRIPTION_PREVIEW_CHARS = 300
+
+
+def parse_version(value):
+    """The updated_at a form was rendered with, or None if missing or unreadable"""
+    try:
+        return parse_datetime(value or '')
+    except ValueError:
+        return None
+
+
+def filter_tasks(queryset, params):
+    """
+    Apply the task list filters from a query string.
+
+    completed=1/0 keeps done/open tasks; due_after and due_before
+    (YYYY-MM-DD, inclusive) keep tasks due in that range. Values that
+    don't parse are ignored.
+
+    Returns:
+        (queryset, filters) where filters holds the values that were applied
+    """
+    filters = {}
+    completed = params.get('completed')
+    if completed in ('0', '1'):
+        filters['completed'] = completed
+        queryset = queryset.filter(completed=completed == '1')
+    for name, lookup in (('due_after', 'due_date__gte'), ('due_before', 'due_date__lte')):
+        try:
+            value = parse_date(params.get(name) or '')
+        except ValueError:
+            value = None
+        if value is not None:
+            filters[name] = value.isoformat()
+            queryset = queryset.filter(**{lookup: value})
+    return queryset, filters
+
+
+def toggle_task(pk, seen=None):
+    """
+    Flip a task's completed flag with one UPDATE.
+
+    With `seen` (the status the client showed), only flip it from that
+    status. Returns False if no row changed: the task is gone or no
+    longer has that status.
+    """
+    tasks = Task.objects.filter(pk=pk)
+    if seen is not None:
+        changed = tasks.filter(completed=seen).update(completed=not seen, updated_at=timezone.now())
+    else:
+        changed = tasks.update(
+            completed=Case(When(completed=True, then=Value(False)), default=Value(True)),
+            updated_at=timezone.now(),
+        )
+    if changed:
+        invalidate_task_list()
+    return bool(changed)
+
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=list_etag)
 def task_list(request):
-    """Display all tasks"""
-    tasks = Task.objects.all()
-    return render(request, 'tasks/task_list.html', {'tasks': tasks})
+    """
+    Display one page of tasks, newest first (best matches first with ?q=)
+
+    Cached in two layers that a change to any task invalidates at once:
+    each page's list of rows under the current list version, and each
+    task's rendered row under its (pk, updated_at). A repeat visit with an
+    unchanged list gets a 304 from the ETag without touching the database.
+    """
+    key = page_key(list_version(), request)
+    page = cache.get(key)
+    rows = cached_rows(page['keys']) if page else None
+    context = {'description_preview_chars': DESCRIPTION_PREVIEW_CHARS}
+    if rows is None:
+        tasks, page = load_list_page(request)
+        if tasks is None:
+            return page
+        rows, page['keys'] = render_rows(tasks, context)
+        cache.set(key, page, PAGE_TIMEOUT)
+        context['tasks'] = tasks
+    return render(request, 'tasks/task_list.html', {**context, **page, 'rows': rows})
+
+
+def load_list_page(request):
+    """
+    Query the tasks of one task list page.
+
+    Returns:
+        (tasks, page) where page holds the filters and pagination links,
+        or (None, error response) for a bad cursor or page number
+    """
+    tasks, filters = filter_tasks(Task.objects.all(), request.GET)
+    tasks = tasks.only(*LIST_FIELDS).annotate(
+        # One character more than shown, so truncatechars adds the ellipsis
+        description_preview=Substr('description', 1, DESCRIPTION_PREVIEW_CHARS + 1)
+    )
+    search = request.GET.get('q', '').strip()
+    if search:
+        filters['q'] = search
+        try:
+            page = max(1, int(request.GET.get('page', 1)))
+        except ValueError:
+            return None, HttpResponseBadRequest("Invalid page number")
+        tasks, next_page = ranked_page(search_tasks(tasks, search), page)
+        next_param = ('page', next_page)
+        is_first_page = page == 1
+    else:
+        try:
+            tasks, next_cursor = keyset_page(tasks, request.GET.get('cursor'))
+        except InvalidCursor as e:
+            return None, HttpResponseBadRequest(str(e))
+        next_param = ('cursor', next_cursor)
+        is_first_page = not request.GET.get('cursor')
+
+    next_query = None
+    if next_param[1]:
+        query = request.GET.copy()
+        query[next_param[0]] = next_param[1]
+        next_query = query.urlencode()
+    return tasks, {
+        'filters': filters,
+        'next_query': next_query,
+        'is_first_page': is_first_page,
+    }
 
 def task_create(request):
     """Create a new task"""
@@ -21,14 +163,34 @@ def task_create(request):
     return render(request, 'tasks/task_form.html')
 
 def task_update(request, pk):
-    """Update an existing task"""
-    task = get_object_or_404(Task, pk=pk)
+    """
+    Update an existing task
+
+    The form carries the task's updated_at as a version; the POST is a
+    single UPDATE that only matches if nobody saved the task in between.
+    Otherwise it answers 409 with the form still holding the user's edits
+    and the new version, so saving again overwrites knowingly.
+    """
     if request.method == 'POST':
-        task.title = request.POST.get('title')
-        task.description = request.POST.get('description', '')
-        task.due_date = request.POST.get('due_date') or None
-        task.save()
-        return redirect('task_list')
+        fields = {
+            'title': request.POST.get('title'),
+            'description': request.POST.get('description', ''),
+            'due_date': request.POST.get('due_date') or None,
+        }
+        tasks = Task.objects.filter(pk=pk)
+        version = parse_version(request.POST.get('version'))
+        if version is not None:
+            tasks = tasks.filter(updated_at=version)
+        # update() skips auto_now and post_save, so both are done here
+        if tasks.update(updated_at=timezone.now(), **fields):
+            invalidate_task_list()
+            return redirect('task_list')
+
+        task = get_object_or_404(Task, pk=pk)
+        for name, value in fields.items():
+            setattr(task, name, value)
+        return render(request, 'tasks/task_form.html', {'task': task, 'conflict': True}, status=409)
+    task = get_object_or_404(Task, pk=pk)
     return render(request, 'tasks/task_form.html', {'task': task})
 
 def task_delete(request, pk):
@@ -40,8 +202,53 @@ def task_delete(request, pk):
     return render(request, 'tasks/task_confirm_delete.html', {'task': task})
 
 def task_toggle(request, pk):
-    """Toggle task completion status"""
-    task = get_object_or_404(Task, pk=pk)
-    task.completed = not task.completed
-    task.save()
+    """
+    Toggle task completion status
+
+    One UPDATE, with no SELECT first. The list form sends the status the
+    user saw as `completed`; if the task no longer has it (another click
+    got there first) nothing changes and the answer is 409.
+    """
+    seen = request.POST.get('completed')
+    if not toggle_task(pk, seen == '1' if seen in ('0', '1') else None):
+        task = get_object_or_404(Task.objects.only('id', 'title', 'completed'), pk=pk)
+        return render(request, 'tasks/task_conflict.html', {'task': task}, status=409)
     return redirect('task_list')
+
+@require_http_methods(['POST'])
+def task_bulk(request):
+    """
+    Complete, reopen, reschedule or delete many tasks at once.
+
+    POST fields: action (complete/reopen/reschedule/delete), ids (repeated)
+    and due_date (YYYY-MM-DD, or empty to clear it) for reschedule.
+    Answers with JSON per-task results; the task list form sends `next`
+    to be redirected back with a summary message instead.
+    """
+    next_url = request.POST.get('next')
+    if next_url and not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        next_url = reverse('task_list')
+
+    action = request.POST.get('action', '')
+    try:
+        ids = parse_ids(request.POST.getlist('ids'))
+        due_date = None
+        if action == 'reschedule' and request.POST.get('due_date'):
+            try:
+                due_date = parse_date(request.POST['due_date'])
+            except ValueError:
+                pass
+            if due_date is None:
+                raise BulkError(f"Invalid due_date: {request.POST['due_date']!r}")
+        results = apply_bulk_action(action, ids, due_date)
+    except BulkError as e:
+        if next_url:
+            messages.error(request, str(e))
+            return redirect(next_url)
+        return JsonResponse({'error': str(e)}, status=400)
+
+    changed = sum(result['status'] != 'not_found' for result in results)
+    if next_url:
+        messages.success(request, f"{action.capitalize()}: {changed} of {len(results)} selected tasks")
+        return redirect(next_url)
+    return JsonResponse({'action': action, 'changed': changed, 'results': results})
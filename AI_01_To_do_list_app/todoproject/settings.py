@@ -82,6 +82,22 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# The task list caches rendered rows and pages here. Local memory is per
+# process; when running several worker processes, switch to
+# "django.core.cache.backends.filebased.FileBasedCache" with a shared
+# LOCATION directory so they see each other's invalidations.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "tasks",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
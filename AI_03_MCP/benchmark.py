@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""Benchmark the MCP server: index build, cold start, search latency, fetch throughput"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+
+HERE = Path(__file__).resolve().parent
+
+DEFAULT_QUERIES = [
+    "how to create a tool",
+    "installation",
+    "server configuration",
+    "authentication",
+    "resource template",
+    "prompts",
+    "context logging",
+    "client transports",
+    "deploy to production",
+    "testing a server",
+]
+
+def percentiles(samples: list[float]) -> dict:
+    """Latency summary in milliseconds."""
+    values = np.asarray(samples) * 1000
+    if not len(values):
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'mean_ms': round(float(values.mean()), 3),
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p95_ms': round(float(np.percentile(values, 95)), 3),
+        'p99_ms': round(float(np.percentile(values, 99)), 3),
+        'max_ms': round(float(values.max()), 3),
+    }
+
+def max_rss_mib(who: int) -> float:
+    """Peak resident set size of this process or of its largest child, in MiB."""
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def stub_page(size: int) -> bytes:
+    """Markdown page of roughly `size` bytes with a known word mix."""
+    paragraph = ("Data engineering with AI: the data club shares data tools, "
+                 "courses and AI projects. Join the community!\n\n")
+    return (paragraph * (size // len(paragraph) + 1)).encode('utf-8')
+
+class StubServer:
+    """Local HTTP server standing in for the Jina reader: every GET returns the same page."""
+    
+    def __init__(self, page: bytes):
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; charset=utf-8')
+                self.send_header('Content-Length', str(len(page)))
+                self.end_headers()
+                self.wfile.write(page)
+            
+            def log_message(self, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+    
+    def __enter__(self) -> 'StubServer':
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+def bench_build(zip_path: str) -> dict:
+    """Time a full index build, the term index for fuzzy matching, saving, and loading back."""
+    from search import SearchIndex, index_zip
+    
+    start = time.perf_counter()
+    index = index_zip(zip_path)
+    build_s = time.perf_counter() - start
+    index_bytes = index.nbytes()
+    term_index = index.term_index
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        index.save(Path(tmp) / 'index')
+        save_s = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        SearchIndex.load(Path(tmp) / 'index')
+        load_s = time.perf_counter() - start
+    
+    return {
+        'sources': len(index.filenames),
+        'passages': len(index.passages),
+        'build_s': round(build_s, 4),
+        'save_s': round(save_s, 4),
+        'load_s': round(load_s, 4),
+        'index_mib': round(index_bytes / 2**20, 2),
+        'term_index_build_s': round(term_index.build_s, 4),
+        'term_index_mib': round(term_index.nbytes() / 2**20, 2),
+        'term_index_terms': len(term_index.terms),
+    }
+
+async def bench_cold_start(env: dict, query: str, zip_path: Path) -> dict:
+    """
+    Start main.py as an MCP stdio server and time the handshake and the first real search.
+    
+    The search goes to the corpus of the zip (named after its file, as in main.py).
+    
+    Searches answered with "still warming up" are retried until the index is ready.
+    Whether the index was already persisted (load) or not (build) is reported too.
+    """
+    from fastmcp import Client
+    from fastmcp.client.transports import PythonStdioTransport
+    from search import read_index_meta, default_index_dir
+    
+    index_persisted = read_index_meta(default_index_dir(zip_path)) is not None
+    with open(os.devnull, 'w') as server_log:
+        transport = PythonStdioTransport(HERE / 'main.py', env=env, cwd=str(HERE),
+                                         keep_alive=False, log_file=server_log)
+        start = time.perf_counter()
+        async with Client(transport) as client:
+            handshake_s = time.perf_counter() - start
+            warming_responses = 0
+            while True:
+                result = await client.call_tool('search_documentation', {'query': query, 'corpus': zip_path.stem})
+                if 'warming up' not in result.content[0].text:
+                    break
+                warming_responses += 1
+            first_search_s = time.perf_counter() - start
+    
+    return {
+        'index_persisted': index_persisted,
+        'handshake_s': round(handshake_s, 4),
+        'first_search_s': round(first_search_s, 4),
+        'warming_up_responses': warming_responses,
+        'child_peak_rss_mib': max_rss_mib(resource.RUSAGE_CHILDREN),
+    }
+
+async def bench_search(main, corpus: str, queries: list[str], rounds: int) -> dict:
+    """Latency of search_documentation through an in-memory MCP client, with and without the result cache."""
+    from fastmcp import Client
+    
+    uncached, cached = [], []
+    arguments = {'corpus': corpus}
+    async with Client(main.mcp) as client:
+        await main.corpora.wait(corpus)
+        for _ in range(rounds):
+            for query in queries:
+                main.search_cache.clear()
+                start = time.perf_counter()
+                await client.call_tool('search_documentation', {'query': query, **arguments})
+                uncached.append(time.perf_counter() - start)
+                
+                start = time.perf_counter()
+                await client.call_tool('search_documentation', {'query': query, **arguments})
+                cached.append(time.perf_counter() - start)
+    
+    return {
+        'queries': len(queries),
+        'rounds': rounds,
+        'uncached': percentiles(uncached),
+        'cached': percentiles(cached),
+        'cache': main.search_cache.stats(),
+    }
+
+async def bench_count_word(main, requests: int, concurrency: int, page_size: int) -> dict:
+    """Throughput of count_word_in_page against the stub server (every URL distinct, so no cache hits)."""
+    from fastmcp import Client
+    
+    latencies = []
+    slots = asyncio.Semaphore(concurrency)
+    
+    async def call(client, i):
+        async with slots:
+            start = time.perf_counter()
+            await client.call_tool('count_word_in_page', {'url': f"https://example.com/page/{i}", 'word': 'data'})
+            latencies.append(time.perf_counter() - start)
+    
+    async with Client(main.mcp) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(call(client, i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+    
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'page_bytes': page_size,
+        'elapsed_s': round(elapsed, 4),
+        'requests_per_s': round(requests / elapsed, 2),
+        'mib_per_s': round(requests * page_size / elapsed / 2**20, 2),
+        'latency': percentiles(latencies),
+    }
+
+async def run(args) -> dict:
+    zip_path = Path(args.zip).resolve()
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        queries = [line.strip() for line in Path(args.queries).read_text(encoding='utf-8').splitlines() if line.strip()]
+    
+    report = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'zip': str(zip_path),
+        # main.py names each corpus after its zip
+        'corpus': zip_path.stem,
+    }
+    
+    print("Benchmarking index build...", file=sys.stderr)
+    report['build'] = bench_build(str(zip_path))
+    
+    page = stub_page(args.page_size)
+    with StubServer(page) as stub:
+        # main.py reads its configuration from the environment at import time
+        env = {**os.environ, 'JINA_READER_URL': stub.url, 'CORPUS_DIR': str(zip_path.parent)}
+        os.environ.update(env)
+        
+        if not args.skip_cold_start:
+            print("Benchmarking cold start...", file=sys.stderr)
+            report['cold_start'] = await bench_cold_start(env, queries[0], zip_path)
+        
+        import main
+        
+        print("Benchmarking search latency...", file=sys.stderr)
+        report['search'] = await bench_search(main, zip_path.stem, queries, args.rounds)
+        
+        print("Benchmarking count_word_in_page throughput...", file=sys.stderr)
+        report['count_word'] = await bench_count_word(main, args.requests, args.concurrency, len(page))
+        await main.fetcher.aclose()
+    
+    report['peak_rss_mib'] = max_rss_mib(resource.RUSAGE_SELF)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--zip', default=str(HERE / 'fastmcp-main.zip'), help='Documentation zip to index')
+    parser.add_argument('--queries', help='File with one search query per line')
+    parser.add_argument('--rounds', type=int, default=5, help='Times to run the query workload')
+    parser.add_argument('--requests', type=int, default=200, help='count_word_in_page calls')
+    parser.add_argument('--concurrency', type=int, default=20, help='Concurrent count_word_in_page calls')
+    parser.add_argument('--page-size', type=int, default=100_000, help='Bytes per stub page')
+    parser.add_argument('--skip-cold-start', action='store_true', help='Do not start main.py as a subprocess')
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    args = parser.parse_args()
+    
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + '\n', encoding='utf-8')
+    else:
+        print(text)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Compare serial and parallel index build times across corpus sizes"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from search import create_search_index, extract_md_files
+
+def make_corpus(documents: list[dict], copies: int) -> list[dict]:
+    """Repeat the documentation `copies` times under different directories."""
+    return [
+        {'filename': f"copy{i}/{document['filename']}", 'content': document['content']}
+        for i in range(copies)
+        for document in documents
+    ]
+
+def same_index(a, b) -> bool:
+    """True if two indexes have the same passages and identical arrays."""
+    if a.filenames != b.filenames or a.passages != b.passages:
+        return False
+    for name, field in a.fields.items():
+        other = b.fields[name]
+        if field.terms != other.terms:
+            return False
+        for kind in ('counts', 'postings'):
+            for part in ('indptr', 'indices', 'data'):
+                if not np.array_equal(getattr(getattr(field, kind), part),
+                                      getattr(getattr(other, kind), part)):
+                    return False
+    return True
+
+def timed_build(documents: list[dict], workers: int | None):
+    start = time.perf_counter()
+    index = create_search_index(documents, workers=workers)
+    return index, time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--zip', default='fastmcp-main.zip', help='Documentation zip to replicate')
+    parser.add_argument('--copies', type=int, nargs='+', default=[1, 4, 16],
+                        help='Corpus sizes, as multiples of the zip')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='Worker processes for the parallel build')
+    args = parser.parse_args()
+    
+    documents = extract_md_files(args.zip)
+    print(f"Base corpus: {len(documents)} files, {os.cpu_count()} CPUs, {args.workers} workers\n")
+    print(f"{'files':>8} {'MB':>8} {'serial s':>10} {'parallel s':>11} {'speedup':>8}  identical")
+    
+    for copies in args.copies:
+        corpus = make_corpus(documents, copies)
+        megabytes = sum(len(document['content']) for document in corpus) / 1e6
+        
+        serial, serial_time = timed_build(corpus, None)
+        parallel, parallel_time = timed_build(corpus, args.workers)
+        
+        print(f"{len(corpus):>8} {megabytes:>8.1f} {serial_time:>10.2f} {parallel_time:>11.2f} "
+              f"{serial_time / parallel_time:>7.2f}x  {same_index(serial, parallel)}")
@@ -0,0 +1,202 @@
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Collection
+
+from search import SearchIndex, SearchResult
+from warmup import BackgroundResource, WarmingUp
+
+class UnknownCorpus(Exception):
+    """Raised when a search names a corpus that has no zip archive."""
+    
+    def __init__(self, name: str, available: list[str]):
+        super().__init__(f"Unknown corpus '{name}', available corpora: {', '.join(available) or 'none'}")
+        self.name = name
+        self.available = available
+
+class CorpusLoadError(Exception):
+    """Raised when the index of a corpus could not be built or loaded."""
+    
+    def __init__(self, name: str, error: Exception):
+        super().__init__(f"Could not load corpus '{name}': {error or type(error).__name__}")
+        self.name = name
+        self.error = error
+
+class CorpusRegistry:
+    """
+    Documentation corpora discovered as zip archives in a directory.
+    
+    Each `<name>.zip` is a corpus called `<name>`. Its index is loaded on a
+    background thread the first time it is searched; once loaded indexes
+    together exceed the memory budget, the least recently used ones are
+    dropped (and reloaded from their persisted index on next use).
+    
+    Example:
+        corpora = CorpusRegistry(".", loader=load_or_build_index)
+        index = await corpora.wait("fastmcp-main", timeout=10)
+    """
+    
+    def __init__(self, directory: str | Path, loader: Callable[[str], SearchIndex],
+                 memory_budget: int = 512 * 1024 * 1024):
+        """
+        Args:
+            directory: Directory to look for zip archives in
+            loader: Builds or loads the index of a zip path (e.g. load_or_build_index)
+            memory_budget: Approximate bytes all loaded indexes may use together
+        """
+        self.directory = Path(directory)
+        self.loader = loader
+        self.memory_budget = memory_budget
+        self._paths: dict[str, Path] = {}
+        # Loaded or loading corpora, least recently used first
+        self._resources: OrderedDict[str, BackgroundResource[SearchIndex]] = OrderedDict()
+        self._sizes: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.refresh()
+    
+    def refresh(self) -> list[str]:
+        """Rescan the directory for zip archives and return the corpus names."""
+        paths = {path.stem: path for path in sorted(self.directory.glob('*.zip'))}
+        with self._lock:
+            self._paths = paths
+            for name in [name for name in self._resources if name not in paths]:
+                del self._resources[name]
+                self._sizes.pop(name, None)
+        return self.names()
+    
+    def names(self) -> list[str]:
+        """Names of all known corpora, sorted."""
+        return sorted(self._paths)
+    
+    def resource(self, name: str) -> BackgroundResource[SearchIndex]:
+        """
+        The (started) background loader of a corpus, marking it recently used.
+        
+        Raises:
+            UnknownCorpus: If there is no `<name>.zip`, even after a rescan
+        """
+        if name not in self._paths:
+            self.refresh()
+        with self._lock:
+            if name not in self._paths:
+                raise UnknownCorpus(name, sorted(self._paths))
+            resource = self._resources.get(name)
+            if resource is None:
+                path = str(self._paths[name])
+                resource = BackgroundResource(f"'{name}' index", lambda: self.loader(path))
+                self._resources[name] = resource
+            self._resources.move_to_end(name)
+        return resource.start()
+    
+    async def wait(self, name: str, timeout: float | None = None,
+                   keep: Collection[str] = ()) -> SearchIndex:
+        """
+        Get the index of a corpus, loading it if needed.
+        
+        Args:
+            name: Corpus to get
+            timeout: Seconds to wait for it to load (None waits forever)
+            keep: Other corpora not to unload to make room for it
+        
+        Raises:
+            UnknownCorpus: If the corpus does not exist
+            WarmingUp: If the index is not ready within the timeout
+            CorpusLoadError: If loading failed (the next call tries again)
+        """
+        resource = self.resource(name)
+        try:
+            index = await resource.wait(timeout)
+        except WarmingUp:
+            raise
+        except Exception as e:
+            # Forget the failed load so the next search retries it
+            with self._lock:
+                if self._resources.get(name) is resource:
+                    del self._resources[name]
+            raise CorpusLoadError(name, e) from e
+        self.enforce_budget(keep={name, *keep})
+        return index
+    
+    def loaded(self) -> dict[str, int]:
+        """Approximate size in bytes of every loaded index, least recently used first."""
+        with self._lock:
+            resources = list(self._resources.items())
+        sizes = {}
+        for name, resource in resources:
+            if not resource.ready:
+                continue
+            if name not in self._sizes:
+                try:
+                    self._sizes[name] = resource.get().nbytes()
+                except Exception:
+                    # Failed loads hold no index; forget them so they are retried
+                    self._forget(name)
+                    continue
+            sizes[name] = self._sizes[name]
+        return sizes
+    
+    def evict(self, name: str) -> None:
+        """Forget the loaded index of a corpus (it is reloaded on next use)."""
+        if self._forget(name):
+            self.evictions += 1
+    
+    def _forget(self, name: str) -> bool:
+        with self._lock:
+            self._sizes.pop(name, None)
+            return self._resources.pop(name, None) is not None
+    
+    def enforce_budget(self, keep: Collection[str] = ()) -> None:
+        """
+        Drop least recently used indexes until the loaded ones fit the budget.
+        
+        Args:
+            keep: Corpora never to drop (the ones being searched)
+        """
+        sizes = self.loaded()
+        total = sum(sizes.values())
+        for name, size in sizes.items():
+            if total <= self.memory_budget:
+                break
+            if name in keep:
+                continue
+            self.evict(name)
+            total -= size
+            print(f"Unloaded '{name}' index to stay within the memory budget", file=sys.stderr)
+    
+    def stats(self) -> dict:
+        """Known and loaded corpora with their approximate memory use."""
+        sizes = self.loaded()
+        return {
+            'corpora': self.names(),
+            'loaded': sizes,
+            'bytes': sum(sizes.values()),
+            'memory_budget': self.memory_budget,
+            'evictions': self.evictions,
+        }
+
+def merge_results(results_by_corpus: dict[str, list[SearchResult]],
+                  num_results: int) -> list[tuple[str, SearchResult]]:
+    """
+    Merge the results of several corpora by normalized score.
+    
+    Raw scores are not comparable across indexes (IDF depends on the
+    corpus), so each corpus' scores are divided by its best score before
+    merging; ties go to the higher raw score.
+    
+    Args:
+        results_by_corpus: Results of search() per corpus name
+        num_results: Maximum number of results to return
+    
+    Returns:
+        (corpus name, result) pairs, best first
+    """
+    merged = []
+    for corpus, results in results_by_corpus.items():
+        if not results:
+            continue
+        best = max(result.score for result in results) or 1.0
+        merged.extend((result.score / best, result.score, corpus, result) for result in results)
+    merged.sort(key=lambda item: (-item[0], -item[1]))
+    return [(corpus, result) for _, _, corpus, result in merged[:num_results]]
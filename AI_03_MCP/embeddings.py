@@ -0,0 +1,308 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import svds
+
+from search import INDEX_FORMAT_VERSION, SearchIndex, SearchResult, file_sha256
+
+# Bumped whenever the saved vectors change meaning
+VECTORS_FORMAT_VERSION = 1
+
+# Passage rows scored per matrix product (bounds the float32 copy of the float16 vectors)
+BATCH_ROWS = 16384
+
+class LsaEmbedder:
+    """
+    Latent semantic analysis: TF-IDF vectors projected onto their top singular vectors.
+    
+    Needs no model and runs offline: the projection is fitted on the
+    index's own postings with a truncated SVD, so passages that use
+    related words end up close even when they share no query term.
+    
+    Example:
+        vectors = load_or_build_vectors(index, "fastmcp-main.zip", embedder='lsa')
+    """
+    
+    name = 'lsa'
+    # Embeds a query's terms (see search_cache.normalize_query())
+    terms_only = True
+    
+    def __init__(self, dim: int = 128):
+        """
+        Args:
+            dim: Embedding dimensions (capped by the size of the index)
+        """
+        self.dim = dim
+        # Term x dim matrix (stored this way round so queries multiply it without a copy)
+        self.projection: np.ndarray | None = None
+    
+    def fit(self, index: SearchIndex) -> np.ndarray:
+        """
+        Fit the projection on an index.
+        
+        Returns:
+            Passage x dim matrix of unit-length passage embeddings
+        """
+        weights = sparse.hstack([field.postings.T for field in index.fields.values()]).tocsr()
+        weights = weights.astype(np.float32)
+        k = min(self.dim, min(weights.shape) - 1)
+        if k < 1:
+            self.projection = np.zeros((weights.shape[1], 0), dtype=np.float32)
+            return np.zeros((weights.shape[0], 0), dtype=np.float32)
+        
+        _, _, components = svds(weights, k=k, random_state=0)
+        self.projection = np.ascontiguousarray(components.T, dtype=np.float32)
+        return normalize_rows(np.asarray(weights @ self.projection))
+    
+    def embed(self, index: SearchIndex, queries: list[str]) -> np.ndarray:
+        """Unit-length embeddings of queries (typos and prefixes expanded as in search())."""
+        queries_terms = [index.query_terms(query) for query in queries]
+        parts = []
+        for field in index.fields.values():
+            # Same query weights as TfidfScorer: IDF-weighted, L2-normalized per field
+            weights = field.query_counts(queries_terms) @ sparse.diags(field.idf)
+            parts.append(sparse.csr_matrix(normalize_rows(weights.toarray())))
+        return normalize_rows(np.asarray(sparse.hstack(parts).tocsr() @ self.projection))
+    
+    def config(self) -> dict:
+        return {'embedder': self.name, 'dim': self.dim}
+    
+    def save(self, path: Path) -> None:
+        np.save(path / 'lsa.projection.npy', self.projection)
+    
+    def load(self, path: Path) -> None:
+        self.projection = np.load(path / 'lsa.projection.npy', mmap_mode='r')
+
+class SentenceTransformerEmbedder:
+    """
+    Embeddings from a local sentence-transformers model, run on the CPU.
+    
+    Optional: needs the sentence-transformers package and a model that is
+    already on disk (a directory path, or a name in the Hugging Face cache
+    with HF_HUB_OFFLINE=1); nothing is downloaded.
+    
+    Example:
+        vectors = load_or_build_vectors(index, "fastmcp-main.zip",
+                                        embedder='sentence-transformers', model='models/all-MiniLM-L6-v2')
+    """
+    
+    name = 'sentence-transformers'
+    # Reads the query text itself: case, order and punctuation may matter
+    terms_only = False
+    
+    def __init__(self, model: str = 'all-MiniLM-L6-v2', batch_size: int = 64):
+        """
+        Args:
+            model: Local model directory or cached model name
+            batch_size: Passages encoded per batch
+        
+        Raises:
+            ValueError: If sentence-transformers is not installed
+        """
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ValueError("The 'sentence-transformers' embedder needs the sentence-transformers package") from e
+        self.model_name = model
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(model, device='cpu')
+    
+    def fit(self, index: SearchIndex) -> np.ndarray:
+        texts = [index.passage_text(row) for row in range(len(index.passages))]
+        return self.model.encode(texts, batch_size=self.batch_size, normalize_embeddings=True,
+                                 convert_to_numpy=True).astype(np.float32)
+    
+    def embed(self, index: SearchIndex, queries: list[str]) -> np.ndarray:
+        return self.model.encode(queries, normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+    
+    def config(self) -> dict:
+        return {'embedder': self.name, 'model': self.model_name}
+    
+    def save(self, path: Path) -> None:
+        pass
+    
+    def load(self, path: Path) -> None:
+        pass
+
+EMBEDDERS = {
+    'lsa': LsaEmbedder,
+    'sentence-transformers': SentenceTransformerEmbedder,
+}
+
+def get_embedder(name: str, **params):
+    """
+    Create an embedder by name.
+    
+    Raises:
+        ValueError: If there is no embedder with that name (or it cannot run here)
+    """
+    if name not in EMBEDDERS:
+        raise ValueError(f"Unknown embedder '{name}', expected one of {sorted(EMBEDDERS)}")
+    return EMBEDDERS[name](**params)
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale every row to unit length (all-zero rows stay zero)."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+class VectorIndex:
+    """
+    Passage embeddings searched by brute-force dot products.
+    
+    The embeddings are kept as float16 (half the memory of float32, and
+    memory-mapped when loaded from disk) and scored in batches of rows,
+    each converted to float32 just for its matrix product. At a few
+    thousand to tens of thousands of passages, an exact scan takes about a
+    millisecond or two per query, so no approximate index is needed.
+    
+    Attributes:
+        embedder: Embeds queries the same way as the passages
+        vectors: Passage x dim float16 matrix, rows in index order
+        build_s: Seconds spent embedding the passages (0.0 if loaded)
+    """
+    
+    def __init__(self, embedder, vectors: np.ndarray, build_s: float = 0.0):
+        self.embedder = embedder
+        self.vectors = vectors
+        self.build_s = build_s
+    
+    def nbytes(self) -> int:
+        projection = getattr(self.embedder, 'projection', None)
+        return self.vectors.nbytes + (projection.nbytes if projection is not None else 0)
+    
+    def search_many(self, index: SearchIndex, queries: list[str], num_results: int) -> list[list[SearchResult]]:
+        """
+        Best passages by cosine similarity, one per source, for several queries.
+        
+        Args:
+            index: The SearchIndex the vectors were built from
+            queries: Search query strings
+            num_results: Maximum number of passages per query
+        """
+        if not len(self.vectors) or not self.vectors.shape[1] or num_results < 1:
+            return [[] for _ in queries]
+        
+        embedded = self.embedder.embed(index, queries)
+        scores = np.empty((len(queries), len(self.vectors)), dtype=np.float32)
+        for start in range(0, len(self.vectors), BATCH_ROWS):
+            batch = np.asarray(self.vectors[start:start + BATCH_ROWS], dtype=np.float32)
+            scores[:, start:start + len(batch)] = embedded @ batch.T
+        
+        # Enough candidates that num_results distinct sources are almost always among them
+        pool = min(num_results * 8, scores.shape[1])
+        results = []
+        for row_scores in scores:
+            candidates = np.argpartition(-row_scores, pool - 1)[:pool]
+            results.append(index.top_passages(candidates, row_scores[candidates], num_results))
+        return results
+
+def default_vectors_dir(zip_path: str | Path) -> Path:
+    """Where the persisted embeddings for a zip live (e.g. fastmcp-main.vectors/)."""
+    zip_path = Path(zip_path)
+    return zip_path.with_name(f"{zip_path.stem}.vectors")
+
+def load_or_build_vectors(index: SearchIndex, zip_path: str | Path, embedder: str = 'lsa',
+                          vectors_dir: str | Path | None = None, **params) -> VectorIndex:
+    """
+    Load the cached passage embeddings of a zip archive, computing them if needed.
+    
+    Embeddings are computed once and saved next to the zip with the zip's
+    SHA-256, the embedder settings, the index format version and a digest
+    of the passage IDs; they are recomputed when any of these changes (the
+    last two catch an index rebuilt from the same zip with different
+    passages). As for the index, a matching size and mtime skip the hash.
+    
+    Args:
+        index: The SearchIndex of the zip (from load_or_build_index())
+        zip_path: Path to the documentation zip file
+        embedder: Embedder name from EMBEDDERS
+        vectors_dir: Where to keep the embeddings (default: next to the zip)
+        **params: Embedder parameters (e.g. dim for 'lsa', model for 'sentence-transformers')
+    
+    Returns:
+        VectorIndex for index.with_vectors()
+    """
+    model = get_embedder(embedder, **params)
+    vectors_dir = Path(vectors_dir) if vectors_dir else default_vectors_dir(zip_path)
+    stat = os.stat(zip_path)
+    source = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    passages = {'index_format': INDEX_FORMAT_VERSION, 'ids_sha256': passage_ids_sha256(index)}
+    
+    meta = read_vectors_meta(vectors_dir)
+    if meta is not None and (meta['config'] != model.config() or meta['num_passages'] != len(index.passages)
+                             or meta.get('passages') != passages):
+        meta = None
+    if meta is not None:
+        saved = meta['source']
+        if not (saved.get('size') == source['size'] and saved.get('mtime_ns') == source['mtime_ns']):
+            source['sha256'] = file_sha256(zip_path)
+            if saved.get('sha256') != source['sha256']:
+                meta = None
+    if meta is not None:
+        if meta['source'] != source and 'sha256' in source:
+            # Same content, new mtime: record it so the next start takes the fast path
+            meta['source'] = source
+            with open(vectors_dir / 'meta.json', 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+        model.load(vectors_dir)
+        return VectorIndex(model, np.load(vectors_dir / 'vectors.npy', mmap_mode='r'))
+    
+    start = time.perf_counter()
+    vectors = model.fit(index).astype(np.float16)
+    build_s = time.perf_counter() - start
+    source.setdefault('sha256', file_sha256(zip_path))
+    try:
+        save_vectors(vectors_dir, model, vectors, source, passages)
+    except OSError as e:
+        # stderr: this may run while the MCP server is talking over stdout
+        print(f"Could not save embeddings to {vectors_dir}: {e}", file=sys.stderr)
+    return VectorIndex(model, vectors, build_s)
+
+def passage_ids_sha256(index: SearchIndex) -> str:
+    """SHA-256 of the passage IDs in row order, the order the vector rows follow."""
+    ids = index.passages.ids
+    digest = hashlib.sha256(np.asarray(ids.offsets, dtype=np.int64).tobytes())
+    digest.update(ids.data)
+    return digest.hexdigest()
+
+def read_vectors_meta(path: str | Path) -> dict | None:
+    """Return the metadata of saved embeddings, or None if there are no usable ones."""
+    try:
+        with open(Path(path) / 'meta.json', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('format') != VECTORS_FORMAT_VERSION:
+        return None
+    return meta
+
+def save_vectors(path: Path, model, vectors: np.ndarray, source: dict, passages: dict) -> None:
+    """Write vectors.npy, the embedder's state and meta.json, swapping the directory in."""
+    tmp_path = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir(parents=True)
+    
+    np.save(tmp_path / 'vectors.npy', vectors)
+    model.save(tmp_path)
+    meta = {
+        'format': VECTORS_FORMAT_VERSION,
+        'config': model.config(),
+        'num_passages': len(vectors),
+        'dim': int(vectors.shape[1]),
+        'source': source,
+        'passages': passages,
+    }
+    # meta.json goes last: its presence marks complete embeddings
+    with open(tmp_path / 'meta.json', 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
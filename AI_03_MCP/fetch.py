@@ -0,0 +1,491 @@
+import asyncio
+import base64
+import json
+import os
+import random
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+from urllib.parse import urlsplit
+
+import httpx
+
+from metrics import SharedTimer, current_call, upstream
+from page_cache import CachedPage, PageCache
+
+# Point this at a local stub server to test without hitting r.jina.ai
+JINA_READER_URL = os.environ.get("JINA_READER_URL", "https://r.jina.ai/")
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+MAX_AGE_PATTERN = re.compile(r'max-age=(\d+)')
+
+T = TypeVar('T')
+
+def cache_ttl(response: httpx.Response) -> float | None:
+    """TTL requested by the response's Cache-Control header, if any."""
+    cache_control = response.headers.get('cache-control', '')
+    if 'no-store' in cache_control or 'no-cache' in cache_control:
+        return 0.0
+    match = MAX_AGE_PATTERN.search(cache_control)
+    return float(match.group(1)) if match else None
+
+class TokenBucket:
+    """
+    Rate limiter: `rate` requests per second on average, in bursts of up to `burst`.
+    
+    Waiters are served in arrival order.
+    """
+    
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self) -> float:
+        """
+        Wait for a token.
+        
+        Returns:
+            Seconds spent waiting
+        """
+        waited = 0.0
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+
+class PageSlice:
+    """
+    Characters [offset, offset + max_chars) of a page, collected from chunks.
+    
+    Feed it the page in order; it keeps only the characters in range.
+    """
+    
+    __slots__ = ('offset', 'end', 'parts', 'seen', 'total_chars')
+    
+    def __init__(self, offset: int, max_chars: int):
+        self.offset = offset
+        self.end = offset + max_chars
+        self.parts: list[str] = []
+        self.seen = 0
+        # Length of the whole page, once it has been read to the end
+        self.total_chars: int | None = None
+    
+    def feed(self, chunk: str) -> None:
+        chunk_start = self.seen
+        self.seen += len(chunk)
+        if self.seen > self.offset and chunk_start < self.end:
+            self.parts.append(chunk[max(self.offset - chunk_start, 0):self.end - chunk_start])
+    
+    @property
+    def filled(self) -> bool:
+        """True once a character past the range has been seen."""
+        return self.seen > self.end
+    
+    @property
+    def text(self) -> str:
+        return ''.join(self.parts)
+    
+    @property
+    def has_more(self) -> bool:
+        return self.filled if self.total_chars is None else self.total_chars > self.end
+
+def encode_cursor(url: str, offset: int) -> str:
+    """Opaque cursor for continuing to read a page at `offset`."""
+    data = json.dumps({'url': url, 'offset': offset}, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii')
+
+def decode_cursor(cursor: str) -> tuple[str, int]:
+    """
+    Inverse of encode_cursor().
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return str(data['url']), int(data['offset'])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+class PageFetcher:
+    """
+    Shared async HTTP client that fetches webpages as markdown via Jina reader.
+    
+    Connections are pooled and kept alive between calls, requests to the same
+    host are capped at `per_host_limit` at a time, and transient failures are
+    retried with exponential backoff. With `rate_limit`, requests to each
+    host are also spread out by a token bucket. With a PageCache, pages are
+    served from the cache while fresh and revalidated with a conditional
+    request once they expire.
+    
+    Concurrent fetch() calls for the same URL (and fetch_range() calls for
+    the same URL and range) share one request and its result.
+    
+    Create one per event loop and reuse it; call aclose() (or use it as an
+    async context manager) when done.
+    """
+    
+    def __init__(self, reader_url: str | None = None, timeout: float = 30.0,
+                 max_connections: int = 20, per_host_limit: int = 4,
+                 retries: int = 3, backoff: float = 0.5,
+                 cache: PageCache | None = None,
+                 rate_limit: float | None = None, rate_burst: int = 1):
+        """
+        Args:
+            reader_url: Base URL of the reader service (default: JINA_READER_URL)
+            timeout: Seconds to wait for the server to respond
+            max_connections: Size of the connection pool
+            per_host_limit: Maximum concurrent requests per host
+            retries: How many times to retry a failed request
+            backoff: Base delay in seconds, doubled on every retry
+            cache: Page cache to read from and fill (None disables caching)
+            rate_limit: Maximum requests per second to each host (None or 0: unlimited)
+            rate_burst: Requests a host may receive back to back before rate_limit applies
+        """
+        reader_url = reader_url or JINA_READER_URL
+        self.reader_url = reader_url if reader_url.endswith('/') else reader_url + '/'
+        self.timeout = httpx.Timeout(timeout, connect=min(timeout, 10.0))
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=60.0
+        )
+        self.per_host_limit = per_host_limit
+        self.retries = retries
+        self.backoff = backoff
+        self.cache = cache
+        self.rate_limit = rate_limit or None
+        self.rate_burst = rate_burst
+        self._client: httpx.AsyncClient | None = None
+        self._host_slots: dict[str, asyncio.Semaphore] = {}
+        self._host_buckets: dict[str, TokenBucket] = {}
+        self._in_flight: dict[tuple, tuple[asyncio.Future, SharedTimer]] = {}
+        self.counters = {
+            'requests': 0,          # HTTP requests sent, retries included
+            'coalesced': 0,         # calls that joined a request already in flight
+            'throttled': 0,         # requests delayed by the rate limit
+            'throttle_wait_s': 0.0, # total delay added by the rate limit
+        }
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                follow_redirects=True
+            )
+        return self._client
+    
+    def _host_slot(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_slots[host]
+    
+    async def _throttle(self, url: str) -> None:
+        if self.rate_limit is None:
+            return
+        host = urlsplit(url).netloc
+        if host not in self._host_buckets:
+            self._host_buckets[host] = TokenBucket(self.rate_limit, self.rate_burst)
+        waited = await self._host_buckets[host].acquire()
+        if waited:
+            self.counters['throttled'] += 1
+            self.counters['throttle_wait_s'] += waited
+    
+    async def _single_flight(self, key: tuple, work: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run `work` once for all concurrent callers with the same key.
+        
+        The work runs in its own task, so a caller that is cancelled does not
+        cancel it for the others. Its HTTP waits count as upstream time of
+        every call waiting for it; cache reads and other local work don't.
+        """
+        flight = self._in_flight.get(key)
+        if flight is None:
+            timer = SharedTimer()
+            
+            async def shared_work() -> T:
+                current_call.set(timer)
+                return await work()
+            
+            task = asyncio.ensure_future(shared_work())
+            flight = self._in_flight[key] = (task, timer)
+            task.add_done_callback(lambda done: self._flight_done(key, done))
+        else:
+            self.counters['coalesced'] += 1
+        task, timer = flight
+        caller = current_call.get()
+        timer.join(caller)
+        try:
+            return await asyncio.shield(task)
+        finally:
+            timer.leave(caller)
+    
+    def _flight_done(self, key: tuple, task: asyncio.Future) -> None:
+        if key in self._in_flight and self._in_flight[key][0] is task:
+            del self._in_flight[key]
+        # Mark the exception as retrieved even if every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+    
+    def _retry_delay(self, attempt: int, response: httpx.Response | None = None) -> float:
+        # Honour Retry-After (in seconds) when the server sends one
+        if response is not None:
+            retry_after = response.headers.get('retry-after', '')
+            if retry_after.isdigit():
+                return min(float(retry_after), 30.0)
+        return self.backoff * (2 ** attempt) * (1 + random.random() / 2)
+    
+    @asynccontextmanager
+    async def open(self, url: str, headers: dict | None = None) -> AsyncIterator[httpx.Response]:
+        """
+        Send a GET and yield the response before its body is read.
+        
+        Retries happen before anything is yielded, and the per-host slot is
+        held until the caller is done with the body. Every attempt waits for
+        the host's rate limit. The whole exchange, including waiting for a
+        slot, counts as upstream time of the tool call in progress (see
+        metrics.py); nothing else in this module does.
+        
+        Args:
+            url: Full URL to request
+            headers: Extra request headers
+        
+        Yields:
+            The final response (status already checked; 304 is passed through)
+        
+        Raises:
+            httpx.HTTPStatusError: If the server keeps answering with an error
+            httpx.TransportError: If the server keeps being unreachable
+        """
+        client = self._get_client()
+        request = client.build_request('GET', url, headers=headers)
+        with upstream():
+            async with self._host_slot(url):
+                for attempt in range(self.retries + 1):
+                    await self._throttle(url)
+                    self.counters['requests'] += 1
+                    try:
+                        response = await client.send(request, stream=True)
+                    except httpx.TransportError:
+                        if attempt == self.retries:
+                            raise
+                        await asyncio.sleep(self._retry_delay(attempt))
+                        continue
+                    
+                    if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                        await response.aclose()
+                        await asyncio.sleep(self._retry_delay(attempt, response))
+                        continue
+                    
+                    try:
+                        if response.status_code != httpx.codes.NOT_MODIFIED:
+                            response.raise_for_status()
+                        yield response
+                    finally:
+                        await response.aclose()
+                    return
+    
+    async def get(self, url: str, headers: dict | None = None) -> httpx.Response:
+        """
+        GET a URL with pooling, the per-host limit and retries.
+        
+        Args:
+            url: Full URL to request
+            headers: Extra request headers
+        
+        Returns:
+            The final response with its body read (304 is passed through)
+        """
+        async with self.open(url, headers=headers) as response:
+            await response.aread()
+        return response
+    
+    async def fetch(self, url: str) -> str:
+        """
+        Get content of any webpage in markdown format using Jina reader.
+        
+        Args:
+            url: The URL of the webpage to fetch (e.g., https://datatalks.club)
+        
+        Returns:
+            The webpage content in markdown format
+        """
+        return await self._single_flight(('fetch', url), lambda: self._fetch(url))
+    
+    async def _fetch(self, url: str) -> str:
+        if self.cache is None:
+            response = await self.get(f"{self.reader_url}{url}")
+            return response.text
+        
+        entry = self.cache.get(url)
+        if entry is not None and entry.fresh:
+            return self.cache.read_text(url, entry)
+        
+        headers = entry.validators() if entry is not None else None
+        response = await self.get(f"{self.reader_url}{url}", headers=headers)
+        if response.status_code == httpx.codes.NOT_MODIFIED and entry is not None:
+            self.cache.revalidated(url, entry, ttl=cache_ttl(response))
+            return self.cache.read_text(url, entry)
+        
+        self.cache.put(
+            url,
+            response.text,
+            etag=response.headers.get('etag'),
+            last_modified=response.headers.get('last-modified'),
+            ttl=cache_ttl(response)
+        )
+        return response.text
+    
+    async def fetch_range(self, url: str, offset: int = 0, max_chars: int = 50_000) -> PageSlice:
+        """
+        Get part of a webpage's markdown without holding the whole page.
+        
+        A cached page is read in chunks from memory or the disk tier. Otherwise
+        the body is streamed: the requested range is kept, and the whole page
+        goes through a PageWriter into the cache so later ranges need no
+        request. Without a cache (or with nowhere to keep a page that large),
+        reading stops as soon as the range is complete.
+        
+        Args:
+            url: The URL of the webpage to fetch
+            offset: First character to return
+            max_chars: Maximum number of characters to return
+        
+        Returns:
+            The requested range
+        """
+        return await self._single_flight(('range', url, offset, max_chars),
+                                         lambda: self._fetch_range(url, offset, max_chars))
+    
+    async def _fetch_range(self, url: str, offset: int, max_chars: int) -> PageSlice:
+        page = PageSlice(offset, max_chars)
+        entry = self.cache.get(url) if self.cache is not None else None
+        if entry is not None and entry.fresh:
+            return self._read_range(url, entry, page)
+        
+        headers = entry.validators() if entry is not None else None
+        async with self.open(f"{self.reader_url}{url}", headers=headers) as response:
+            if response.status_code == httpx.codes.NOT_MODIFIED and entry is not None:
+                self.cache.revalidated(url, entry, ttl=cache_ttl(response))
+            else:
+                entry = None
+                writer = None
+                if self.cache is not None:
+                    writer = self.cache.writer(
+                        url,
+                        etag=response.headers.get('etag'),
+                        last_modified=response.headers.get('last-modified'),
+                        ttl=cache_ttl(response)
+                    )
+                try:
+                    complete = True
+                    async for chunk in response.aiter_text():
+                        page.feed(chunk)
+                        if writer is not None and writer.active:
+                            writer.write(chunk)
+                        elif page.filled:
+                            complete = False
+                            break
+                except BaseException:
+                    if writer is not None:
+                        writer.abort()
+                    raise
+                if complete:
+                    page.total_chars = page.seen
+                    if writer is not None:
+                        writer.commit()
+                elif writer is not None:
+                    writer.abort()
+        
+        if entry is not None:
+            return self._read_range(url, entry, page)
+        return page
+    
+    def _read_range(self, url: str, entry: CachedPage, page: PageSlice) -> PageSlice:
+        for chunk in self.cache.iter_text(url, entry):
+            page.feed(chunk)
+            if page.filled:
+                break
+        page.total_chars = entry.chars
+        return page
+    
+    async def stream(self, url: str) -> AsyncIterator[str]:
+        """
+        Yield the markdown of a webpage in decoded text chunks.
+        
+        With a cache, a fresh cached copy is yielded in chunks. Otherwise the
+        page is first fetched (or revalidated) into the cache through
+        fetch_range(), so concurrent callers share one request and later
+        calls need none, and is then read back in chunks. Pages too large to
+        cache, or any page without a cache, are streamed straight from the
+        reader. Either way memory stays bounded by the chunk size (or the
+        cache's memory budget) rather than the page size.
+        
+        Args:
+            url: The URL of the webpage to fetch
+        """
+        if self.cache is not None:
+            entry = self.cache.get(url)
+            if entry is None or not entry.fresh:
+                # Fills the cache with a whole page however small the range
+                await self.fetch_range(url, offset=0, max_chars=0)
+                entry = self.cache.get(url)
+            if entry is not None:
+                for chunk in self.cache.iter_text(url, entry):
+                    yield chunk
+                return
+        
+        async with self.open(f"{self.reader_url}{url}") as response:
+            async for chunk in response.aiter_text():
+                yield chunk
+    
+    def stats(self) -> dict:
+        """Request, coalescing and rate limit counters."""
+        return {
+            **self.counters,
+            'throttle_wait_s': round(self.counters['throttle_wait_s'], 3),
+            'in_flight': len(self._in_flight),
+            'per_host_limit': self.per_host_limit,
+            'rate_limit': self.rate_limit,
+            'rate_burst': self.rate_burst,
+        }
+    
+    async def aclose(self) -> None:
+        """Close pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def __aenter__(self) -> 'PageFetcher':
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+async def fetch_page_markdown(url: str) -> str:
+    """
+    Fetch one page with a short-lived PageFetcher (for scripts).
+    
+    Args:
+        url: The URL of the webpage to fetch
+    
+    Returns:
+        The webpage content in markdown format
+    """
+    async with PageFetcher() as fetcher:
+        return await fetcher.fetch(url)
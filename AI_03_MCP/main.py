@@ -1,15 +1,81 @@
 from fastmcp import FastMCP
-import requests
-import re
-from search import extract_md_files, create_search_index, search
+import asyncio
+import os
+from corpora import CorpusLoadError, CorpusRegistry, UnknownCorpus, merge_results
+from embeddings import load_or_build_vectors
+from fetch import PageFetcher, decode_cursor, encode_cursor
+from metrics import MetricsMiddleware, ServerMetrics
+from page_cache import PageCache
+from search import SearchIndex, format_results, load_or_build_index
+from search_cache import SearchCache
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from warmup import WarmingUp
+from wordcount import WordCounter
 
 mcp = FastMCP("Demo 🚀")
 
-# Initialize the documentation search index
-print("Loading documentation index...")
-docs = extract_md_files("fastmcp-main.zip")
-doc_index = create_search_index(docs)
-print(f"✓ Loaded {len(docs)} documentation files")
+# Call counts, latency histograms, payload sizes and upstream vs local time
+# for every tool; see the stats://server resource and the /metrics route
+metrics = ServerMetrics()
+mcp.add_middleware(MetricsMiddleware(metrics))
+
+# How long a tool call waits for a warming resource before giving up
+WARMUP_TIMEOUT = 10.0
+
+# One pooled HTTP client and page cache shared by all fetch tools.
+# Set PAGE_CACHE_DIR to keep fetched pages on disk across restarts.
+page_cache = PageCache(
+    max_bytes=int(os.environ.get("PAGE_CACHE_MAX_BYTES", 32 * 1024 * 1024)),
+    ttl=float(os.environ.get("PAGE_CACHE_TTL", 300)),
+    disk_dir=os.environ.get("PAGE_CACHE_DIR")
+)
+# Concurrent calls for the same page share one upstream request. Set
+# FETCH_RATE_LIMIT (requests per second per host) to stay under the reader's limits.
+fetcher = PageFetcher(
+    cache=page_cache,
+    per_host_limit=int(os.environ.get("FETCH_PER_HOST_LIMIT", 4)),
+    rate_limit=float(os.environ.get("FETCH_RATE_LIMIT", 0)),
+    rate_burst=int(os.environ.get("FETCH_RATE_BURST", 1))
+)
+
+# Characters get_page_markdown returns per call; longer pages continue with a cursor
+PAGE_MAX_CHARS = int(os.environ.get("PAGE_MAX_CHARS", 50_000))
+
+# Repeated (or reworded) queries are answered from this cache
+search_cache = SearchCache(max_entries=int(os.environ.get("SEARCH_CACHE_SIZE", 1024)))
+
+def load_corpus(path: str) -> SearchIndex:
+    """
+    Load (or build) the index of one corpus.
+    
+    SEARCH_BACKEND=bm25 switches the lexical scoring. SEARCH_MODE=hybrid also
+    loads (or computes once) passage embeddings with the EMBEDDER model
+    ("lsa" by default, or "sentence-transformers" with EMBEDDING_MODEL set
+    to a local model) and fuses both rankings.
+    """
+    index = load_or_build_index(path, backend=os.environ.get("SEARCH_BACKEND", "tfidf"))
+    if os.environ.get("SEARCH_MODE", "lexical") != "hybrid":
+        return index
+    
+    embedder = os.environ.get("EMBEDDER", "lsa")
+    params = {"model": os.environ["EMBEDDING_MODEL"]} if os.environ.get("EMBEDDING_MODEL") else {}
+    return index.with_vectors(load_or_build_vectors(index, path, embedder=embedder, **params))
+
+# Every <name>.zip in CORPUS_DIR is a searchable corpus. Indexes load in the
+# background on first use, and the least recently used ones are unloaded
+# once they exceed CORPUS_MEMORY_BUDGET.
+DEFAULT_CORPUS = "fastmcp-main"
+corpora = CorpusRegistry(
+    os.environ.get("CORPUS_DIR", "."),
+    loader=load_corpus,
+    memory_budget=int(os.environ.get("CORPUS_MEMORY_BUDGET", 512 * 1024 * 1024))
+)
+
+# Start loading the default corpus right away so the server can answer the
+# MCP handshake immediately and the first search does not wait as long
+if DEFAULT_CORPUS in corpora.names():
+    corpora.resource(DEFAULT_CORPUS)
 
 @mcp.tool
 def add(a: int, b: int) -> int:
@@ -17,23 +83,50 @@ def add(a: int, b: int) -> int:
     return a + b
 
 @mcp.tool
-def get_page_markdown(url: str) -> str:
+async def get_page_markdown(url: str, max_chars: int = PAGE_MAX_CHARS, offset: int = 0,
+                            cursor: str | None = None) -> str:
     """
     Get content of any webpage in markdown format using Jina reader.
     
+    Long pages are returned in parts of at most `max_chars` characters; the
+    end of each part says which cursor to pass to get the next one.
+    
     Args:
         url: The URL of the webpage to fetch (e.g., https://datatalks.club)
+        max_chars: Maximum number of characters to return (default: 50000)
+        offset: Character to start at (default: 0)
+        cursor: Cursor from a previous part of the same page (overrides offset)
     
     Returns:
-        The webpage content in markdown format
+        The webpage content (or the requested part of it) in markdown format
     """
-    jina_url = f"https://r.jina.ai/{url}"
-    response = requests.get(jina_url)
-    response.raise_for_status()
-    return response.text
+    if cursor:
+        try:
+            cursor_url, offset = decode_cursor(cursor)
+        except ValueError as e:
+            return str(e)
+        if cursor_url != url:
+            return f"The cursor belongs to {cursor_url}, not {url}"
+    max_chars = max(1, min(max_chars, PAGE_MAX_CHARS))
+    offset = max(0, offset)
+    
+    page = await fetcher.fetch_range(url, offset=offset, max_chars=max_chars)
+    text = page.text
+    if not text and offset > 0:
+        return f"No content at offset {offset}: the page has {page.seen} characters"
+    if not page.has_more:
+        return text
+    
+    end = offset + len(text)
+    total = f"of {page.total_chars}" if page.total_chars is not None else "of more"
+    return (
+        f"{text}\n\n---\n"
+        f"[Characters {offset}-{end} {total}. To continue, call get_page_markdown "
+        f"with cursor=\"{encode_cursor(url, end)}\"]"
+    )
 
 @mcp.tool
-def count_word_in_page(url: str, word: str) -> str:
+async def count_word_in_page(url: str, word: str) -> str:
     """
     Count how many times a specific word appears on a webpage.
     
@@ -44,52 +137,166 @@ def count_word_in_page(url: str, word: str) -> str:
     Returns:
         A message with the count result
     """
-    jina_url = f"https://r.jina.ai/{url}"
-    response = requests.get(jina_url)
-    response.raise_for_status()
-    content = response.text
+    content = await fetcher.fetch(url)
     
     # Count word occurrences (case-insensitive, whole word match)
-    count = len(re.findall(rf'\b{word}\b', content, re.IGNORECASE))
+    count = WordCounter([word]).count(content).get(word, 0)
     
     return f"The word '{word}' appears {count} times on {url}"
 
 @mcp.tool
-def search_documentation(query: str, num_results: int = 5) -> str:
+async def count_words_in_pages(urls: list[str], words: list[str]) -> dict:
+    """
+    Count how many times each of several words appears on each of several webpages.
+    
+    Pages are fetched concurrently and each page is scanned once for all words.
+    Use this instead of calling count_word_in_page for every URL/word pair.
+    
+    Args:
+        urls: The URLs of the webpages to analyze
+        words: The words to count (case-insensitive, whole words)
+    
+    Returns:
+        'counts' maps each URL to a {word: count} mapping; URLs that could
+        not be fetched are listed under 'errors' instead
+    """
+    counter = WordCounter(words)
+    urls = list(dict.fromkeys(urls))
+    
+    results = await asyncio.gather(
+        *(counter.count_stream(fetcher.stream(url)) for url in urls),
+        return_exceptions=True
+    )
+    
+    counts = {}
+    errors = {}
+    for url, result in zip(urls, results):
+        if isinstance(result, Exception):
+            errors[url] = str(result) or type(result).__name__
+        else:
+            counts[url] = result
+    
+    output = {'words': counter.words, 'counts': counts}
+    if errors:
+        output['errors'] = errors
+    return output
+
+@mcp.tool
+async def search_documentation(query: str, num_results: int = 5, corpus: str = DEFAULT_CORPUS) -> str:
     """
-    Search the FastMCP documentation for relevant information.
+    Search the FastMCP documentation (or another documentation corpus) for relevant information.
     
     Args:
         query: The search query (e.g., "how to create a tool", "installation")
-        num_results: Number of results to return (default: 5, max: 10)
+        num_results: Number of results to return (default: 5, min: 1, max: 10)
+        corpus: Which documentation to search (see list_corpora), or "*" for all of them
     
     Returns:
-        Formatted search results with filenames and content previews
+        Formatted search results: the best-matching section of each file,
+        with the query terms highlighted
     """
-    # Limit num_results to max 10
-    num_results = min(num_results, 10)
+    # Limit num_results to 1..10
+    num_results = max(1, min(num_results, 10))
+    
+    if corpus == "*":
+        return await search_all_corpora(query, num_results)
     
-    results = search(doc_index, query, num_results=num_results)
+    try:
+        index = await corpora.wait(corpus, timeout=WARMUP_TIMEOUT)
+    except (UnknownCorpus, WarmingUp, CorpusLoadError) as e:
+        return str(e)
+    
+    results = search_cache.search(index, query, num_results=num_results)
     
     if not results:
         return f"No results found for query: '{query}'"
     
-    # Format the results
-    output = [f"Found {len(results)} results for '{query}':\n"]
-    
-    for i, result in enumerate(results, 1):
-        filename = result['filename']
-        content = result['content']
-        
-        # Get first 200 characters as preview
-        preview = content[:200].replace('\n', ' ').strip()
-        if len(content) > 200:
-            preview += "..."
-        
-        output.append(f"{i}. {filename}")
-        output.append(f"   {preview}\n")
-    
-    return "\n".join(output)
+    # Passage ID is "<filename>#<section>"; the snippet highlights query terms
+    return format_results(results, f"Found {len(results)} results for '{query}':\n")
+
+async def search_all_corpora(query: str, num_results: int) -> str:
+    """
+    Search every corpus and merge the results by normalized score.
+    
+    Corpora are searched one at a time, the loaded ones first, and none of
+    them is unloaded to make room for another. A corpus that is not loaded
+    is only loaded while the memory budget has room left, so with a budget
+    smaller than all corpora together some are skipped rather than every
+    query unloading and reloading indexes.
+    """
+    loaded = corpora.loaded()
+    names = sorted(corpora.names(), key=lambda name: name not in loaded)
+    
+    results_by_corpus = {}
+    skipped = []
+    over_budget = []
+    for name in names:
+        if name not in loaded and sum(corpora.loaded().values()) >= corpora.memory_budget:
+            over_budget.append(name)
+            continue
+        try:
+            index = await corpora.wait(name, timeout=WARMUP_TIMEOUT, keep=[*loaded, *results_by_corpus])
+        except Exception:
+            skipped.append(name)
+            continue
+        results_by_corpus[name] = search_cache.search(index, query, num_results=num_results)
+    results = merge_results(results_by_corpus, num_results)
+    
+    output = []
+    if skipped:
+        output.append(f"Not searched (still loading or failed): {', '.join(skipped)}\n")
+    if over_budget:
+        output.append(f"Not searched (over CORPUS_MEMORY_BUDGET): {', '.join(over_budget)}\n")
+    if not results:
+        output.append(f"No results found for query: '{query}'")
+        return "\n".join(output)
+    
+    output.append(f"Found {len(results)} results for '{query}' in {len(results_by_corpus)} corpora:\n")
+    return format_results(
+        [result for _, result in results],
+        "\n".join(output),
+        labels=[corpus for corpus, _ in results]
+    )
+
+@mcp.tool
+def list_corpora() -> list[str]:
+    """
+    List the documentation corpora that search_documentation can search.
+    
+    Returns:
+        Corpus names (pass one as `corpus` to search_documentation)
+    """
+    return corpora.refresh()
+
+@mcp.resource("stats://server")
+def server_stats() -> dict:
+    """Per-tool call counts, errors, latency, payload sizes and upstream time."""
+    return metrics.snapshot()
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def prometheus_metrics(request: Request) -> PlainTextResponse:
+    """Per-tool metrics for Prometheus (HTTP transports only)."""
+    return PlainTextResponse(metrics.prometheus(), media_type="text/plain; version=0.0.4")
+
+@mcp.resource("stats://page-cache")
+def page_cache_stats() -> dict:
+    """Hit/miss/eviction counters and memory usage of the page cache."""
+    return page_cache.stats()
+
+@mcp.resource("stats://fetcher")
+def fetcher_stats() -> dict:
+    """Upstream requests, coalesced calls and rate limit delays of the page fetcher."""
+    return fetcher.stats()
+
+@mcp.resource("stats://search-cache")
+def search_cache_stats() -> dict:
+    """Hit/miss/eviction counters of the search result cache."""
+    return search_cache.stats()
+
+@mcp.resource("stats://corpora")
+def corpora_stats() -> dict:
+    """Known corpora, loaded indexes and their approximate memory use."""
+    return corpora.stats()
 
 if __name__ == "__main__":
     mcp.run()
\ No newline at end of file
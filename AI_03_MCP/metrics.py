@@ -0,0 +1,251 @@
+import json
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+
+# Upper bounds (seconds) of the latency histogram buckets, Prometheus style
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class CallTimer:
+    """
+    Time one tool call spent waiting on upstream services.
+    
+    Upstream waits can overlap (e.g. concurrent page fetches), so this
+    measures the time with at least one wait in progress, not their sum.
+    """
+    
+    __slots__ = ('upstream', '_in_flight', '_since')
+    
+    def __init__(self):
+        self.upstream = 0.0
+        self._in_flight = 0
+        self._since = 0.0
+    
+    def enter(self) -> None:
+        if self._in_flight == 0:
+            self._since = time.perf_counter()
+        self._in_flight += 1
+    
+    def exit(self) -> None:
+        self._in_flight -= 1
+        if self._in_flight == 0:
+            self.upstream += time.perf_counter() - self._since
+
+class SharedTimer:
+    """
+    Upstream timer of work shared by several tool calls (e.g. one coalesced fetch).
+    
+    Passes its upstream waits on to the timer of every call waiting for the
+    work, including calls that join while a wait is already in progress.
+    """
+    
+    __slots__ = ('timers', '_in_flight')
+    
+    def __init__(self):
+        self.timers: list[CallTimer] = []
+        self._in_flight = 0
+    
+    def enter(self) -> None:
+        if self._in_flight == 0:
+            for timer in self.timers:
+                timer.enter()
+        self._in_flight += 1
+    
+    def exit(self) -> None:
+        self._in_flight -= 1
+        if self._in_flight == 0:
+            for timer in self.timers:
+                timer.exit()
+    
+    def join(self, timer: CallTimer | None) -> None:
+        """Start passing waits on to `timer` (None: not in a tool call)."""
+        if timer is None:
+            return
+        self.timers.append(timer)
+        if self._in_flight:
+            timer.enter()
+    
+    def leave(self, timer: CallTimer | None) -> None:
+        """Stop passing waits on to `timer`."""
+        if timer is None:
+            return
+        self.timers.remove(timer)
+        if self._in_flight:
+            timer.exit()
+
+# Timer of the tool call running in the current context (set by MetricsMiddleware)
+current_call: ContextVar[CallTimer | SharedTimer | None] = ContextVar('current_call', default=None)
+
+@contextmanager
+def upstream() -> Iterator[None]:
+    """
+    Count a block as upstream time of the tool call in progress.
+    
+    Example:
+        with upstream():
+            response = await client.get(url)
+    """
+    timer = current_call.get()
+    if timer is None:
+        yield
+        return
+    timer.enter()
+    try:
+        yield
+    finally:
+        timer.exit()
+
+class ToolStats:
+    """Counters and latency histogram of one tool."""
+    
+    def __init__(self):
+        self.calls = 0
+        self.errors: Counter[str] = Counter()
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.seconds = 0.0
+        self.upstream_seconds = 0.0
+        self.request_chars = 0
+        self.response_chars = 0
+    
+    def record(self, seconds: float, upstream_seconds: float, request_chars: int,
+               response_chars: int, error: str | None = None) -> None:
+        self.calls += 1
+        self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.seconds += seconds
+        self.upstream_seconds += min(upstream_seconds, seconds)
+        self.request_chars += request_chars
+        self.response_chars += response_chars
+        if error is not None:
+            self.errors[error] += 1
+    
+    def quantile(self, q: float) -> float | None:
+        """Approximate latency quantile: the upper bound of the bucket it falls in."""
+        if not self.calls:
+            return None
+        rank = q * self.calls
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+    
+    def snapshot(self) -> dict:
+        calls = self.calls or 1
+        return {
+            'calls': self.calls,
+            'errors': sum(self.errors.values()),
+            'error_types': dict(self.errors),
+            'mean_ms': round(1000 * self.seconds / calls, 3),
+            'p50_ms_le': _ms(self.quantile(0.5)),
+            'p95_ms_le': _ms(self.quantile(0.95)),
+            'p99_ms_le': _ms(self.quantile(0.99)),
+            'upstream_s': round(self.upstream_seconds, 4),
+            'local_s': round(self.seconds - self.upstream_seconds, 4),
+            'mean_request_chars': round(self.request_chars / calls, 1),
+            'mean_response_chars': round(self.response_chars / calls, 1),
+            'latency_buckets': {
+                str(bound): count for bound, count in zip((*LATENCY_BUCKETS, '+Inf'), self.buckets)
+            },
+        }
+
+def _ms(seconds: float | None) -> float | None:
+    return None if seconds is None else round(seconds * 1000, 3)
+
+class ServerMetrics:
+    """Per-tool statistics for the whole server."""
+    
+    def __init__(self):
+        self.tools: dict[str, ToolStats] = {}
+        self.started_at = time.time()
+    
+    def tool(self, name: str) -> ToolStats:
+        if name not in self.tools:
+            self.tools[name] = ToolStats()
+        return self.tools[name]
+    
+    def snapshot(self) -> dict:
+        """Statistics of every tool called so far."""
+        return {
+            'uptime_s': round(time.time() - self.started_at, 1),
+            'tools': {name: stats.snapshot() for name, stats in sorted(self.tools.items())},
+        }
+    
+    def prometheus(self) -> str:
+        """The statistics in the Prometheus text exposition format."""
+        lines = [
+            '# HELP mcp_tool_calls_total Tool calls, including failed ones.',
+            '# TYPE mcp_tool_calls_total counter',
+        ]
+        for name, stats in sorted(self.tools.items()):
+            lines.append(f'mcp_tool_calls_total{{tool="{name}"}} {stats.calls}')
+        
+        lines += ['# HELP mcp_tool_errors_total Tool calls that raised, by exception type.',
+                  '# TYPE mcp_tool_errors_total counter']
+        for name, stats in sorted(self.tools.items()):
+            for error, count in sorted(stats.errors.items()):
+                lines.append(f'mcp_tool_errors_total{{tool="{name}",error="{error}"}} {count}')
+        
+        lines += ['# HELP mcp_tool_duration_seconds Tool call latency.',
+                  '# TYPE mcp_tool_duration_seconds histogram']
+        for name, stats in sorted(self.tools.items()):
+            cumulative = 0
+            for bound, count in zip((*LATENCY_BUCKETS, '+Inf'), stats.buckets):
+                cumulative += count
+                lines.append(f'mcp_tool_duration_seconds_bucket{{tool="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'mcp_tool_duration_seconds_sum{{tool="{name}"}} {stats.seconds:.6f}')
+            lines.append(f'mcp_tool_duration_seconds_count{{tool="{name}"}} {stats.calls}')
+        
+        for metric, attribute, help_text in (
+            ('mcp_tool_upstream_seconds_total', 'upstream_seconds', 'Time tool calls waited on upstream HTTP.'),
+            ('mcp_tool_request_chars_total', 'request_chars', 'Size of tool arguments (JSON characters).'),
+            ('mcp_tool_response_chars_total', 'response_chars', 'Size of tool results (characters).'),
+        ):
+            lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} counter']
+            for name, stats in sorted(self.tools.items()):
+                lines.append(f'{metric}{{tool="{name}"}} {getattr(stats, attribute)}')
+        
+        return '\n'.join(lines) + '\n'
+
+def result_chars(result) -> int:
+    """Size of a tool result: its text blocks, or its structured content as JSON."""
+    if getattr(result, 'structured_content', None) is not None:
+        return len(json.dumps(result.structured_content))
+    return sum(len(getattr(block, 'text', '')) for block in getattr(result, 'content', []))
+
+class MetricsMiddleware(Middleware):
+    """
+    Records every tool call in a ServerMetrics.
+    
+    Cheap enough to leave on: a few counters, one bisect and one
+    ContextVar per call. Fetch code marks its HTTP waits with upstream().
+    """
+    
+    def __init__(self, metrics: ServerMetrics):
+        self.metrics = metrics
+    
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        name = context.message.name
+        request_chars = len(json.dumps(context.message.arguments or {}, default=str))
+        timer = CallTimer()
+        token = current_call.set(timer)
+        start = time.perf_counter()
+        try:
+            result = await call_next(context)
+        except Exception as e:
+            # FastMCP wraps tool exceptions in ToolError; record the original type
+            error = type(e.__cause__ or e).__name__
+            self.metrics.tool(name).record(time.perf_counter() - start, timer.upstream,
+                                           request_chars, 0, error=error)
+            raise
+        finally:
+            current_call.reset(token)
+        
+        self.metrics.tool(name).record(time.perf_counter() - start, timer.upstream,
+                                       request_chars, result_chars(result))
+        return result
@@ -0,0 +1,322 @@
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterator
+
+# Characters per chunk when reading a cached page back piece by piece
+READ_CHUNK_CHARS = 64 * 1024
+
+class CachedPage:
+    """
+    One cached page plus the validators needed to revalidate it.
+    
+    `text` is None for pages kept only on disk (larger than the memory
+    budget); read them with PageCache.iter_text() or PageCache.read_text().
+    """
+    
+    __slots__ = ('text', 'etag', 'last_modified', 'expires_at', 'size', 'chars')
+    
+    def __init__(self, text: str | None, etag: str | None, last_modified: str | None,
+                 expires_at: float, size: int | None = None, chars: int | None = None):
+        self.text = text
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+        self.size = len(text.encode('utf-8')) if text is not None else size
+        self.chars = len(text) if text is not None else chars
+    
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+    
+    def validators(self) -> dict:
+        """Conditional request headers for revalidating this page."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+class PageCache:
+    """
+    Page cache shared by the fetch tools.
+    
+    Pages are kept in an in-memory LRU bounded by total size in bytes, and
+    optionally written through to a directory of files keyed by URL hash so
+    they survive restarts. Every entry has its own expiry time; expired
+    entries are kept so they can be revalidated with ETag/Last-Modified
+    instead of being downloaded again. Pages larger than the memory budget
+    are only kept on disk and read back in chunks.
+    """
+    
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, ttl: float = 300.0,
+                 disk_dir: str | Path | None = None):
+        """
+        Args:
+            max_bytes: Memory budget for cached page text (UTF-8 bytes)
+            ttl: Default seconds an entry stays fresh
+            disk_dir: Directory for the on-disk tier (None keeps memory only)
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+        self._entries: OrderedDict[str, CachedPage] = OrderedDict()
+        self._bytes = 0
+        self.counters = {
+            'hits': 0,          # fresh entry served without a request
+            'misses': 0,        # nothing cached, full download
+            'stale': 0,         # expired entry found, revalidation needed
+            'revalidated': 0,   # server answered 304, cached text reused
+            'evictions': 0,     # entries dropped from memory to stay in budget
+            'disk_hits': 0,     # entries loaded back from the disk tier
+        }
+    
+    def get(self, url: str) -> CachedPage | None:
+        """
+        Look up a page and update the hit/miss/stale counters.
+        
+        Returns:
+            The cached page, fresh or not, or None if nothing is cached
+        """
+        entry = self._entries.get(url)
+        if entry is not None:
+            self._entries.move_to_end(url)
+        else:
+            entry = self._read_disk(url)
+            if entry is not None:
+                self.counters['disk_hits'] += 1
+                self._remember(url, entry)
+        
+        if entry is None:
+            self.counters['misses'] += 1
+        elif entry.fresh:
+            self.counters['hits'] += 1
+        else:
+            self.counters['stale'] += 1
+        return entry
+    
+    def put(self, url: str, text: str, etag: str | None = None,
+            last_modified: str | None = None, ttl: float | None = None) -> CachedPage:
+        """
+        Store a freshly downloaded page.
+        
+        Args:
+            url: Page URL (the cache key)
+            text: Page content
+            etag: ETag response header, if any
+            last_modified: Last-Modified response header, if any
+            ttl: Seconds the entry stays fresh (default: the cache's ttl)
+        """
+        writer = self.writer(url, etag, last_modified, ttl)
+        writer.write(text)
+        return writer.commit() or CachedPage(text, etag, last_modified, writer.expires_at)
+    
+    def writer(self, url: str, etag: str | None = None, last_modified: str | None = None,
+               ttl: float | None = None) -> 'PageWriter':
+        """
+        Start storing a page that is still being downloaded.
+        
+        Feed it with PageWriter.write() and finish with commit(); see put()
+        for the arguments.
+        """
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        return PageWriter(self, url, etag, last_modified, expires_at)
+    
+    def revalidated(self, url: str, entry: CachedPage, ttl: float | None = None) -> None:
+        """Mark a stale entry fresh again after a 304 Not Modified."""
+        entry.expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        self.counters['revalidated'] += 1
+        self._write_meta(url, entry)
+    
+    def iter_text(self, url: str, entry: CachedPage, chunk_chars: int = READ_CHUNK_CHARS) -> Iterator[str]:
+        """
+        Yield the text of a cached page in chunks, from memory or from disk.
+        
+        Raises:
+            OSError: If a disk-only page's file has gone missing
+        """
+        if entry.text is not None:
+            for start in range(0, len(entry.text), chunk_chars):
+                yield entry.text[start:start + chunk_chars]
+            return
+        
+        text_path, _ = self._disk_paths(url)
+        # newline='' so line endings come back exactly as stored
+        with open(text_path, encoding='utf-8', newline='') as f:
+            while chunk := f.read(chunk_chars):
+                yield chunk
+    
+    def read_text(self, url: str, entry: CachedPage) -> str:
+        """The full text of a cached page."""
+        if entry.text is not None:
+            return entry.text
+        return ''.join(self.iter_text(url, entry))
+    
+    def stats(self) -> dict:
+        """Counters plus current memory usage, for sizing the cache."""
+        lookups = self.counters['hits'] + self.counters['misses'] + self.counters['stale']
+        served = self.counters['hits'] + self.counters['revalidated']
+        return {
+            **self.counters,
+            'hit_rate': round(served / lookups, 4) if lookups else 0.0,
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'disk_dir': str(self.disk_dir) if self.disk_dir else None,
+        }
+    
+    def _remember(self, url: str, entry: CachedPage) -> None:
+        old = self._entries.pop(url, None)
+        if old is not None:
+            self._bytes -= old.size
+        # Pages larger than the whole budget only go to disk
+        if entry.text is None or entry.size > self.max_bytes:
+            return
+        
+        self._entries[url] = entry
+        self._bytes += entry.size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self.counters['evictions'] += 1
+    
+    def _disk_paths(self, url: str) -> tuple[Path, Path]:
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return self.disk_dir / f"{key}.md", self.disk_dir / f"{key}.json"
+    
+    def _read_disk(self, url: str) -> CachedPage | None:
+        if not self.disk_dir:
+            return None
+        text_path, meta_path = self._disk_paths(url)
+        try:
+            meta = json.loads(meta_path.read_text(encoding='utf-8'))
+            if meta.get('url') != url:
+                return None
+            size = meta.get('size')
+            if size is None:
+                size = text_path.stat().st_size
+            # Too big for memory: leave the text on disk
+            text = text_path.read_bytes().decode('utf-8') if size <= self.max_bytes else None
+        except (OSError, ValueError):
+            return None
+        return CachedPage(text, meta.get('etag'), meta.get('last_modified'), meta['expires_at'],
+                          size=size, chars=meta.get('chars'))
+    
+    def _write_meta(self, url: str, entry: CachedPage) -> None:
+        if not self.disk_dir:
+            return
+        _, meta_path = self._disk_paths(url)
+        meta = {
+            'url': url,
+            'etag': entry.etag,
+            'last_modified': entry.last_modified,
+            'expires_at': entry.expires_at,
+            'size': entry.size,
+            'chars': entry.chars,
+        }
+        try:
+            meta_path.write_text(json.dumps(meta), encoding='utf-8')
+        except OSError as e:
+            print(f"Could not write page cache entry for {url}: {e}", file=sys.stderr)
+
+class PageWriter:
+    """
+    Stores a page chunk by chunk while it is being downloaded.
+    
+    Chunks go straight to a temporary file in the disk tier; they are also
+    kept in memory only while the page still fits the memory budget, so
+    caching a huge page never holds all of it in memory.
+    """
+    
+    def __init__(self, cache: PageCache, url: str, etag: str | None,
+                 last_modified: str | None, expires_at: float):
+        self.cache = cache
+        self.url = url
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+        self.size = 0
+        self.chars = 0
+        self._chunks: list[str] | None = []
+        self._file = None
+        self._tmp_path = None
+        if cache.disk_dir:
+            text_path, _ = cache._disk_paths(url)
+            self._tmp_path = text_path.with_suffix(f".tmp-{os.getpid()}-{id(self)}")
+            try:
+                self._file = open(self._tmp_path, 'wb')
+            except OSError as e:
+                print(f"Could not write page cache entry for {url}: {e}", file=sys.stderr)
+    
+    @property
+    def active(self) -> bool:
+        """False once the page can be kept neither in memory nor on disk."""
+        return self._chunks is not None or self._file is not None
+    
+    def write(self, chunk: str) -> None:
+        """Add the next piece of the page."""
+        data = chunk.encode('utf-8')
+        self.size += len(data)
+        self.chars += len(chunk)
+        if self._file is not None:
+            try:
+                self._file.write(data)
+            except OSError as e:
+                print(f"Could not write page cache entry for {self.url}: {e}", file=sys.stderr)
+                self._drop_file()
+        if self._chunks is not None:
+            if self.size > self.cache.max_bytes:
+                self._chunks = None
+            else:
+                self._chunks.append(chunk)
+    
+    def commit(self) -> CachedPage | None:
+        """
+        Finish the page and make it visible in the cache.
+        
+        Returns:
+            The new entry, or None if the page could not be kept anywhere
+            (too large for memory and no disk tier)
+        """
+        text = ''.join(self._chunks) if self._chunks is not None else None
+        entry = CachedPage(text, self.etag, self.last_modified, self.expires_at,
+                           size=self.size, chars=self.chars)
+        stored = False
+        if self._file is not None:
+            try:
+                self._file.close()
+                self._file = None
+                text_path, _ = self.cache._disk_paths(self.url)
+                os.replace(self._tmp_path, text_path)
+                self.cache._write_meta(self.url, entry)
+                stored = True
+            except OSError as e:
+                print(f"Could not write page cache entry for {self.url}: {e}", file=sys.stderr)
+                self._drop_file()
+        if text is None and not stored:
+            return None
+        self.cache._remember(self.url, entry)
+        return entry
+    
+    def abort(self) -> None:
+        """Discard the partial page (e.g. the download failed)."""
+        self._chunks = None
+        self._drop_file()
+    
+    def _drop_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._tmp_path is not None:
+            try:
+                os.remove(self._tmp_path)
+            except OSError:
+                pass
+            self._tmp_path = None
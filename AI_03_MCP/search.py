@@ -1,6 +1,56 @@
+import hashlib
+import importlib
+import io
+import json
+import os
+import re
+import shutil
+import sys
+import uuid
 import zipfile
+import zlib
+from array import array
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
-from minsearch import Index
+from typing import Iterable, Iterator
+
+import numpy as np
+from scipy import sparse
+
+from term_index import TermIndex
+
+# Same tokenization as minsearch (scikit-learn's default token pattern)
+TOKEN_PATTERN = re.compile(r'(?u)\b\w\w+\b')
+
+TEXT_FIELDS = ['content', 'filename']
+
+# Markdown ATX headings start a new passage
+HEADING_PATTERN = re.compile(r'^(#{1,6})[ \t]+(.+?)(?:[ \t]+#+)?[ \t]*$')
+FENCE_PATTERN = re.compile(r'^[ \t]*(```|~~~)')
+
+# Sections longer than this are split further at paragraph breaks
+MAX_PASSAGE_CHARS = 2000
+
+# Sections shorter than this (e.g. a heading directly followed by a
+# subheading) are merged into the next one instead of standing alone
+MIN_PASSAGE_CHARS = 200
+
+# Length of the highlighted snippet returned with each result
+SNIPPET_CHARS = 200
+
+# Hybrid search: a hit at rank r adds 1 / (RRF_K + r) to its source's fused
+# score, and each ranking contributes its top RRF_DEPTH sources
+RRF_K = 60
+RRF_DEPTH = 50
+
+# Documents per task in parallel builds: large enough to amortize sending
+# the results back, small enough to keep every worker busy
+SHARD_SIZE = 32
+
+# Bump when the on-disk layout changes so old artifacts get rebuilt
+INDEX_FORMAT_VERSION = 5
 
 def extract_md_files(zip_path: str) -> list[dict]:
     """
@@ -12,78 +62,1435 @@ def extract_md_files(zip_path: str) -> list[dict]:
     Returns:
         List of dictionaries with 'filename' and 'content' fields
     """
-    documents = []
+    return list(iter_md_files(zip_path))
+
+def iter_md_files(zip_path: str) -> Iterator[dict]:
+    """
+    Like extract_md_files(), but yield the documents one at a time.
     
+    Only the member being read is held in memory, so the archive can be
+    fed to create_search_index() without materializing the whole corpus.
+    """
     with zipfile.ZipFile(zip_path, 'r') as zip_file:
-        for file_info in zip_file.namelist():
-            # Check if file is .md or .mdx
-            if file_info.endswith('.md') or file_info.endswith('.mdx'):
-                # Read the file content
-                with zip_file.open(file_info) as f:
-                    content = f.read().decode('utf-8', errors='ignore')
-                
-                # Remove the first part of the path (e.g., "fastmcp-main/")
-                # Split by first slash and join the rest
-                parts = file_info.split('/', 1)
-                if len(parts) > 1:
-                    cleaned_filename = parts[1]
-                else:
-                    cleaned_filename = file_info
-                
-                documents.append({
-                    'filename': cleaned_filename,
-                    'content': content
-                })
-    
-    return documents
-
-def create_search_index(documents: list[dict]) -> Index:
-    """
-    Create and fit a minsearch index with the documents.
+        for info in md_members(zip_file):
+            yield read_md_member(zip_file, info)
+
+def md_members(zip_file: zipfile.ZipFile) -> list[zipfile.ZipInfo]:
+    """The .md and .mdx members of an open zip archive, in archive order."""
+    return [
+        info for info in zip_file.infolist()
+        if info.filename.endswith('.md') or info.filename.endswith('.mdx')
+    ]
+
+def read_md_member(zip_file: zipfile.ZipFile, info: zipfile.ZipInfo) -> dict:
+    """
+    Read one archive member as a document.
+    
+    Args:
+        zip_file: Open zip archive
+        info: The member to read
+    
+    Returns:
+        Dictionary with 'filename' and 'content' fields
+    """
+    # Read the file content, decoding as it is decompressed (newline=''
+    # keeps line endings untouched)
+    with zip_file.open(info) as f:
+        with io.TextIOWrapper(f, encoding='utf-8', errors='ignore', newline='') as text:
+            content = text.read()
+    
+    # Remove the first part of the path (e.g., "fastmcp-main/")
+    # Split by first slash and join the rest
+    parts = info.filename.split('/', 1)
+    if len(parts) > 1:
+        cleaned_filename = parts[1]
+    else:
+        cleaned_filename = info.filename
+    
+    return {
+        'filename': cleaned_filename,
+        'content': content
+    }
+
+def member_key(info: zipfile.ZipInfo) -> list:
+    """Name, CRC and size of a member; a member changed if its key did."""
+    return [info.filename, info.CRC, info.file_size]
+
+def tokenize(text: str) -> list[str]:
+    """
+    Split text into lowercase terms of at least two characters.
+    
+    Args:
+        text: Text to tokenize
+    
+    Returns:
+        List of terms in document order
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+def slugify(heading: str) -> str:
+    """GitHub-style anchor for a heading ("Running the Server" -> "running-the-server")."""
+    return re.sub(r'[^\w]+', '-', heading.lower()).strip('-_')
+
+def split_passages(document: dict, source: int = 0,
+                   max_chars: int = MAX_PASSAGE_CHARS) -> list[dict]:
+    """
+    Split a markdown document into heading-aware passages.
+    
+    Every heading (outside fenced code blocks) starts a new passage, except
+    that sections shorter than MIN_PASSAGE_CHARS are merged into the next
+    one. Passages longer than max_chars are split again at paragraph breaks.
+    Passages reference the document by offsets instead of copying its text.
+    
+    Passage IDs are "<filename>#<heading-anchor>", with "-2", "-3"... for
+    repeated headings and ":2", ":3"... for the parts of a split section,
+    so they stay stable as long as the document's structure does.
     
     Args:
-        documents: List of dictionaries with 'filename' and 'content' fields
+        document: Dictionary with 'filename' and 'content' fields
+        source: Position of the document in the index's sources
+        max_chars: Maximum passage length before splitting
     
     Returns:
-        Fitted minsearch Index
+        List of passages with 'id', 'source', 'filename', 'heading',
+        'start' and 'end' fields
+    """
+    filename = document['filename']
+    content = document['content']
+    
+    # (start offset, heading) of every section
+    sections = [(0, '')]
+    offset = 0
+    in_fence = False
+    for line in content.splitlines(keepends=True):
+        if FENCE_PATTERN.match(line):
+            in_fence = not in_fence
+        elif not in_fence:
+            match = HEADING_PATTERN.match(line.rstrip('\r\n'))
+            if match:
+                section_start, section_heading = sections[-1]
+                if not content[section_start:offset].strip():
+                    sections[-1] = (section_start, match.group(2))
+                elif offset - section_start >= MIN_PASSAGE_CHARS:
+                    sections.append((offset, match.group(2)))
+        offset += len(line)
+    
+    passages = []
+    anchors = Counter()
+    for i, (start, heading) in enumerate(sections):
+        end = sections[i + 1][0] if i + 1 < len(sections) else len(content)
+        if not content[start:end].strip():
+            continue
+        
+        anchor = slugify(heading)
+        anchors[anchor] += 1
+        if anchors[anchor] > 1:
+            anchor = f"{anchor}-{anchors[anchor]}"
+        base_id = f"{filename}#{anchor}" if anchor else filename
+        
+        for part, (part_start, part_end) in enumerate(split_section(content, start, end, max_chars), 1):
+            passages.append({
+                'id': base_id if part == 1 else f"{base_id}:{part}",
+                'source': source,
+                'filename': filename,
+                'heading': heading,
+                'start': part_start,
+                'end': part_end,
+            })
+    
+    return passages
+
+def split_section(content: str, start: int, end: int, max_chars: int) -> list[tuple[int, int]]:
+    """Split content[start:end] into spans of at most max_chars, preferring paragraph breaks."""
+    spans = []
+    while end - start > max_chars:
+        cut = content.rfind('\n\n', start + max_chars // 2, start + max_chars)
+        cut = cut + 2 if cut != -1 else start + max_chars
+        spans.append((start, cut))
+        start = cut
+    spans.append((start, end))
+    return spans
+
+def highlight_snippet(text: str, query: str, width: int = SNIPPET_CHARS) -> str:
+    """
+    Pick the part of a passage with the most query terms and highlight them.
+    
+    Args:
+        text: Passage text
+        query: Search query string
+        width: Approximate snippet length in characters
+    
+    Returns:
+        Single-line snippet with query terms wrapped in **bold**
+    """
+    terms = set(tokenize(query))
+    hits = [match.span() for match in TOKEN_PATTERN.finditer(text) if match.group().lower() in terms]
+    
+    # Window that starts at a hit and covers the most hits
+    start = 0
+    if hits:
+        best, best_count, last = 0, 0, 0
+        for first in range(len(hits)):
+            while last < len(hits) and hits[last][0] < hits[first][0] + width:
+                last += 1
+            if last - first > best_count:
+                best, best_count = first, last - first
+        # Leave a little context before the first highlighted term
+        start = max(0, hits[best][0] - width // 5)
+        space = text.find(' ', start)
+        if start > 0 and space != -1 and space < hits[best][0]:
+            start = space + 1
+    end = min(len(text), start + width)
+    
+    pieces = []
+    pos = start
+    for hit_start, hit_end in hits:
+        if hit_start < start:
+            continue
+        if hit_start >= end:
+            break
+        end = max(end, hit_end)
+        pieces.append(text[pos:hit_start])
+        pieces.append(f"**{text[hit_start:hit_end]}**")
+        pos = hit_end
+    pieces.append(text[pos:end])
+    
+    snippet = ' '.join(''.join(pieces).split())
+    if start > 0:
+        snippet = '...' + snippet
+    if end < len(text):
+        snippet += '...'
+    return snippet
+
+class FieldIndex:
+    """
+    Vocabulary, postings and TF-IDF term weights for one text field.
+    
+    Weights use the same smoothed IDF and L2 normalization as minsearch,
+    so scores (and rankings) match a fitted minsearch Index.
+    
+    Attributes:
+        terms: Vocabulary, sorted; a term's position is its column
+        vocabulary: Mapping from term to column
+        df: Number of documents containing each term
+        idf: Inverse document frequency per term
+        counts: Document x term matrix of raw term frequencies (CSR)
+        postings: Term x document matrix of normalized TF-IDF weights (CSR)
+    """
+    
+    def __init__(self, terms: list[str], df: np.ndarray, idf: np.ndarray,
+                 counts: sparse.csr_matrix, postings: sparse.csr_matrix):
+        self.terms = terms
+        self.vocabulary = {term: i for i, term in enumerate(terms)}
+        self.df = df
+        self.idf = idf
+        self.counts = counts
+        self.postings = postings
+    
+    @classmethod
+    def from_texts(cls, texts: Iterable[str]) -> 'FieldIndex':
+        """Tokenize texts and build the field index."""
+        builder = FieldBuilder()
+        for text in texts:
+            builder.add(text)
+        return builder.build()
+    
+    @classmethod
+    def from_counts(cls, terms: list[str], counts: sparse.csr_matrix,
+                    df: np.ndarray | None = None) -> 'FieldIndex':
+        """
+        Compute IDF and normalized term weights from raw term counts.
+        
+        Args:
+            terms: Vocabulary in column order
+            counts: Document x term matrix of raw term frequencies
+            df: Document frequencies, if already known (counted from `counts` otherwise)
+        """
+        num_docs = counts.shape[0]
+        if df is None:
+            df = np.bincount(counts.indices, minlength=len(terms))
+        idf = np.log((1 + num_docs) / (1 + df)) + 1
+        
+        weights = counts.astype(np.float64) @ sparse.diags(idf)
+        norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        weights = sparse.diags(1.0 / norms) @ weights
+        
+        postings = sparse.csr_matrix(weights.T)
+        postings.sort_indices()
+        return cls(terms, df, idf, counts, postings)
+    
+    def update(self, rows: list[int | str]) -> 'FieldIndex':
+        """
+        Build a new field index from kept rows of this one plus new texts.
+        
+        Only the new texts are tokenized. Document frequencies are adjusted
+        by the rows that were dropped or added instead of being recounted;
+        term weights are then recomputed for every row, because a changed
+        document count changes every IDF. The result is identical to a full
+        rebuild over the same texts in the same order.
+        
+        Args:
+            rows: The new rows in order; an int keeps that row of this index,
+                a str is the text of a new or changed document
+        
+        Returns:
+            The updated FieldIndex
+        """
+        kept = [row for row in rows if isinstance(row, int)]
+        new_counters = [Counter(tokenize(row)) for row in rows if isinstance(row, str)]
+        
+        # Drop the statistics of rows that are gone (removed or changed)...
+        df = np.array(self.df, dtype=np.int64)
+        dropped = np.setdiff1d(np.arange(self.counts.shape[0]), kept)
+        if len(dropped):
+            df -= np.bincount(self.counts[dropped].indices, minlength=len(df))
+        
+        # ...and add those of the new rows
+        new_df = Counter()
+        for counter in new_counters:
+            new_df.update(counter.keys())
+        
+        # Vocabulary of a full rebuild: terms still in use, sorted
+        terms = sorted({self.terms[i] for i in np.flatnonzero(df)} | set(new_df))
+        vocabulary = {term: i for i, term in enumerate(terms)}
+        remap = np.array([vocabulary.get(term, -1) for term in self.terms], dtype=np.int32)
+        
+        merged_df = np.zeros(len(terms), dtype=np.int64)
+        alive = np.flatnonzero(df)
+        merged_df[remap[alive]] = df[alive]
+        for term, count in new_df.items():
+            merged_df[vocabulary[term]] += count
+        
+        new_rows = iter(new_counters)
+        indptr = self.counts.indptr
+        row_parts = []
+        for row in rows:
+            if isinstance(row, int):
+                start, end = indptr[row], indptr[row + 1]
+                row_parts.append((remap[self.counts.indices[start:end]], self.counts.data[start:end]))
+            else:
+                row_parts.append(counter_row(next(new_rows), vocabulary))
+        
+        counts = counts_matrix(row_parts, len(terms))
+        return FieldIndex.from_counts(terms, counts, df=merged_df)
+    
+    def query_counts(self, queries_terms: list[list[str] | dict[str, float]]) -> sparse.csr_matrix:
+        """
+        Query x term matrix of term counts, ignoring out-of-vocabulary terms.
+        
+        Args:
+            queries_terms: Tokenized queries, or mappings from term to a
+                possibly fractional count (see TermIndex.expand())
+        """
+        vocabulary = self.vocabulary
+        indptr = np.zeros(len(queries_terms) + 1, dtype=np.int32)
+        columns = []
+        counts = []
+        for row, query_terms in enumerate(queries_terms):
+            if not isinstance(query_terms, dict):
+                query_terms = Counter(query_terms)
+            for term, count in query_terms.items():
+                column = vocabulary.get(term)
+                if column is not None:
+                    columns.append(column)
+                    counts.append(count)
+            indptr[row + 1] = len(columns)
+        
+        matrix = sparse.csr_matrix(
+            (np.array(counts, dtype=np.float64), np.array(columns, dtype=np.int32), indptr),
+            shape=(len(queries_terms), len(self.terms))
+        )
+        matrix.sort_indices()
+        return matrix
+
+class FieldBuilder:
+    """
+    Builds a FieldIndex one text at a time.
+    
+    Each text is reduced to (columns, counts) arrays as soon as it is added,
+    so the text itself can be dropped. Columns are numbered in order of first
+    appearance while building and remapped to the sorted vocabulary at the end.
+    """
+    
+    def __init__(self):
+        self.vocabulary: dict[str, int] = {}
+        self.rows: list[tuple[np.ndarray, np.ndarray]] = []
+    
+    def add(self, text: str) -> None:
+        """Tokenize one text and count its terms."""
+        counter = Counter(tokenize(text))
+        vocabulary = self.vocabulary
+        new_terms = [term for term in counter if term not in vocabulary]
+        vocabulary.update(zip(new_terms, range(len(vocabulary), len(vocabulary) + len(new_terms))))
+        self.rows.append(counter_row(counter, self.vocabulary))
+    
+    def merge(self, other: 'FieldBuilder') -> None:
+        """Append the rows counted by another builder, translating its columns."""
+        vocabulary = self.vocabulary
+        new_terms = [term for term in other.vocabulary if term not in vocabulary]
+        vocabulary.update(zip(new_terms, range(len(vocabulary), len(vocabulary) + len(new_terms))))
+        remap = np.fromiter((vocabulary[term] for term in other.vocabulary),
+                            dtype=np.int32, count=len(other.vocabulary))
+        self.rows.extend((remap[columns], counts) for columns, counts in other.rows)
+    
+    def __getstate__(self) -> dict:
+        # One array per row is slow to pickle; send them concatenated
+        lengths = np.fromiter((len(columns) for columns, _ in self.rows), dtype=np.int64, count=len(self.rows))
+        return {
+            'terms': list(self.vocabulary),
+            'lengths': lengths,
+            'columns': np.concatenate([columns for columns, _ in self.rows]) if self.rows else np.zeros(0, dtype=np.int32),
+            'counts': np.concatenate([counts for _, counts in self.rows]) if self.rows else np.zeros(0, dtype=np.int32),
+        }
+    
+    def __setstate__(self, state: dict) -> None:
+        self.vocabulary = {term: i for i, term in enumerate(state['terms'])}
+        self.rows = []
+        if len(state['lengths']):
+            splits = np.cumsum(state['lengths'])[:-1]
+            self.rows = list(zip(np.split(state['columns'], splits), np.split(state['counts'], splits)))
+    
+    def build(self) -> FieldIndex:
+        """Remap columns to the sorted vocabulary and compute the weights."""
+        terms = sorted(self.vocabulary)
+        remap = np.empty(len(terms), dtype=np.int32)
+        remap[[self.vocabulary[term] for term in terms]] = np.arange(len(terms), dtype=np.int32)
+        rows = [(remap[columns], counts) for columns, counts in self.rows]
+        return FieldIndex.from_counts(terms, counts_matrix(rows, len(terms)))
+
+class TfidfScorer:
+    """
+    TF-IDF cosine similarity, scored exactly like minsearch (the default backend).
+    
+    Uses the normalized weights stored in each FieldIndex, so it needs no
+    setup after an index is loaded.
+    """
+    
+    name = 'tfidf'
+    
+    def __init__(self, fields: dict[str, FieldIndex]):
+        self.fields = fields
+    
+    def score_many(self, queries_terms: list[list[str] | dict[str, float]], boost_dict: dict) -> sparse.csr_matrix:
+        """
+        Score many queries against every passage in one sparse product per field.
+        
+        Args:
+            queries_terms: Tokenized queries or term weights (see FieldIndex.query_counts())
+            boost_dict: Per-field score multipliers (default 1.0)
+        
+        Returns:
+            Query x passage matrix of scores
+        """
+        scores = None
+        for name, field in self.fields.items():
+            weights = field.query_counts(queries_terms) @ sparse.diags(field.idf)
+            norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=1)).ravel())
+            norms[norms == 0] = 1.0
+            weights = sparse.diags(boost_dict.get(name, 1) / norms) @ weights
+            
+            field_scores = weights @ field.postings
+            scores = field_scores if scores is None else scores + field_scores
+        return sparse.csr_matrix(scores)
+
+# Scoring backends: name -> (module, class). Loaded lazily so optional
+# backends do not slow down (or break) the default one.
+BACKENDS = {
+    'tfidf': ('search', 'TfidfScorer'),
+    'bm25': ('bm25', 'BM25Scorer'),
+}
+
+def get_backend(name: str) -> type:
     """
-    # Create index with content as text field and filename as keyword field
-    index = Index(
-        text_fields=['content', 'filename'],
-        keyword_fields=[]
+    Look up a scoring backend class by name.
+    
+    Raises:
+        ValueError: If there is no backend with that name
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown search backend '{name}', expected one of {sorted(BACKENDS)}")
+    module_name, class_name = BACKENDS[name]
+    if module_name == 'search':
+        return globals()[class_name]
+    return getattr(importlib.import_module(module_name), class_name)
+
+def counter_row(counter: Counter, vocabulary: dict[str, int]) -> tuple[np.ndarray, np.ndarray]:
+    """Turn a term Counter into (columns, counts) arrays."""
+    columns = np.fromiter((vocabulary[term] for term in counter), dtype=np.int32, count=len(counter))
+    counts = np.fromiter(counter.values(), dtype=np.int32, count=len(counter))
+    return columns, counts
+
+def counts_matrix(rows: list[tuple[np.ndarray, np.ndarray]], num_terms: int) -> sparse.csr_matrix:
+    """Stack (columns, counts) rows into a document x term CSR matrix with sorted columns."""
+    indptr = np.zeros(len(rows) + 1, dtype=np.int32)
+    np.cumsum([len(columns) for columns, _ in rows], out=indptr[1:])
+    indices = np.concatenate([columns for columns, _ in rows]) if rows else np.zeros(0, dtype=np.int32)
+    data = np.concatenate([counts for _, counts in rows]) if rows else np.zeros(0, dtype=np.int32)
+    
+    counts = sparse.csr_matrix(
+        (data.astype(np.int32), indices.astype(np.int32), indptr),
+        shape=(len(rows), num_terms)
     )
+    counts.sort_indices()
+    return counts
+
+class DocumentStore:
+    """
+    Source texts kept zlib-compressed, one blob per document.
     
-    # Fit the index with documents
-    index.fit(documents)
+    The index only needs the text to show passages and snippets, so
+    documents are compressed as they are indexed and decompressed on
+    demand. Saved as one file of concatenated blobs plus their offsets,
+    which are memory-mapped on load.
+    """
     
-    return index
+    def __init__(self, data: bytes | np.ndarray = b'', offsets: array | np.ndarray | None = None):
+        """
+        Args:
+            data: Concatenated compressed blobs
+            offsets: Start of every blob plus the end of the last one
+        """
+        self.data = bytearray(data) if isinstance(data, bytes) else data
+        # Loaded offsets stay a memory-mapped array; indexing it reads only the entries used
+        self.offsets = offsets if offsets is not None else array('q', [0])
+    
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+    
+    def append(self, text: str) -> None:
+        """Compress and store the text of the next document."""
+        # Level 1: most of the size reduction at a fraction of the cost
+        self.append_raw(zlib.compress(text.encode('utf-8'), 1))
+    
+    def append_raw(self, blob: bytes) -> None:
+        """Store an already compressed blob (e.g. copied from another store)."""
+        # Loaded stores are read-only memory maps; copy before growing
+        if not isinstance(self.data, bytearray):
+            self.data = bytearray(self.data)
+        if not isinstance(self.offsets, array):
+            self.offsets = array('q', self.offsets)
+        self.data += blob
+        self.offsets.append(len(self.data))
+    
+    def extend(self, other: 'DocumentStore') -> None:
+        """Append all documents of another store."""
+        for i in range(len(other)):
+            self.append_raw(other.raw(i))
+    
+    def raw(self, i: int) -> bytes:
+        """The compressed blob of document `i`."""
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]])
+    
+    def get(self, i: int) -> str:
+        """The text of document `i`."""
+        return zlib.decompress(self.raw(i)).decode('utf-8')
+    
+    def save(self, path: Path) -> None:
+        """Write contents.bin and contents.offsets.npy into a directory."""
+        (path / 'contents.bin').write_bytes(bytes(self.data))
+        np.save(path / 'contents.offsets.npy', np.asarray(self.offsets, dtype=np.int64))
+    
+    @classmethod
+    def load(cls, path: Path) -> 'DocumentStore':
+        """Memory-map a store written by save()."""
+        offsets = np.load(path / 'contents.offsets.npy', mmap_mode='r')
+        # np.memmap refuses empty files
+        if (path / 'contents.bin').stat().st_size == 0:
+            return cls(b'', offsets)
+        return cls(np.memmap(path / 'contents.bin', dtype=np.uint8, mode='r'), offsets)
+
+class StringColumn:
+    """
+    Strings stored back to back as UTF-8 in one buffer, plus their offsets.
+    
+    Far smaller than a list of str (no per-object overhead), and an item
+    can be read as a memoryview slice without decoding it. Grows while an
+    index is built; loaded columns are read-only memory maps.
+    """
+    
+    def __init__(self, data: bytes | np.ndarray = b'', offsets: array | np.ndarray | None = None):
+        """
+        Args:
+            data: Concatenated UTF-8 strings
+            offsets: Start of every string plus the end of the last one
+        """
+        self.data = bytearray(data) if isinstance(data, bytes) else data
+        self.offsets = offsets if offsets is not None else array('q', [0])
+    
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+    
+    def __eq__(self, other: object) -> bool:
+        return (isinstance(other, StringColumn) and bytes(self.data) == bytes(other.data)
+                and np.array_equal(self.offsets, other.offsets))
+    
+    def append(self, text: str) -> None:
+        if not isinstance(self.data, bytearray):
+            # Loaded columns are read-only memory maps; copy before growing
+            self.data = bytearray(self.data)
+            self.offsets = array('q', self.offsets)
+        self.data += text.encode('utf-8')
+        self.offsets.append(len(self.data))
+    
+    def extend(self, other: 'StringColumn') -> None:
+        for i in range(len(other)):
+            self.append(other.get(i))
+    
+    def view(self, i: int) -> memoryview:
+        """The UTF-8 bytes of string `i`, without copying them."""
+        return memoryview(self.data)[self.offsets[i]:self.offsets[i + 1]]
+    
+    def get(self, i: int) -> str:
+        return str(self.view(i), 'utf-8')
+    
+    def nbytes(self) -> int:
+        return len(self.data) + 8 * len(self.offsets)
+    
+    def save(self, path: Path, name: str) -> None:
+        """Write <name>.bin and <name>.offsets.npy into a directory."""
+        (path / f"{name}.bin").write_bytes(bytes(self.data))
+        np.save(path / f"{name}.offsets.npy", np.asarray(self.offsets, dtype=np.int64))
+    
+    @classmethod
+    def load(cls, path: Path, name: str) -> 'StringColumn':
+        """Memory-map a column written by save()."""
+        offsets = np.load(path / f"{name}.offsets.npy", mmap_mode='r')
+        # np.memmap refuses empty files
+        if (path / f"{name}.bin").stat().st_size == 0:
+            return cls(b'', offsets)
+        return cls(np.memmap(path / f"{name}.bin", dtype=np.uint8, mode='r'), offsets)
 
-def search(index: Index, query: str, num_results: int = 5) -> list[dict]:
+class PassageTable:
     """
-    Search the index and retrieve the most relevant documents.
+    The passages of an index, stored column by column.
+    
+    Holds what split_passages() returns except the filename, which is kept
+    once per source in SearchIndex.filenames.
+    
+    Attributes:
+        ids: Passage IDs
+        headings: Section headings
+        source: Source (document) number of each passage
+        start: Start offset of each passage in its document
+        end: End offset of each passage in its document
+    """
+    
+    NUMBER_COLUMNS = ('source', 'start', 'end')
+    
+    def __init__(self, ids: StringColumn | None = None, headings: StringColumn | None = None,
+                 source: array | np.ndarray | None = None, start: array | np.ndarray | None = None,
+                 end: array | np.ndarray | None = None):
+        self.ids = ids if ids is not None else StringColumn()
+        self.headings = headings if headings is not None else StringColumn()
+        self.source = source if source is not None else array('i')
+        self.start = start if start is not None else array('i')
+        self.end = end if end is not None else array('i')
+    
+    def __len__(self) -> int:
+        return len(self.source)
+    
+    def __eq__(self, other: object) -> bool:
+        return (isinstance(other, PassageTable) and self.ids == other.ids
+                and self.headings == other.headings
+                and all(np.array_equal(getattr(self, name), getattr(other, name))
+                        for name in self.NUMBER_COLUMNS))
+    
+    def append(self, id: str, heading: str, source: int, start: int, end: int) -> None:
+        if not isinstance(self.source, array):
+            for name in self.NUMBER_COLUMNS:
+                setattr(self, name, array('i', getattr(self, name)))
+        self.ids.append(id)
+        self.headings.append(heading)
+        self.source.append(source)
+        self.start.append(start)
+        self.end.append(end)
+    
+    def add(self, passage: dict) -> None:
+        """Append a passage from split_passages()."""
+        self.append(passage['id'], passage['heading'], passage['source'], passage['start'], passage['end'])
+    
+    def copy(self, other: 'PassageTable', row: int, source: int) -> None:
+        """Append a row of another table, moved to another source number."""
+        self.append(other.ids.get(row), other.headings.get(row), source,
+                    int(other.start[row]), int(other.end[row]))
+    
+    def extend(self, other: 'PassageTable', source_offset: int = 0) -> None:
+        """Append all rows of another table, shifting their source numbers."""
+        for row in range(len(other)):
+            self.copy(other, row, int(other.source[row]) + source_offset)
+    
+    def nbytes(self) -> int:
+        return (self.ids.nbytes() + self.headings.nbytes()
+                + sum(4 * len(getattr(self, name)) for name in self.NUMBER_COLUMNS))
+    
+    def save(self, path: Path) -> None:
+        """Write the passages.* files into a directory."""
+        self.ids.save(path, 'passages.ids')
+        self.headings.save(path, 'passages.headings')
+        for name in self.NUMBER_COLUMNS:
+            np.save(path / f"passages.{name}.npy", np.asarray(getattr(self, name), dtype=np.int32))
+    
+    @classmethod
+    def load(cls, path: Path) -> 'PassageTable':
+        """Memory-map a table written by save()."""
+        return cls(
+            StringColumn.load(path, 'passages.ids'),
+            StringColumn.load(path, 'passages.headings'),
+            *(np.load(path / f"passages.{name}.npy", mmap_mode='r') for name in cls.NUMBER_COLUMNS)
+        )
+
+class SearchResult:
+    """
+    One search hit: a passage row of a SearchIndex plus its score.
+    
+    Fields are read from the index's columns when accessed, so a result
+    costs a few pointers rather than a dict of strings. For compatibility
+    it also reads like the dicts search() used to return: result['id'],
+    dict(result) and {**result} all work.
+    """
+    
+    __slots__ = ('index', 'row', 'score', 'snippet')
+    
+    KEYS = ('id', 'source', 'filename', 'heading', 'start', 'end', 'score', 'snippet')
+    
+    def __init__(self, index: 'SearchIndex', row: int, score: float, snippet: str | None = None):
+        self.index = index
+        self.row = row
+        self.score = score
+        self.snippet = snippet
+    
+    @property
+    def id(self) -> str:
+        return self.index.passages.ids.get(self.row)
+    
+    @property
+    def source(self) -> int:
+        return int(self.index.passages.source[self.row])
+    
+    @property
+    def filename(self) -> str:
+        return self.index.filenames.get(self.source)
+    
+    @property
+    def heading(self) -> str:
+        return self.index.passages.headings.get(self.row)
+    
+    @property
+    def start(self) -> int:
+        return int(self.index.passages.start[self.row])
+    
+    @property
+    def end(self) -> int:
+        return int(self.index.passages.end[self.row])
+    
+    @property
+    def text(self) -> str:
+        return self.index.passage_text(self.row)
+    
+    def id_view(self) -> memoryview:
+        """The passage ID as UTF-8 bytes, straight from the index's buffer."""
+        return self.index.passages.ids.view(self.row)
+    
+    def keys(self) -> tuple[str, ...]:
+        return self.KEYS if self.snippet is not None else self.KEYS[:-1]
+    
+    def __getitem__(self, key: str):
+        if key not in self.keys():
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def __repr__(self) -> str:
+        return f"SearchResult(id={self.id!r}, score={self.score:.4f})"
+
+def format_results(results: list[SearchResult], header: str, labels: list[str] | None = None) -> str:
+    """
+    Numbered list of results with their IDs and snippets, under a header.
+    
+    Passage IDs are copied from the index's buffer as bytes and the text is
+    decoded once at the end, so no string is built per hit but the snippet.
+    
+    Args:
+        results: Results of search(), with snippets
+        header: First line(s) of the output
+        labels: Optional label shown in brackets before each ID (e.g. the corpus)
+    """
+    output = bytearray(header.encode('utf-8'))
+    for i, result in enumerate(results):
+        output += b'\n%d. ' % (i + 1)
+        if labels is not None:
+            output += b'[%s] ' % labels[i].encode('utf-8')
+        output += result.id_view()
+        output += b'\n   '
+        output += result.snippet.encode('utf-8')
+        output += b'\n'
+    return output.decode('utf-8')
+
+def reciprocal_rank_fusion(rankings: list[list[SearchResult]], num_results: int,
+                           k: int = RRF_K) -> list[SearchResult]:
+    """
+    Merge rankings of the same index by reciprocal rank.
+    
+    Every source scores the sum of 1 / (k + rank) over the rankings it
+    appears in, so only ranks matter, not the incomparable raw scores.
+    Each source is shown with the passage that ranked highest for it
+    (the earlier ranking wins ties).
     
     Args:
-        index: The fitted minsearch Index
+        rankings: Results of the same query, one list per retrieval method
+        num_results: Maximum number of results to return
+        k: Damping constant; larger values flatten the gap between ranks
+    
+    Returns:
+        Results with the fused score as 'score', best first
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, result in enumerate(ranking, 1):
+            entry = fused.get(result.source)
+            if entry is None:
+                fused[result.source] = [1 / (k + rank), rank, result]
+                continue
+            entry[0] += 1 / (k + rank)
+            if rank < entry[1]:
+                entry[1], entry[2] = rank, result
+    
+    # Stable sort: equal scores keep the order of first appearance
+    best = sorted(fused.values(), key=lambda entry: -entry[0])[:num_results]
+    return [SearchResult(result.index, result.row, score) for score, _, result in best]
+
+class IndexBuilder:
+    """
+    Builds a SearchIndex one document at a time.
+    
+    Each document is split into passages, tokenized into the field builders
+    and compressed into the DocumentStore as soon as it is added; nothing
+    keeps the raw text around, so peak memory stays close to the size of
+    the finished index rather than the decompressed corpus.
+    """
+    
+    def __init__(self):
+        self.filenames = StringColumn()
+        self.store = DocumentStore()
+        self.passages = PassageTable()
+        self.fields = {name: FieldBuilder() for name in TEXT_FIELDS}
+        self.members: list[list] = []
+    
+    def add(self, document: dict, member: list | None = None) -> None:
+        """
+        Index one document.
+        
+        Args:
+            document: Dictionary with 'filename' and 'content' fields
+            member: member_key() of the zip member the document came from
+        """
+        source = len(self.filenames)
+        self.filenames.append(document['filename'])
+        self.store.append(document['content'])
+        if member is not None:
+            self.members.append(member)
+        
+        for passage in split_passages(document, source):
+            self.passages.add(passage)
+            for name, builder in self.fields.items():
+                builder.add(passage_field(document, passage, name))
+    
+    def merge(self, other: 'IndexBuilder') -> None:
+        """Append the documents indexed by another builder (e.g. a worker's shard)."""
+        offset = len(self.filenames)
+        self.filenames.extend(other.filenames)
+        self.store.extend(other.store)
+        self.members.extend(other.members)
+        self.passages.extend(other.passages, source_offset=offset)
+        for name, builder in self.fields.items():
+            builder.merge(other.fields[name])
+    
+    def build(self) -> 'SearchIndex':
+        """Finish the field indexes and return the SearchIndex."""
+        fields = {name: builder.build() for name, builder in self.fields.items()}
+        # Members are only useful if every document has one
+        members = self.members if len(self.members) == len(self.filenames) else None
+        return SearchIndex(self.filenames, self.store, self.passages, fields, members)
+
+class SearchIndex:
+    """
+    Passage-level search index with TF-IDF scoring per text field.
+    
+    Documents (sources) are split into heading-aware passages and each
+    passage is indexed on its own, so a long document no longer loses to a
+    short one just because its relevant section is diluted. Documents and
+    passages are stored in columns (see StringColumn and PassageTable), and
+    results are SearchResult views into them. The index can be written to
+    disk and memory-mapped back without re-tokenizing or parsing.
+    
+    Attributes:
+        filenames: Filename of each source (indexed document), in index order
+        store: Compressed source texts, one per source
+        passages: Passages from split_passages(), one per index row
+        fields: Mapping from text field name to its FieldIndex (rows = passages)
+        members: For indexes built from a zip, the member_key() of each
+            source's archive member (used for incremental updates)
+        scorer: Scoring backend (TfidfScorer unless chosen with with_backend())
+        term_index: TermIndex over all fields' terms, used to expand unknown
+            query terms (built on first use)
+        vectors: Passage embeddings for hybrid search (see with_vectors()), or None
+        version: Unique ID of this index object; results cached for one
+            version are never served for another (see search_cache.py)
+    """
+    
+    def __init__(self, filenames: StringColumn, store: DocumentStore, passages: PassageTable,
+                 fields: dict[str, FieldIndex], members: list[list] | None = None):
+        self.filenames = filenames
+        self.store = store
+        self.passages = passages
+        self.fields = fields
+        self.members = members
+        self.scorer = TfidfScorer(fields)
+        self.version = uuid.uuid4().hex
+        self.vectors = None
+        self._term_index: TermIndex | None = None
+    
+    @property
+    def term_index(self) -> TermIndex:
+        if self._term_index is None:
+            self._term_index = TermIndex.from_fields(self.fields)
+        return self._term_index
+    
+    def with_backend(self, name: str, **params) -> 'SearchIndex':
+        """
+        Return a view of this index that scores with another backend.
+        
+        The passages and postings are shared; only the scorer differs.
+        
+        Args:
+            name: Backend name from BACKENDS ('tfidf' or 'bm25')
+            **params: Backend parameters (e.g. k1 and b for BM25)
+        """
+        index = SearchIndex(self.filenames, self.store, self.passages, self.fields, self.members)
+        index.scorer = get_backend(name)(self.fields, **params)
+        index.vectors = self.vectors
+        index._term_index = self._term_index
+        return index
+    
+    def with_vectors(self, vectors) -> 'SearchIndex':
+        """
+        Return a view of this index that searches in hybrid mode.
+        
+        Lexical results are fused with a nearest-neighbour search over
+        passage embeddings by reciprocal rank (see reciprocal_rank_fusion()),
+        so paraphrased questions still find passages that share few words
+        with them.
+        
+        Args:
+            vectors: embeddings.VectorIndex built from this index
+        """
+        index = SearchIndex(self.filenames, self.store, self.passages, self.fields, self.members)
+        index.scorer = self.scorer
+        index.vectors = vectors
+        index._term_index = self._term_index
+        return index
+    
+    def nbytes(self) -> int:
+        """
+        Approximate memory footprint: arrays, compressed texts and passage columns.
+        
+        Memory-mapped arrays are counted in full even if only partly resident.
+        """
+        total = len(self.store.data) + 8 * len(self.store.offsets)
+        for field in self.fields.values():
+            total += np.asarray(field.idf).nbytes + np.asarray(field.df).nbytes
+            total += sum(len(term) + 50 for term in field.terms)
+            for matrix in (field.counts, field.postings):
+                total += matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+        total += self.filenames.nbytes() + self.passages.nbytes()
+        if self._term_index is not None:
+            total += self._term_index.nbytes()
+        if self.vectors is not None:
+            total += self.vectors.nbytes()
+        return total
+    
+    def query_terms(self, query: str, expand: bool = True) -> dict[str, float]:
+        """
+        Weighted terms a query is scored with.
+        
+        Args:
+            query: Search query string
+            expand: Replace terms missing from the index with prefix and
+                typo matches, at a lower weight (see term_index.py)
+        
+        Returns:
+            Mapping from term to its count in the query
+        """
+        # Sorted, so scores depend on the terms alone and not on their order
+        # (search_cache.SearchCache relies on that)
+        terms = sorted(tokenize(query))
+        if expand:
+            return self.term_index.expand(terms)
+        return dict(Counter(terms))
+    
+    def passage_text(self, row: int) -> str:
+        """The text of a passage, sliced from its source document."""
+        passages = self.passages
+        return self.store.get(int(passages.source[row]))[passages.start[row]:passages.end[row]]
+    
+    def search(self, query: str, boost_dict: dict | None = None,
+               num_results: int = 10, expand: bool = True) -> list[SearchResult]:
+        """
+        Return the best-matching passage of the best-matching documents.
+        
+        Args:
+            query: Search query string
+            boost_dict: Per-field score multipliers (default 1.0)
+            num_results: Maximum number of passages (one per document) to return
+            expand: Also match prefixes and typos of unknown terms (see query_terms())
+        
+        Returns:
+            SearchResult of each passage, best first
+        """
+        return self.search_many([query], boost_dict, num_results, expand)[0]
+    
+    def search_many(self, queries: list[str], boost_dict: dict | None = None,
+                    num_results: int = 10, expand: bool = True) -> list[list[SearchResult]]:
+        """
+        Run several queries at once (one sparse matrix product per field).
+        
+        Args:
+            queries: Search query strings
+            boost_dict: Per-field score multipliers (default 1.0)
+            num_results: Maximum number of passages per query
+            expand: Also match prefixes and typos of unknown terms (see query_terms())
+        
+        Returns:
+            One result list per query, as returned by search()
+        """
+        if not len(self.passages) or not queries or num_results < 1:
+            return [[] for _ in queries]
+        
+        # Hybrid mode fuses deeper rankings than it returns
+        depth = num_results if self.vectors is None else max(num_results, RRF_DEPTH)
+        
+        queries_terms = [self.query_terms(query, expand) for query in queries]
+        scores = self.scorer.score_many(queries_terms, boost_dict or {})
+        results = []
+        for row in range(len(queries)):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            results.append(self.top_passages(scores.indices[start:end], scores.data[start:end], depth))
+        
+        if self.vectors is None:
+            return results
+        dense = self.vectors.search_many(self, queries, depth)
+        return [reciprocal_rank_fusion([lexical, semantic], num_results)
+                for lexical, semantic in zip(results, dense)]
+    
+    def top_passages(self, rows: np.ndarray, scores: np.ndarray, num_results: int) -> list[SearchResult]:
+        """
+        Pick the best passage of each of the best-scoring sources.
+        
+        Only a few candidates are fully sorted: argpartition selects the
+        top scores, and the candidate pool grows only if too many of them
+        belong to the same source.
+        
+        Args:
+            rows: Passage rows with a score
+            scores: Their scores
+            num_results: Maximum number of passages to return
+        """
+        # The candidate pool starts at num_results * 4 and would never grow from 0
+        if num_results < 1:
+            return []
+        positive = scores > 0
+        rows, scores = rows[positive], scores[positive]
+        sources = self.passages.source
+        
+        pool = num_results * 4
+        while True:
+            if pool < len(scores):
+                candidates = np.argpartition(-scores, pool)[:pool]
+            else:
+                candidates = np.arange(len(scores))
+            # Best score first; ties broken by index order
+            order = candidates[np.lexsort((rows[candidates], -scores[candidates]))]
+            
+            results = []
+            seen_sources = set()
+            for i in order:
+                row = int(rows[i])
+                source = int(sources[row])
+                if source in seen_sources:
+                    continue
+                seen_sources.add(source)
+                results.append(SearchResult(self, row, float(scores[i])))
+                if len(results) == num_results:
+                    return results
+            if len(candidates) == len(scores):
+                return results
+            pool *= 4
+    
+    def save(self, path: str | Path, source: dict | None = None) -> None:
+        """
+        Write the index to a directory of .npy arrays plus JSON metadata.
+        
+        The directory is written next to its final location and swapped in,
+        so concurrent readers never see a half-written index.
+        
+        Args:
+            path: Target directory
+            source: Fingerprint of the data the index was built from
+        """
+        path = Path(path)
+        tmp_path = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir(parents=True)
+        
+        for name, field in self.fields.items():
+            (tmp_path / f"{name}.terms.txt").write_text('\n'.join(field.terms), encoding='utf-8')
+            np.save(tmp_path / f"{name}.df.npy", np.asarray(field.df, dtype=np.int32))
+            np.save(tmp_path / f"{name}.idf.npy", field.idf)
+            for kind in ('counts', 'postings'):
+                matrix = getattr(field, kind)
+                for part in ('indptr', 'indices', 'data'):
+                    np.save(tmp_path / f"{name}.{kind}.{part}.npy", getattr(matrix, part))
+        
+        self.filenames.save(tmp_path, 'filenames')
+        self.store.save(tmp_path)
+        self.passages.save(tmp_path)
+        if self.members is not None:
+            with open(tmp_path / 'members.json', 'w', encoding='utf-8') as f:
+                json.dump(self.members, f)
+        
+        meta = {
+            'format': INDEX_FORMAT_VERSION,
+            'num_sources': len(self.filenames),
+            'num_passages': len(self.passages),
+            'fields': list(self.fields),
+            'source': source or {},
+        }
+        # meta.json goes last: its presence marks a complete index
+        with open(tmp_path / 'meta.json', 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path: str | Path) -> 'SearchIndex':
+        """
+        Load an index written by save(), memory-mapping the arrays.
+        
+        Args:
+            path: Directory written by save()
+        
+        Returns:
+            The loaded SearchIndex
+        """
+        path = Path(path)
+        meta = read_index_meta(path)
+        if meta is None:
+            raise FileNotFoundError(f"No search index found at {path}")
+        
+        filenames = StringColumn.load(path, 'filenames')
+        store = DocumentStore.load(path)
+        passages = PassageTable.load(path)
+        members = None
+        if (path / 'members.json').exists():
+            with open(path / 'members.json', encoding='utf-8') as f:
+                members = json.load(f)
+        
+        fields = {}
+        for name in meta['fields']:
+            terms_text = (path / f"{name}.terms.txt").read_text(encoding='utf-8')
+            terms = terms_text.split('\n') if terms_text else []
+            df = np.load(path / f"{name}.df.npy", mmap_mode='r')
+            idf = np.load(path / f"{name}.idf.npy", mmap_mode='r')
+            
+            matrices = {}
+            for kind, shape in (('counts', (len(passages), len(terms))),
+                                ('postings', (len(terms), len(passages)))):
+                parts = [np.load(path / f"{name}.{kind}.{part}.npy", mmap_mode='r')
+                         for part in ('data', 'indices', 'indptr')]
+                matrices[kind] = sparse.csr_matrix(tuple(parts), shape=shape, copy=False)
+            
+            fields[name] = FieldIndex(terms, df, idf, matrices['counts'], matrices['postings'])
+        
+        return cls(filenames, store, passages, fields, members)
+
+def create_search_index(documents: Iterable[dict], backend: str = 'tfidf',
+                        workers: int | None = None) -> SearchIndex:
+    """
+    Split the documents into passages and create a search index over them.
+    
+    Args:
+        documents: Dictionaries with 'filename' and 'content' fields (a list,
+            or a generator such as iter_md_files() to stream them)
+        backend: Scoring backend name from BACKENDS
+        workers: Tokenize in this many processes (None or 1 builds serially);
+            the index is identical either way
+    
+    Returns:
+        Fitted SearchIndex
+    """
+    index = build_index(((document, None) for document in documents), workers)
+    return index if backend == 'tfidf' else index.with_backend(backend)
+
+def build_index(items: Iterable[tuple[dict, list | None]], workers: int | None = None) -> SearchIndex:
+    """
+    Index (document, member key) pairs, serially or across worker processes.
+    
+    In parallel, documents are sent to the workers in shards of SHARD_SIZE;
+    each worker splits, tokenizes and counts its shard with its own
+    IndexBuilder, and the shards are merged back in order, so the result is
+    the same as a serial build. Only a few shards per worker are in flight
+    at a time, so a streamed corpus is still never read in full.
+    
+    Args:
+        items: Documents with the member_key() of their zip member (or None)
+        workers: Number of worker processes (None or 1 builds serially)
+    
+    Returns:
+        Fitted SearchIndex
+    """
+    builder = IndexBuilder()
+    if not workers or workers <= 1:
+        for document, member in items:
+            builder.add(document, member)
+        return builder.build()
+    
+    items = iter(items)
+    with ProcessPoolExecutor(workers) as executor:
+        pending = deque()
+        while True:
+            shard = list(islice(items, SHARD_SIZE))
+            if shard:
+                pending.append(executor.submit(index_shard, shard))
+            while pending and (not shard or len(pending) > 2 * workers):
+                builder.merge(pending.popleft().result())
+            if not shard:
+                break
+    return builder.build()
+
+def index_shard(items: list[tuple[dict, list | None]]) -> IndexBuilder:
+    """Index one shard of documents (runs in a worker process)."""
+    builder = IndexBuilder()
+    for document, member in items:
+        builder.add(document, member)
+    return builder
+
+def passage_field(document: dict, passage: dict, name: str) -> str:
+    """Text of one field of a passage: its slice of the content, or the document's value."""
+    if name == 'content':
+        return document['content'][passage['start']:passage['end']]
+    return document.get(name, '') or ''
+
+def index_zip(zip_path: str, workers: int | None = None) -> SearchIndex:
+    """
+    Build a search index over the .md/.mdx files of a zip archive.
+    
+    Members are read, indexed and dropped one at a time. Unlike
+    create_search_index(extract_md_files(...)), the index remembers each
+    member's CRC and size so update_index() can refresh it later.
+    
+    Args:
+        zip_path: Path to the zip file
+        workers: Tokenize in this many processes (None or 1 builds serially)
+    
+    Returns:
+        Fitted SearchIndex
+    """
+    with zipfile.ZipFile(zip_path, 'r') as zip_file:
+        return build_index(
+            ((read_md_member(zip_file, info), member_key(info)) for info in md_members(zip_file)),
+            workers
+        )
+
+def update_index(index: SearchIndex, zip_path: str) -> SearchIndex:
+    """
+    Bring an index up to date with a newer version of its zip archive.
+    
+    Archive members are compared by name, CRC and size; only added or
+    changed members are read and tokenized, and removed ones are dropped.
+    Rankings are identical to a full index_zip() of the new archive.
+    
+    Args:
+        index: Index built by index_zip() (or loaded from one)
+        zip_path: Path to the new zip file
+    
+    Returns:
+        The updated SearchIndex (the given index is left unchanged)
+    """
+    if index.members is None:
+        return index_zip(zip_path)
+    
+    old_sources = {tuple(key): source for source, key in enumerate(index.members)}
+    old_rows = [[] for _ in range(len(index.filenames))]
+    for row, source in enumerate(index.passages.source):
+        old_rows[source].append(row)
+    
+    filenames = StringColumn()
+    store = DocumentStore()
+    passages = PassageTable()
+    # Per passage and field: the row to keep from the old index, or the
+    # text of a new passage
+    rows = {name: [] for name in index.fields}
+    with zipfile.ZipFile(zip_path, 'r') as zip_file:
+        infos = md_members(zip_file)
+        for info in infos:
+            old_source = old_sources.get(tuple(member_key(info)))
+            new_source = len(filenames)
+            if old_source is not None:
+                filenames.append(index.filenames.get(old_source))
+                store.append_raw(index.store.raw(old_source))
+                for row in old_rows[old_source]:
+                    passages.copy(index.passages, row, new_source)
+                    for field_rows in rows.values():
+                        field_rows.append(row)
+            else:
+                document = read_md_member(zip_file, info)
+                filenames.append(document['filename'])
+                store.append(document['content'])
+                for passage in split_passages(document, new_source):
+                    passages.add(passage)
+                    for name, field_rows in rows.items():
+                        field_rows.append(passage_field(document, passage, name))
+    
+    fields = {name: field.update(rows[name]) for name, field in index.fields.items()}
+    return SearchIndex(filenames, store, passages, fields, [member_key(info) for info in infos])
+
+# Boost content field more than filename
+BOOST_DICT = {
+    'content': 1.0,
+    'filename': 2.0  # Boost filename matches
+}
+
+def search(index: SearchIndex, query: str, num_results: int = 5) -> list[SearchResult]:
+    """
+    Search the index and retrieve the most relevant passages.
+    
+    Args:
+        index: The fitted SearchIndex
         query: Search query string
         num_results: Number of results to return (default: 5)
     
     Returns:
-        List of the most relevant documents
+        SearchResult of the best passage of the most relevant documents,
+        with 'id', 'filename', 'heading', 'start' and 'end' (offsets into
+        the document), its 'score' and a 'snippet' with the query terms
+        (and the matches of misspelled or partial ones) highlighted
     """
-    # Boost content field more than filename
-    boost_dict = {
-        'content': 1.0,
-        'filename': 2.0  # Boost filename matches
-    }
-    
+    if num_results < 1:
+        return []
     results = index.search(
         query=query,
-        boost_dict=boost_dict,
+        boost_dict=BOOST_DICT,
         num_results=num_results
     )
     
+    highlighted = ' '.join(index.query_terms(query))
+    for result in results:
+        result.snippet = highlight_snippet(result.text, highlighted)
     return results
 
+def search_many(index: SearchIndex, queries: list[str], num_results: int = 5) -> list[list[SearchResult]]:
+    """
+    Like search(), for a batch of queries scored in one matrix product.
+    
+    Args:
+        index: The fitted SearchIndex
+        queries: Search query strings
+        num_results: Number of results per query (default: 5)
+    
+    Returns:
+        One list of results per query, in the same format as search()
+    """
+    if num_results < 1:
+        return [[] for _ in queries]
+    batches = index.search_many(queries, boost_dict=BOOST_DICT, num_results=num_results)
+    for query, results in zip(queries, batches):
+        highlighted = ' '.join(index.query_terms(query))
+        for result in results:
+            result.snippet = highlight_snippet(result.text, highlighted)
+    return batches
+
+def file_sha256(path: str | Path) -> str:
+    """Hex SHA-256 digest of a file, read in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def read_index_meta(path: str | Path) -> dict | None:
+    """Return the metadata of a saved index, or None if there is no usable one."""
+    try:
+        with open(Path(path) / 'meta.json', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('format') != INDEX_FORMAT_VERSION:
+        return None
+    return meta
+
+def default_index_dir(zip_path: str | Path) -> Path:
+    """Where the persisted index for a zip lives (e.g. fastmcp-main.index/)."""
+    zip_path = Path(zip_path)
+    return zip_path.with_name(f"{zip_path.stem}.index")
+
+def load_or_build_index(zip_path: str, index_dir: str | Path | None = None,
+                        backend: str = 'tfidf', workers: int | None = None) -> SearchIndex:
+    """
+    Load the persisted index for a zip archive, building it if needed.
+    
+    The index is refreshed only when the zip changes. Size and mtime are
+    checked first; the SHA-256 is computed only when those differ, so a
+    touched-but-identical zip does not trigger a rebuild. When the zip did
+    change, only its added, changed and removed members are re-indexed.
+    
+    Args:
+        zip_path: Path to the documentation zip file
+        index_dir: Where to keep the index (default: next to the zip)
+        backend: Scoring backend name from BACKENDS
+        workers: Processes to use if the index has to be built from scratch
+    
+    Returns:
+        Ready-to-query SearchIndex
+    """
+    index = load_or_update_index(zip_path, index_dir, workers)
+    # Build the term index now (usually in the background) rather than on the first search
+    index.term_index
+    return index if backend == 'tfidf' else index.with_backend(backend)
+
+def load_or_update_index(zip_path: str, index_dir: str | Path | None = None,
+                         workers: int | None = None) -> SearchIndex:
+    """load_or_build_index() without the backend choice."""
+    index_dir = Path(index_dir) if index_dir else default_index_dir(zip_path)
+    stat = os.stat(zip_path)
+    source = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    
+    meta = read_index_meta(index_dir)
+    if meta is not None:
+        saved = meta['source']
+        if saved.get('size') == source['size'] and saved.get('mtime_ns') == source['mtime_ns']:
+            return SearchIndex.load(index_dir)
+    
+    source['sha256'] = file_sha256(zip_path)
+    if meta is not None and meta['source'].get('sha256') == source['sha256']:
+        index = SearchIndex.load(index_dir)
+        # Same content, new mtime: record it so the next start takes the fast path
+        meta['source'] = source
+        with open(index_dir / 'meta.json', 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        return index
+    
+    if meta is not None:
+        index = update_index(SearchIndex.load(index_dir), zip_path)
+    else:
+        index = index_zip(zip_path, workers)
+    try:
+        index.save(index_dir, source=source)
+    except OSError as e:
+        # stderr: this may run while the MCP server is talking over stdout
+        print(f"Could not save search index to {index_dir}: {e}", file=sys.stderr)
+    return index
+
 if __name__ == "__main__":
     # Path to the downloaded zip file
     zip_path = "fastmcp-main.zip"
@@ -117,7 +1524,5 @@ if __name__ == "__main__":
         results = search(index, query, num_results=5)
         
         for i, result in enumerate(results, 1):
-            print(f"{i}. {result['filename']}")
-            # Print first 100 chars of content
-            content_preview = result['content'][:100].replace('\n', ' ')
-            print(f"   {content_preview}...")
+            print(f"{i}. {result['id']}")
+            print(f"   {result['snippet']}")
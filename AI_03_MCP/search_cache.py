@@ -0,0 +1,91 @@
+from collections import OrderedDict
+
+from search import SearchIndex, SearchResult, search, tokenize
+
+def normalize_query(query: str, terms_only: bool = True) -> str:
+    """
+    Canonical form of a query: queries with the same form rank the same.
+    
+    Lexical scoring (and the LSA embedder) only sees the query's terms, so
+    case, punctuation and term order make no difference: "Create tool" and
+    "tool, create?" normalize the same. Every term is kept, stop words
+    included, because any term can change scores. An embedder that reads
+    the query text itself (terms_only=False) may see all of that, so then
+    only surrounding and repeated whitespace is dropped.
+    
+    Args:
+        query: Raw search query
+        terms_only: Whether ranking depends on the query's terms alone
+    
+    Returns:
+        The canonical form
+    """
+    if not terms_only:
+        return ' '.join(query.split())
+    return ' '.join(sorted(tokenize(query)))
+
+def ranks_by_terms(index: SearchIndex) -> bool:
+    """Whether an index ranks a query by its terms alone (see normalize_query())."""
+    return index.vectors is None or index.vectors.embedder.terms_only
+
+class SearchCache:
+    """
+    Memoizes search() results for normalized queries.
+    
+    The normalized form is only the cache key; results are computed from
+    the query as given, so a cached search ranks exactly like search().
+    
+    Results are kept in an LRU keyed by (index version, normalized query,
+    num_results), as (row, score, snippet) tuples: they do not keep the
+    index alive, and a hit only has to wrap them in new SearchResult views.
+    
+    Every SearchIndex gets a new version when it is built or loaded, so
+    results of an old index are never served after a rebuild; they just
+    age out of the LRU.
+    """
+    
+    def __init__(self, max_entries: int = 1024):
+        """
+        Args:
+            max_entries: Maximum number of cached result lists
+        """
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, list[tuple[int, float, str]]] = OrderedDict()
+        self.counters = {
+            'hits': 0,          # results served from the cache
+            'misses': 0,        # results computed by search()
+            'evictions': 0,     # entries dropped to stay within max_entries
+        }
+    
+    def search(self, index: SearchIndex, query: str, num_results: int = 5) -> list[SearchResult]:
+        """Same as search.search(), but served from the cache when possible."""
+        normalized = normalize_query(query, terms_only=ranks_by_terms(index))
+        key = (index.version, normalized, num_results)
+        hits = self._entries.get(key)
+        if hits is not None:
+            self._entries.move_to_end(key)
+            self.counters['hits'] += 1
+            # New views, so callers cannot change what is cached
+            return [SearchResult(index, row, score, snippet) for row, score, snippet in hits]
+        
+        self.counters['misses'] += 1
+        results = search(index, query, num_results=num_results)
+        self._entries[key] = [(result.row, result.score, result.snippet) for result in results]
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters['evictions'] += 1
+        return results
+    
+    def clear(self) -> None:
+        """Drop all cached results (counters are kept)."""
+        self._entries.clear()
+    
+    def stats(self) -> dict:
+        """Counters plus the current number of entries."""
+        lookups = self.counters['hits'] + self.counters['misses']
+        return {
+            **self.counters,
+            'hit_rate': round(self.counters['hits'] / lookups, 4) if lookups else 0.0,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+        }
@@ -0,0 +1,168 @@
+import time
+from bisect import bisect_left
+from collections import Counter
+
+import numpy as np
+
+# Weight of an expanded query term relative to an exact match
+PREFIX_PENALTY = 0.6
+EDIT_PENALTY = 0.7  # per edit: 0.7 for one typo, 0.49 for two
+
+# Shortest query terms that are completed as prefixes / allowed one or two edits
+MIN_PREFIX_CHARS = 3
+MIN_ONE_EDIT_CHARS = 4
+MIN_TWO_EDIT_CHARS = 8
+
+# Most expansions kept per unknown query term
+MAX_EXPANSIONS = 5
+
+def deletes(term: str) -> set[str]:
+    """The term itself plus every variant with one character deleted."""
+    return {term} | {term[:i] + term[i + 1:] for i in range(len(term))}
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Damerau-Levenshtein distance (optimal string alignment), capped at limit + 1.
+    
+    Stops as soon as every alignment needs more than `limit` edits.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            # Swapped neighbours count as one edit
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before_previous[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        before_previous, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+class TermIndex:
+    """
+    Expands query terms missing from the vocabulary to prefix and typo matches.
+    
+    Prefix matches come from a binary search in the sorted vocabulary. Typos
+    use a symmetric-delete index: every term and its one-deletion variants
+    are hashed into one sorted array, so the candidates for a query term are
+    the terms sharing a variant with it (at most two edits apart), which are
+    then checked with a bounded edit distance. Lookups take microseconds and
+    never scan the vocabulary.
+    
+    The hashes use Python's hash(), so the index is rebuilt in every process
+    rather than saved with the search index.
+    
+    Attributes:
+        terms: Vocabulary, sorted
+        frequencies: Number of passages containing each term (all fields);
+            breaks ties between expansions
+        build_s: Seconds it took to build the index
+    """
+    
+    def __init__(self, terms: list[str], frequencies: np.ndarray):
+        start = time.perf_counter()
+        self.terms = terms
+        self.frequencies = np.asarray(frequencies, dtype=np.int64)
+        
+        keys = []
+        ids = []
+        for i, term in enumerate(terms):
+            variants = deletes(term)
+            keys.extend(map(hash, variants))
+            ids.extend([i] * len(variants))
+        keys = np.array(keys, dtype=np.int64)
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.ids = np.array(ids, dtype=np.int32)[order]
+        self.build_s = time.perf_counter() - start
+    
+    @classmethod
+    def from_fields(cls, fields: dict) -> 'TermIndex':
+        """Index the vocabulary of every FieldIndex of a search index."""
+        frequencies = Counter()
+        for field in fields.values():
+            frequencies.update(dict(zip(field.terms, np.asarray(field.df).tolist())))
+        terms = sorted(frequencies)
+        return cls(terms, np.array([frequencies[term] for term in terms], dtype=np.int64))
+    
+    def nbytes(self) -> int:
+        """Approximate memory footprint (the term strings are shared with the fields)."""
+        return self.keys.nbytes + self.ids.nbytes + self.frequencies.nbytes + 8 * len(self.terms)
+    
+    def __contains__(self, term: str) -> bool:
+        i = bisect_left(self.terms, term)
+        return i < len(self.terms) and self.terms[i] == term
+    
+    def prefix_matches(self, term: str) -> list[str]:
+        """The most frequent vocabulary terms starting with `term` (up to MAX_EXPANSIONS)."""
+        if len(term) < MIN_PREFIX_CHARS:
+            return []
+        start = bisect_left(self.terms, term)
+        end = bisect_left(self.terms, term + '\U0010ffff', lo=start)
+        best = np.argsort(-self.frequencies[start:end], kind='stable')[:MAX_EXPANSIONS]
+        return [self.terms[start + i] for i in best]
+    
+    def close_matches(self, term: str) -> dict[str, int]:
+        """
+        Vocabulary terms within the allowed number of edits of `term`.
+        
+        Returns:
+            Mapping from matching term to its edit distance
+        """
+        if len(term) < MIN_ONE_EDIT_CHARS:
+            return {}
+        limit = 2 if len(term) >= MIN_TWO_EDIT_CHARS else 1
+        
+        hashes = np.fromiter(map(hash, deletes(term)), dtype=np.int64)
+        starts = np.searchsorted(self.keys, hashes, side='left')
+        ends = np.searchsorted(self.keys, hashes, side='right')
+        candidates = {int(i) for start, end in zip(starts, ends) for i in self.ids[start:end]}
+        
+        matches = {}
+        for i in candidates:
+            distance = edit_distance(term, self.terms[i], limit)
+            if 0 < distance <= limit:
+                matches[self.terms[i]] = distance
+        return matches
+    
+    def matches(self, term: str) -> dict[str, float]:
+        """
+        Expansions of one query term with their weights.
+        
+        Typo matches weigh EDIT_PENALTY per edit and prefix completions
+        PREFIX_PENALTY; the MAX_EXPANSIONS heaviest are kept, more frequent
+        terms first among equal weights.
+        """
+        weights = {match: EDIT_PENALTY ** distance for match, distance in self.close_matches(term).items()}
+        for match in self.prefix_matches(term):
+            weights[match] = max(weights.get(match, 0.0), PREFIX_PENALTY)
+        
+        frequency = {match: self.frequencies[bisect_left(self.terms, match)] for match in weights}
+        best = sorted(weights, key=lambda match: (-weights[match], -frequency[match], match))
+        return {match: weights[match] for match in best[:MAX_EXPANSIONS]}
+    
+    def expand(self, terms: list[str]) -> dict[str, float]:
+        """
+        Weights of a tokenized query, with unknown terms replaced by their matches.
+        
+        Known terms count 1 per occurrence, so queries made only of known
+        terms score exactly as without expansion. Unknown terms without
+        matches are dropped, as they would match nothing anyway.
+        
+        Args:
+            terms: Tokenized query
+        
+        Returns:
+            Mapping from vocabulary term to its (possibly fractional) count
+        """
+        weights = {}
+        for term in terms:
+            expansions = {term: 1.0} if term in self else self.matches(term)
+            for match, weight in expansions.items():
+                weights[match] = weights.get(match, 0.0) + weight
+        return weights
@@ -1,19 +1,5 @@
-import requests
-
-def get_page_markdown(url: str) -> str:
-    """
-    Get content of any webpage in markdown format using Jina reader.
-    
-    Args:
-        url: The URL of the webpage to fetch (e.g., https://datatalks.club)
-    
-    Returns:
-        The webpage content in markdown format
-    """
-    jina_url = f"https://r.jina.ai/{url}"
-    response = requests.get(jina_url)
-    response.raise_for_status()
-    return response.text
+import asyncio
+from fetch import fetch_page_markdown
 
 if __name__ == "__main__":
     # Test with GitHub repo URL
@@ -22,7 +8,7 @@ if __name__ == "__main__":
     print("=" * 60)
     
     try:
-        content = get_page_markdown(test_url)
+        content = asyncio.run(fetch_page_markdown(test_url))
         print(content[:1000])  # Print first 1000 characters
         print("\n" + "=" * 60)
         print(f"✓ Successfully fetched {len(content)} characters")
@@ -22,15 +22,9 @@ def search_documentation(query: str, num_results: int = 5) -> str:
     output = [f"Found {len(results)} results for '{query}':\n"]
     
     for i, result in enumerate(results, 1):
-        filename = result['filename']
-        content = result['content']
-        
-        preview = content[:200].replace('\n', ' ').strip()
-        if len(content) > 200:
-            preview += "..."
-        
-        output.append(f"{i}. {filename}")
-        output.append(f"   {preview}\n")
+        # Passage ID is "<filename>#<section>"; the snippet highlights query terms
+        output.append(f"{i}. {result['id']}")
+        output.append(f"   {result['snippet']}\n")
     
     return "\n".join(output)
 
@@ -0,0 +1,63 @@
+"""Corpus registry memory budget and the all-corpora search."""
+
+import asyncio
+import zipfile
+
+import main
+from corpora import CorpusRegistry
+from search import index_zip
+
+def write_corpus(directory, name: str, topic: str) -> None:
+    with zipfile.ZipFile(directory / f'{name}.zip', 'w') as zip_file:
+        for i in range(3):
+            zip_file.writestr(f'{name}/docs/page{i}.md', f"# {topic} {i}\n\nHow to deploy the {topic} server.\n")
+
+def test_search_all_corpora_stays_within_budget(tmp_path, monkeypatch):
+    for name, topic in [('alpha', 'proxy'), ('beta', 'queue'), ('gamma', 'cache')]:
+        write_corpus(tmp_path, name, topic)
+    loads = []
+    
+    def loader(path):
+        loads.append(path)
+        return index_zip(path)
+    
+    size = index_zip(str(tmp_path / 'alpha.zip')).nbytes()
+    # Room for one index and part of another: a query can't keep all three loaded
+    registry = CorpusRegistry(tmp_path, loader=loader, memory_budget=size + size // 2)
+    monkeypatch.setattr(main, 'corpora', registry)
+    
+    for _ in range(3):
+        output = asyncio.run(main.search_all_corpora('deploy server', 5))
+        assert 'Not searched (over CORPUS_MEMORY_BUDGET): gamma' in output
+        assert '[alpha]' in output and '[beta]' in output
+    
+    # Every corpus that was searched was loaded once, and none was unloaded and reloaded
+    assert len(loads) == 2
+    assert registry.evictions == 0
+
+def test_single_corpus_search_enforces_budget(tmp_path):
+    for name in ('alpha', 'beta'):
+        write_corpus(tmp_path, name, name)
+    size = index_zip(str(tmp_path / 'alpha.zip')).nbytes()
+    registry = CorpusRegistry(tmp_path, loader=index_zip, memory_budget=size + size // 2)
+    
+    asyncio.run(registry.wait('alpha'))
+    asyncio.run(registry.wait('beta'))
+    
+    assert list(registry.loaded()) == ['beta']
+    assert registry.evictions == 1
+
+def test_failed_load_is_reported_and_retried(tmp_path, monkeypatch):
+    (tmp_path / 'broken.zip').write_bytes(b'not a zip file')
+    registry = CorpusRegistry(tmp_path, loader=index_zip)
+    monkeypatch.setattr(main, 'corpora', registry)
+    
+    output = asyncio.run(main.search_documentation.fn('deploy', corpus='broken'))
+    assert output.startswith("Could not load corpus 'broken':")
+    assert 'broken' not in registry.loaded()
+    
+    # Fixing the archive is enough: the next search loads it again
+    (tmp_path / 'broken.zip').unlink()
+    write_corpus(tmp_path, 'broken', 'proxy')
+    output = asyncio.run(main.search_documentation.fn('deploy', corpus='broken'))
+    assert output.startswith("Found")
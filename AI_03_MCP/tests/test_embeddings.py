@@ -0,0 +1,29 @@
+"""Persisted passage embeddings are reused only for the index they were built from."""
+
+import zipfile
+
+import embeddings
+from embeddings import load_or_build_vectors, read_vectors_meta
+from search import index_zip
+from test_search import make_docs, write_zip
+
+def test_vectors_are_reused_until_the_passages_change(tmp_path, monkeypatch):
+    zip_path = write_zip(tmp_path / 'docs.zip', 1)
+    vectors_dir = tmp_path / 'vectors'
+    index = index_zip(zip_path)
+    
+    assert load_or_build_vectors(index, zip_path, dim=4, vectors_dir=vectors_dir).build_s > 0
+    assert load_or_build_vectors(index, zip_path, dim=4, vectors_dir=vectors_dir).build_s == 0.0
+    
+    # Same zip and passage count, but passages with other IDs (e.g. split differently)
+    renamed = tmp_path / 'renamed.zip'
+    with zipfile.ZipFile(renamed, 'w') as zip_file:
+        for name, content in make_docs(1).items():
+            zip_file.writestr(name, content.replace('# Tools', '# Tooling'))
+    other = index_zip(str(renamed))
+    assert len(other.passages) == len(index.passages)
+    assert load_or_build_vectors(other, zip_path, dim=4, vectors_dir=vectors_dir).build_s > 0
+    
+    monkeypatch.setattr(embeddings, 'INDEX_FORMAT_VERSION', embeddings.INDEX_FORMAT_VERSION + 1)
+    assert load_or_build_vectors(other, zip_path, dim=4, vectors_dir=vectors_dir).build_s > 0
+    assert read_vectors_meta(vectors_dir)['passages']['index_format'] == embeddings.INDEX_FORMAT_VERSION
@@ -0,0 +1,244 @@
+"""PageFetcher against a local stub HTTP server."""
+
+import asyncio
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+import main
+from fetch import PageFetcher
+from metrics import CallTimer, current_call
+from page_cache import PageCache
+
+LONG_PAGE = 'Ünïcode line\n' * 10
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Answers by path:
+        /flaky/<n>: 503 for the first n requests, then 200
+        /broken: always 500
+        /slow/<name>: 200 after a short delay
+        /etag: 200 with an ETag that expires at once; 304 when revalidated
+        /fresh: 200 cacheable for a minute
+        /long: 200 with LONG_PAGE
+    """
+    
+    def do_GET(self):
+        stub = self.server.stub
+        with stub.lock:
+            stub.hits[self.path] = stub.hits.get(self.path, 0) + 1
+            hits = stub.hits[self.path]
+            stub.headers.append(dict(self.headers))
+        
+        if self.path.startswith('/flaky/'):
+            if hits <= int(self.path.rsplit('/', 1)[1]):
+                return self.reply(503, 'try again')
+            return self.reply(200, 'recovered')
+        if self.path == '/broken':
+            return self.reply(500, 'broken')
+        if self.path.startswith('/slow/'):
+            with stub.lock:
+                stub.active += 1
+                stub.max_active = max(stub.max_active, stub.active)
+            time.sleep(0.1)
+            with stub.lock:
+                stub.active -= 1
+            return self.reply(200, f'page {self.path}')
+        if self.path == '/etag':
+            if self.headers.get('If-None-Match') == '"v1"':
+                return self.reply(304, '', {'ETag': '"v1"', 'Cache-Control': 'max-age=0'})
+            return self.reply(200, 'etag page', {'ETag': '"v1"', 'Cache-Control': 'max-age=0'})
+        if self.path == '/fresh':
+            return self.reply(200, 'fresh page', {'Cache-Control': 'max-age=60'})
+        if self.path == '/long':
+            return self.reply(200, LONG_PAGE)
+        self.reply(404, 'not found')
+    
+    def reply(self, status, body, headers=None):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header('Content-Type', 'text/plain; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(data)
+    
+    def log_message(self, format, *args):
+        pass
+
+class Stub:
+    def __init__(self, url):
+        self.url = url
+        self.lock = threading.Lock()
+        self.hits = {}
+        self.headers = []
+        self.active = 0
+        self.max_active = 0
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    server.stub = Stub(f"http://127.0.0.1:{server.server_port}/")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.stub
+    server.shutdown()
+    server.server_close()
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_retries_5xx_until_success(stub):
+    async def main():
+        async with PageFetcher(stub.url, retries=3, backoff=0.01) as fetcher:
+            return await fetcher.fetch('flaky/2'), fetcher.counters['requests']
+    
+    text, requests = run(main())
+    assert text == 'recovered'
+    assert requests == 3
+    assert stub.hits['/flaky/2'] == 3
+
+def test_gives_up_after_retries(stub):
+    async def main():
+        async with PageFetcher(stub.url, retries=2, backoff=0.01) as fetcher:
+            await fetcher.fetch('broken')
+    
+    with pytest.raises(httpx.HTTPStatusError):
+        run(main())
+    assert stub.hits['/broken'] == 3
+
+def test_concurrent_fetches_share_one_request(stub):
+    async def main():
+        async with PageFetcher(stub.url) as fetcher:
+            texts = await asyncio.gather(*(fetcher.fetch('slow/shared') for _ in range(5)))
+            return texts, fetcher.counters
+    
+    texts, counters = run(main())
+    assert texts == ['page /slow/shared'] * 5
+    assert stub.hits['/slow/shared'] == 1
+    assert counters['requests'] == 1
+    assert counters['coalesced'] == 4
+
+def test_per_host_limit(stub):
+    async def main():
+        async with PageFetcher(stub.url, per_host_limit=2) as fetcher:
+            await asyncio.gather(*(fetcher.fetch(f'slow/{i}') for i in range(6)))
+    
+    run(main())
+    assert sum(stub.hits.values()) == 6
+    assert stub.max_active == 2
+
+def test_expired_page_is_revalidated_with_etag(stub):
+    cache = PageCache(ttl=60)
+    
+    async def main():
+        async with PageFetcher(stub.url, cache=cache) as fetcher:
+            return [await fetcher.fetch('etag') for _ in range(2)]
+    
+    assert run(main()) == ['etag page', 'etag page']
+    assert stub.hits['/etag'] == 2
+    assert 'If-None-Match' not in stub.headers[0]
+    assert stub.headers[1]['If-None-Match'] == '"v1"'
+    assert cache.counters['stale'] == 1
+    assert cache.counters['revalidated'] == 1
+
+def test_fresh_page_needs_no_request(stub):
+    cache = PageCache(ttl=0)
+    
+    async def main():
+        async with PageFetcher(stub.url, cache=cache) as fetcher:
+            return [await fetcher.fetch('fresh') for _ in range(3)]
+    
+    assert run(main()) == ['fresh page'] * 3
+    assert stub.hits['/fresh'] == 1
+    assert cache.counters['hits'] == 2
+
+def test_only_http_counts_as_upstream(stub):
+    async def call(fetcher):
+        # Each gathered call runs in its own task, so it gets its own timer
+        timer = CallTimer()
+        current_call.set(timer)
+        await fetcher.fetch('slow/timed')
+        return timer.upstream
+    
+    async def main():
+        async with PageFetcher(stub.url, cache=PageCache()) as fetcher:
+            shared = await asyncio.gather(call(fetcher), call(fetcher))
+            cached = await asyncio.create_task(call(fetcher))
+            return shared, cached
+    
+    shared, cached = run(main())
+    # The stub takes 0.1 s; the call that joined the request waits on it too
+    assert all(seconds >= 0.09 for seconds in shared)
+    assert cached == 0.0
+    assert stub.hits['/slow/timed'] == 1
+
+def test_concurrent_streams_share_one_request(stub):
+    cache = PageCache()
+    
+    async def read(fetcher):
+        return ''.join([chunk async for chunk in fetcher.stream('slow/streamed')])
+    
+    async def main():
+        async with PageFetcher(stub.url, cache=cache) as fetcher:
+            texts = await asyncio.gather(*(read(fetcher) for _ in range(4)))
+            return texts + [await read(fetcher)]
+    
+    assert run(main()) == ['page /slow/streamed'] * 5
+    assert stub.hits['/slow/streamed'] == 1
+
+def test_stream_without_cache(stub):
+    async def main():
+        async with PageFetcher(stub.url) as fetcher:
+            return ''.join([chunk async for chunk in fetcher.stream('fresh')])
+    
+    assert run(main()) == 'fresh page'
+
+def next_cursor(part):
+    match = re.search(r'cursor="([^"]+)"', part)
+    return match.group(1) if match else None
+
+def test_page_parts_round_trip_through_cursors(stub, monkeypatch):
+    async def read():
+        async with PageFetcher(stub.url, cache=PageCache()) as fetcher:
+            monkeypatch.setattr(main, 'fetcher', fetcher)
+            parts = [await main.get_page_markdown.fn('long', max_chars=50)]
+            while cursor := next_cursor(parts[-1]):
+                parts.append(await main.get_page_markdown.fn('long', max_chars=50, cursor=cursor))
+            by_offset = await main.get_page_markdown.fn('long', max_chars=50, offset=100)
+            past_end = await main.get_page_markdown.fn('long', offset=500)
+            other_url = await main.get_page_markdown.fn('other', cursor=next_cursor(parts[0]))
+            return parts, by_offset, past_end, other_url
+    
+    parts, by_offset, past_end, other_url = run(read())
+    assert len(parts) == 3
+    assert '[Characters 0-50 of 130.' in parts[0]
+    assert '[Characters 50-100 of 130.' in parts[1]
+    assert ''.join(part.split('\n\n---\n')[0] for part in parts) == LONG_PAGE
+    assert by_offset == LONG_PAGE[100:]
+    assert past_end == 'No content at offset 500: the page has 130 characters'
+    assert other_url == 'The cursor belongs to long, not other'
+    # Later parts are read from the cache
+    assert stub.hits['/long'] == 1
+
+def test_count_words_in_pages_reports_failed_urls(stub, monkeypatch):
+    async def count():
+        async with PageFetcher(stub.url, retries=0, cache=PageCache()) as fetcher:
+            monkeypatch.setattr(main, 'fetcher', fetcher)
+            return await main.count_words_in_pages.fn(['long', 'broken', 'long', 'fresh'],
+                                                      ['line', 'LINE', 'page', ''])
+    
+    output = run(count())
+    assert output['words'] == ['line', 'page']
+    assert output['counts'] == {'long': {'line': 10, 'page': 0}, 'fresh': {'line': 0, 'page': 1}}
+    assert list(output['errors']) == ['broken']
+    assert '500' in output['errors']['broken']
+    assert stub.hits['/long'] == 1
@@ -0,0 +1,70 @@
+"""MetricsMiddleware: per-tool stats recorded for calls through a FastMCP server."""
+
+import asyncio
+
+from fastmcp import Client, FastMCP
+
+from metrics import LATENCY_BUCKETS, MetricsMiddleware, ServerMetrics, upstream
+
+def make_server(metrics: ServerMetrics) -> FastMCP:
+    mcp = FastMCP("metrics test")
+    mcp.add_middleware(MetricsMiddleware(metrics))
+    
+    @mcp.tool
+    def echo(text: str) -> str:
+        return text
+    
+    @mcp.tool
+    async def wait_upstream(seconds: float) -> str:
+        with upstream():
+            await asyncio.sleep(seconds)
+        return 'done'
+    
+    @mcp.tool
+    def fail() -> str:
+        raise KeyError('missing')
+    
+    return mcp
+
+def test_tool_calls_are_recorded():
+    metrics = ServerMetrics()
+    
+    async def call_tools():
+        async with Client(make_server(metrics)) as client:
+            await client.call_tool('echo', {'text': 'hello'})
+            await client.call_tool('echo', {'text': 'again'})
+            await client.call_tool('wait_upstream', {'seconds': 0.06})
+            await client.call_tool('fail', raise_on_error=False)
+    
+    asyncio.run(call_tools())
+    tools = metrics.snapshot()['tools']
+    
+    echo = tools['echo']
+    assert echo['calls'] == 2
+    assert echo['errors'] == 0
+    assert echo['upstream_s'] == 0.0
+    assert echo['mean_request_chars'] == len('{"text": "hello"}')
+    # Results with an output schema are measured as their structured content
+    assert echo['mean_response_chars'] == len('{"result": "hello"}')
+    assert sum(echo['latency_buckets'].values()) == 2
+    
+    waited = tools['wait_upstream']
+    assert waited['upstream_s'] >= 0.05
+    assert waited['local_s'] < waited['upstream_s']
+    # 60 ms falls in the (0.05, 0.1] bucket or a later one
+    assert sum(count for bound, count in waited['latency_buckets'].items()
+               if bound != '+Inf' and float(bound) <= 0.05) == 0
+    
+    assert tools['fail']['calls'] == 1
+    assert tools['fail']['error_types'] == {'KeyError': 1}
+    
+    exposition = metrics.prometheus()
+    assert 'mcp_tool_calls_total{tool="echo"} 2\n' in exposition
+    assert 'mcp_tool_errors_total{tool="fail",error="KeyError"} 1\n' in exposition
+    assert 'mcp_tool_duration_seconds_bucket{tool="echo",le="+Inf"} 2\n' in exposition
+    assert 'mcp_tool_duration_seconds_count{tool="wait_upstream"} 1\n' in exposition
+    # Histogram buckets are cumulative
+    buckets = [int(line.rsplit(' ', 1)[1]) for line in exposition.splitlines()
+               if line.startswith('mcp_tool_duration_seconds_bucket{tool="echo"')]
+    assert len(buckets) == len(LATENCY_BUCKETS) + 1
+    assert buckets == sorted(buckets)
@@ -0,0 +1,84 @@
+"""PageCache: byte-bounded LRU, per-entry expiry and the disk tier."""
+
+import httpx
+
+from fetch import cache_ttl
+from page_cache import PageCache
+
+def test_lru_evicts_least_recent_to_stay_in_budget():
+    cache = PageCache(max_bytes=10)
+    cache.put('a', 'aaaa')
+    cache.put('b', 'bbbb')
+    cache.get('a')
+    cache.put('c', 'cccc')
+    
+    assert cache.get('b') is None
+    assert cache.get('a').text == 'aaaa'
+    assert cache.get('c').text == 'cccc'
+    assert cache.stats()['bytes'] == 8
+    assert cache.counters['evictions'] == 1
+    
+    # Sizes are UTF-8 bytes, not characters
+    cache.put('d', 'éééé')
+    assert cache.stats()['bytes'] == 8
+    assert cache.get('d').size == 8
+
+def test_page_larger_than_budget_is_not_kept_in_memory():
+    cache = PageCache(max_bytes=4)
+    assert cache.put('big', 'too long').text == 'too long'
+    assert cache.get('big') is None
+    assert cache.stats()['entries'] == 0
+
+def test_ttl_follows_max_age():
+    assert cache_ttl(httpx.Response(200, headers={'Cache-Control': 'public, max-age=60'})) == 60.0
+    assert cache_ttl(httpx.Response(200, headers={'Cache-Control': 'no-store'})) == 0.0
+    assert cache_ttl(httpx.Response(200)) is None
+    
+    cache = PageCache(ttl=300)
+    cache.put('expired', 'text', ttl=0)
+    cache.put('default', 'text')
+    assert not cache.get('expired').fresh
+    assert cache.get('default').fresh
+    assert cache.counters['stale'] == 1
+    assert cache.counters['hits'] == 1
+    
+    cache.revalidated('expired', cache.get('expired'), ttl=60)
+    assert cache.get('expired').fresh
+
+def test_disk_tier_survives_restart(tmp_path):
+    cache = PageCache(disk_dir=tmp_path)
+    cache.put('https://example.com/', 'page\r\ntext', etag='"v1"', ttl=0)
+    
+    restarted = PageCache(disk_dir=tmp_path)
+    entry = restarted.get('https://example.com/')
+    assert entry.text == 'page\r\ntext'
+    assert entry.validators() == {'If-None-Match': '"v1"'}
+    assert not entry.fresh
+    assert restarted.counters['disk_hits'] == 1
+
+def test_large_page_is_read_back_from_disk(tmp_path):
+    cache = PageCache(max_bytes=8, disk_dir=tmp_path)
+    writer = cache.writer('https://example.com/big')
+    for chunk in ('0123456789', 'abcdefghij'):
+        writer.write(chunk)
+    entry = writer.commit()
+    
+    assert entry.text is None
+    assert entry.chars == 20
+    assert cache.stats()['entries'] == 0
+    assert list(cache.iter_text('https://example.com/big', entry, chunk_chars=8)) == [
+        '01234567', '89abcdef', 'ghij']
+    
+    restarted = PageCache(max_bytes=8, disk_dir=tmp_path)
+    entry = restarted.get('https://example.com/big')
+    assert entry.text is None
+    assert restarted.read_text('https://example.com/big', entry) == '0123456789abcdefghij'
+
+def test_aborted_page_is_not_cached(tmp_path):
+    cache = PageCache(disk_dir=tmp_path)
+    writer = cache.writer('https://example.com/')
+    writer.write('partial')
+    writer.abort()
+    
+    assert cache.get('https://example.com/') is None
+    assert list(tmp_path.iterdir()) == []
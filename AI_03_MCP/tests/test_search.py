@@ -0,0 +1,170 @@
+"""Search index builds, incremental updates and queries on a small zip corpus."""
+
+import zipfile
+
+import numpy as np
+import pytest
+
+from embeddings import LsaEmbedder, VectorIndex
+from search import (
+    MIN_PASSAGE_CHARS, SHARD_SIZE, SearchIndex, build_index, create_search_index, extract_md_files,
+    highlight_snippet, index_zip, load_or_update_index, search, search_many, split_passages, update_index
+)
+
+QUERIES = ['deploy server', 'install package', 'authentication token', 'configure tools', 'zzz']
+
+def make_docs(version: int) -> dict[str, str]:
+    """Member name -> content of a small docs archive; version 2 changes, adds and removes members."""
+    docs = {
+        'docs-main/README.md': "# Project\n\nInstall the package and deploy the server.\n",
+        'docs-main/docs/install.md': "# Install\n\n## With pip\n\nInstall the package with pip.\n\n"
+                                    "## From source\n\nClone and install the package from source.\n",
+        'docs-main/docs/deploy.mdx': "# Deploy\n\nDeploy the server behind a proxy. The server "
+                                     "needs a token for authentication.\n",
+        'docs-main/docs/tools.md': "# Tools\n\nConfigure tools and resources. Tools run on the server.\n",
+        'docs-main/docs/old.md': "# Old\n\nThis page about the legacy server is removed later.\n",
+        'docs-main/src/code.py': "print('not indexed')\n",
+    }
+    if version == 2:
+        docs['docs-main/docs/deploy.mdx'] += "\n## Docker\n\nDeploy with docker; pass the token as an environment variable.\n"
+        del docs['docs-main/docs/old.md']
+        docs['docs-main/docs/auth.md'] = "# Authentication\n\nEvery request carries a bearer token.\n"
+    return docs
+
+def write_zip(path, version: int):
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        for name, content in make_docs(version).items():
+            zip_file.writestr(name, content)
+    return str(path)
+
+def result_tuples(index, queries=QUERIES):
+    return [[(r['id'], round(r['score'], 12)) for r in search(index, query, 10)] for query in queries]
+
+def assert_same_index(actual, expected):
+    assert [actual.filenames.get(i) for i in range(len(actual.filenames))] == \
+        [expected.filenames.get(i) for i in range(len(expected.filenames))]
+    assert actual.passages == expected.passages
+    for name, field in expected.fields.items():
+        assert actual.fields[name].terms == field.terms
+        np.testing.assert_array_equal(actual.fields[name].df, field.df)
+        np.testing.assert_allclose(actual.fields[name].postings.toarray(), field.postings.toarray())
+    assert result_tuples(actual) == result_tuples(expected)
+
+def test_update_index_matches_full_rebuild(tmp_path):
+    old = index_zip(write_zip(tmp_path / 'v1.zip', 1))
+    new_zip = write_zip(tmp_path / 'v2.zip', 2)
+    
+    updated = update_index(old, new_zip)
+    
+    assert_same_index(updated, index_zip(new_zip))
+    assert_same_index(updated, create_search_index(extract_md_files(new_zip)))
+    assert 'docs/old.md' not in {updated.filenames.get(i) for i in range(len(updated.filenames))}
+    # The old index is left as it was
+    assert_same_index(old, index_zip(str(tmp_path / 'v1.zip')))
+
+def test_load_or_update_index_updates_persisted_index(tmp_path):
+    zip_path = write_zip(tmp_path / 'docs.zip', 1)
+    index_dir = tmp_path / 'docs.index'
+    load_or_update_index(zip_path, index_dir)
+    
+    write_zip(tmp_path / 'docs.zip', 2)
+    updated = load_or_update_index(zip_path, index_dir)
+    
+    expected = create_search_index(extract_md_files(zip_path))
+    assert_same_index(updated, expected)
+    # The update was saved: the next start loads it as is
+    assert_same_index(load_or_update_index(zip_path, index_dir), expected)
+
+def test_saved_index_is_memory_mapped(tmp_path):
+    index = index_zip(write_zip(tmp_path / 'docs.zip', 1))
+    index.save(tmp_path / 'docs.index')
+    
+    loaded = SearchIndex.load(tmp_path / 'docs.index')
+    
+    assert isinstance(loaded.store.offsets, np.memmap)
+    assert isinstance(loaded.store.data, np.memmap)
+    assert [loaded.store.get(i) for i in range(len(loaded.store))] == \
+        [index.store.get(i) for i in range(len(index.store))]
+    assert result_tuples(loaded) == result_tuples(index)
+    # Growing a loaded store copies it first
+    loaded.store.append("# New\n")
+    assert loaded.store.get(len(loaded.store) - 1) == "# New\n"
+
+def test_parallel_build_matches_serial():
+    words = ['server', 'deploy', 'token', 'package', 'tools', 'install', 'proxy', 'docker', 'resource']
+    documents = [
+        {
+            'filename': f'docs/page{i}.md',
+            'content': f"# Page {i}\n\n" + ' '.join(words[(i * j) % len(words)] for j in range(5 + i % 7))
+                       + f"\n\n## Section {i}\n\n" + ' '.join(words[(i + j) % len(words)] for j in range(i % 11)),
+        }
+        for i in range(3 * SHARD_SIZE + 5)
+    ]
+    items = [(document, [document['filename'], i, len(document['content'])]) for i, document in enumerate(documents)]
+    
+    serial = build_index(items)
+    parallel = build_index(items, workers=2)
+    
+    assert_same_index(parallel, serial)
+    assert parallel.members == serial.members
+    for name, field in serial.fields.items():
+        assert (parallel.fields[name].counts != field.counts).nnz == 0
+    assert [parallel.store.get(i) for i in range(len(documents))] == [d['content'] for d in documents]
+
+@pytest.mark.parametrize('num_results', [0, -1])
+def test_no_results_requested(tmp_path, num_results):
+    # num_results=0 used to loop forever in top_passages()
+    index = index_zip(write_zip(tmp_path / 'docs.zip', 1))
+    assert search(index, 'deploy', num_results) == []
+    assert search_many(index, ['deploy', 'install'], num_results) == [[], []]
+    assert index.search('deploy', num_results=num_results) == []
+    assert index.top_passages(np.arange(3), np.ones(3), num_results) == []
+    
+    embedder = LsaEmbedder(dim=4)
+    vectors = VectorIndex(embedder, embedder.fit(index).astype(np.float16))
+    assert vectors.search_many(index, ['deploy'], num_results) == [[]]
+    assert index.with_vectors(vectors).search('deploy', num_results=num_results) == []
+    assert len(search(index, 'deploy', 1)) == 1
+
+def passage_texts(content, max_chars=2000):
+    passages = split_passages({'filename': 'doc.md', 'content': content}, max_chars=max_chars)
+    return [(p['id'], p['heading'], content[p['start']:p['end']]) for p in passages]
+
+def test_headings_start_passages_outside_code_fences():
+    body = 'x' * MIN_PASSAGE_CHARS
+    content = (f"Intro {body}\n# Setup\n{body}\n```bash\n# not a heading\n```\n"
+               f"## Run it ##\n{body}\n# Setup\n{body}\n")
+    
+    passages = passage_texts(content)
+    assert [(passage_id, heading) for passage_id, heading, _ in passages] == [
+        ('doc.md', ''), ('doc.md#setup', 'Setup'), ('doc.md#run-it', 'Run it'), ('doc.md#setup-2', 'Setup')]
+    assert '# not a heading' in passages[1][2]
+    # Passages cover the whole document, in order
+    assert ''.join(text for _, _, text in passages) == content
+
+def test_short_sections_merge_into_the_next():
+    body = 'x' * MIN_PASSAGE_CHARS
+    content = f"# Guide\n\n## Install\nshort\n## Usage\n{body}\n## Next\n{body}\n"
+    
+    passages = passage_texts(content)
+    assert [(passage_id, heading) for passage_id, heading, _ in passages] == [('doc.md#guide', 'Guide'), ('doc.md#next', 'Next')]
+    assert '## Usage' in passages[0][2]
+
+def test_long_sections_split_at_paragraph_breaks():
+    paragraph = 'word ' * 20
+    content = '# Long\n\n' + '\n\n'.join([paragraph] * 6)
+    
+    passages = passage_texts(content, max_chars=250)
+    assert [passage_id for passage_id, _, _ in passages] == ['doc.md#long', 'doc.md#long:2', 'doc.md#long:3']
+    assert all(len(text) <= 250 for _, _, text in passages)
+    assert all(text.endswith('\n\n') for _, _, text in passages[:-1])
+    assert ''.join(text for _, _, text in passages) == content
+
+def test_snippet_highlights_the_densest_window():
+    text = 'Intro about servers. ' * 20 + 'Deploy the server with a token and deploy again. ' + 'Filler text. ' * 20
+    
+    snippet = highlight_snippet(text, 'deploy token', width=80)
+    assert snippet.startswith('...') and snippet.endswith('...')
+    assert '**Deploy** the server with a **token** and **deploy**' in snippet
+    assert highlight_snippet('Line one\n\nline   two', 'two') == 'Line one line **two**'
+    assert highlight_snippet('No match here', 'zzz') == 'No match here'
@@ -0,0 +1,59 @@
+"""SearchCache keys: only queries that rank the same share cached results."""
+
+from embeddings import LsaEmbedder, VectorIndex
+from search import index_zip, search
+from search_cache import SearchCache, normalize_query
+from test_search import write_zip
+
+def result_tuples(results):
+    return [(result['id'], result['score'], result['snippet']) for result in results]
+
+def test_reworded_query_is_a_hit_with_the_same_results(tmp_path):
+    index = index_zip(write_zip(tmp_path / 'docs.zip', 1))
+    cache = SearchCache()
+    
+    first = cache.search(index, 'deploy server')
+    second = cache.search(index, 'Server, DEPLOY!')
+    
+    assert cache.counters == {'hits': 1, 'misses': 1, 'evictions': 0}
+    assert result_tuples(first) == result_tuples(second)
+    assert result_tuples(second) == result_tuples(search(index, 'Server, DEPLOY!'))
+
+def test_stop_words_are_part_of_the_key(tmp_path):
+    index = index_zip(write_zip(tmp_path / 'docs.zip', 1))
+    cache = SearchCache()
+    
+    for query in ('the server', 'server'):
+        assert result_tuples(cache.search(index, query)) == result_tuples(search(index, query))
+    assert cache.counters['misses'] == 2
+
+def test_hybrid_search_matches_uncached(tmp_path):
+    lexical = index_zip(write_zip(tmp_path / 'docs.zip', 1))
+    embedder = LsaEmbedder(dim=4)
+    index = lexical.with_vectors(VectorIndex(embedder, embedder.fit(lexical)))
+    cache = SearchCache()
+    
+    for query in ('token for authentication', 'Authentication token for'):
+        assert result_tuples(cache.search(index, query)) == result_tuples(search(index, query))
+    assert cache.counters['hits'] == 1
+
+def test_text_embedders_only_ignore_whitespace():
+    assert normalize_query('  Deploy   the server ', terms_only=False) == 'Deploy the server'
+    assert normalize_query('server deploy', terms_only=False) != normalize_query('deploy server', terms_only=False)
+    assert normalize_query('Deploy the server?') == 'deploy server the'
+
+def test_lru_eviction_and_new_index_version(tmp_path):
+    path = write_zip(tmp_path / 'docs.zip', 1)
+    index = index_zip(path)
+    cache = SearchCache(max_entries=2)
+    
+    for query in ('deploy', 'install', 'token'):
+        cache.search(index, query)
+    assert cache.stats()['entries'] == 2
+    assert cache.counters['evictions'] == 1
+    
+    cache.search(index, 'token')
+    assert cache.counters['hits'] == 1
+    # A rebuilt index has a new version, so nothing cached for the old one is served
+    cache.search(index_zip(path), 'token')
+    assert cache.counters['misses'] == 4
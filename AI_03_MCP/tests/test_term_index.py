@@ -0,0 +1,54 @@
+"""TermIndex expansion of unknown query terms, and its effect on search."""
+
+import numpy as np
+
+from search import index_zip, search
+from term_index import EDIT_PENALTY, PREFIX_PENALTY, TermIndex, edit_distance
+from test_search import QUERIES, write_zip
+
+def make_term_index(frequencies: dict[str, int]) -> TermIndex:
+    terms = sorted(frequencies)
+    return TermIndex(terms, np.array([frequencies[term] for term in terms]))
+
+def test_edit_distance_counts_swaps_as_one_edit():
+    assert edit_distance('server', 'sevrer', 2) == 1
+    assert edit_distance('server', 'servers', 2) == 1
+    assert edit_distance('server', 'svr', 2) == 3
+    assert edit_distance('deploy', 'deploy', 1) == 0
+
+def test_typo_and_prefix_matches():
+    index = make_term_index({'server': 5, 'serve': 2, 'service': 9, 'deploy': 3, 'deployment': 1, 'authentication': 4})
+    
+    assert index.close_matches('servr') == {'server': 1, 'serve': 1}
+    assert index.close_matches('authenticaton') == {'authentication': 1}
+    assert index.close_matches('athenticationn') == {'authentication': 2}
+    # Short terms get no typo matches, and one edit below MIN_TWO_EDIT_CHARS
+    assert index.close_matches('srv') == {}
+    assert index.close_matches('dploi') == {}
+    assert index.prefix_matches('ser') == ['service', 'server', 'serve']
+    assert index.prefix_matches('se') == []
+    
+    assert index.matches('deplo') == {'deploy': EDIT_PENALTY, 'deployment': PREFIX_PENALTY}
+    assert 'server' in index and 'servr' not in index
+
+def test_expand_keeps_known_terms_and_weights_expansions():
+    index = make_term_index({'server': 5, 'deploy': 3, 'deployment': 1})
+    
+    assert index.expand(['server', 'server', 'deploy']) == {'server': 2, 'deploy': 1}
+    assert index.expand(['servre', 'xyzzy']) == {'server': EDIT_PENALTY}
+
+def test_known_terms_rank_as_without_expansion(tmp_path):
+    index = index_zip(write_zip(tmp_path / 'docs.zip', 1))
+    
+    for query in QUERIES[:-1]:
+        assert index.query_terms(query) == index.query_terms(query, expand=False)
+        expanded = [(r.id, r.score) for r in index.search(query)]
+        exact = [(r.id, r.score) for r in index.search(query, expand=False)]
+        assert expanded and expanded == exact
+
+def test_typos_and_prefixes_find_passages(tmp_path):
+    index = index_zip(write_zip(tmp_path / 'docs.zip', 1))
+    
+    assert search(index, 'deplyo')[0]['id'] == 'docs/deploy.mdx#deploy'
+    assert search(index, 'authentic')[0]['id'] == 'docs/deploy.mdx#deploy'
+    assert index.search('deplyo', expand=False) == []
@@ -0,0 +1,22 @@
+"""WordCounter: whole-word, case-insensitive counts over chunked text."""
+
+from wordcount import WordCounter
+
+def test_case_duplicates_are_merged():
+    counter = WordCounter(['Data', 'data', 'DATA', 'club', ''])
+    assert counter.words == ['Data', 'club']
+    assert counter.count('data Data DATA club') == {'Data': 3, 'club': 1}
+
+def test_whole_words_and_longest_phrase():
+    counter = WordCounter(['data', 'data club', 'c++'])
+    text = 'DataTalks data club, data! c++ and abc++ metadata'
+    assert counter.count(text) == {'data': 1, 'data club': 1, 'c++': 1}
+
+def test_matches_split_across_chunks():
+    counter = WordCounter(['data club', 'data'])
+    text = 'the data club meets; data is shared; data club again'
+    expected = counter.count(text)
+    assert expected == {'data club': 2, 'data': 1}
+    for size in range(1, len(text) + 1):
+        chunks = [text[i:i + size] for i in range(0, len(text), size)]
+        assert counter.count_chunks(chunks) == expected
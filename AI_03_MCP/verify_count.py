@@ -1,18 +1,12 @@
-import requests
+import asyncio
 import re
-
-def get_page_markdown(url: str) -> str:
-    """Get content of any webpage in markdown format using Jina reader."""
-    jina_url = f"https://r.jina.ai/{url}"
-    response = requests.get(jina_url)
-    response.raise_for_status()
-    return response.text
+from fetch import fetch_page_markdown
 
 if __name__ == "__main__":
     url = "https://datatalks.club/"
     print(f"Fetching content from: {url}\n")
     
-    content = get_page_markdown(url)
+    content = asyncio.run(fetch_page_markdown(url))
     
     # Find all matches with context
     pattern = r'\b(data)\b'
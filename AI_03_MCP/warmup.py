@@ -0,0 +1,103 @@
+import asyncio
+import sys
+import threading
+from concurrent.futures import Future
+from typing import Callable, Generic, TypeVar
+
+T = TypeVar('T')
+
+class WarmingUp(Exception):
+    """Raised when a background resource is not ready within the timeout."""
+    
+    def __init__(self, name: str):
+        super().__init__(f"The {name} is still warming up, please try again in a few seconds")
+        self.name = name
+
+class BackgroundResource(Generic[T]):
+    """
+    Heavy state (e.g. a search index) built on a background thread.
+    
+    The server can start answering requests right away; tools that need the
+    resource wait for it with a timeout instead of blocking server startup.
+    
+    Example:
+        doc_index = BackgroundResource("documentation index", build_index)
+        doc_index.start()
+        ...
+        index = await doc_index.wait(timeout=10)
+    """
+    
+    def __init__(self, name: str, factory: Callable[[], T]):
+        """
+        Args:
+            name: Human-readable name, used in log and error messages
+            factory: Zero-argument callable that builds the resource
+        """
+        self.name = name
+        self._factory = factory
+        self._future: Future = Future()
+        self._lock = threading.Lock()
+        self._started = False
+    
+    def start(self) -> 'BackgroundResource[T]':
+        """Start building the resource on a daemon thread (idempotent)."""
+        with self._lock:
+            if self._started:
+                return self
+            self._started = True
+        
+        thread = threading.Thread(target=self._build, name=f"warmup-{self.name}", daemon=True)
+        thread.start()
+        return self
+    
+    def _build(self) -> None:
+        print(f"Loading {self.name}...", file=sys.stderr)
+        try:
+            value = self._factory()
+        except BaseException as e:
+            print(f"✗ Failed to load {self.name}: {e}", file=sys.stderr)
+            self._future.set_exception(e)
+        else:
+            print(f"✓ Loaded {self.name}", file=sys.stderr)
+            self._future.set_result(value)
+    
+    @property
+    def ready(self) -> bool:
+        """True once the resource has been built (or failed to build)."""
+        return self._future.done()
+    
+    def get(self, timeout: float | None = None) -> T:
+        """
+        Block until the resource is ready, starting the build if needed.
+        
+        Args:
+            timeout: Seconds to wait (None waits forever)
+        
+        Returns:
+            The built resource
+        
+        Raises:
+            WarmingUp: If the resource is not ready within the timeout
+        """
+        self.start()
+        try:
+            return self._future.result(timeout=timeout)
+        except TimeoutError:
+            raise WarmingUp(self.name) from None
+    
+    async def wait(self, timeout: float | None = None) -> T:
+        """
+        Async version of get() that does not block the event loop.
+        
+        Raises:
+            WarmingUp: If the resource is not ready within the timeout
+        """
+        self.start()
+        if self._future.done():
+            return self._future.result()
+        # shield() so a timeout cancels only this wait, not the build
+        waiter = asyncio.shield(asyncio.wrap_future(self._future))
+        try:
+            return await asyncio.wait_for(waiter, timeout)
+        except TimeoutError:
+            raise WarmingUp(self.name) from None
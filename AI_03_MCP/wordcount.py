@@ -0,0 +1,95 @@
+import re
+from collections import Counter
+from typing import AsyncIterable, Iterable
+
+class WordCounter:
+    """
+    Counts whole-word, case-insensitive occurrences of many words at once.
+    
+    All words are compiled into one escaped alternation, so each document
+    is scanned a single time no matter how many words are counted. Text can
+    be fed in chunks (e.g. straight from an HTTP response) without holding
+    the whole document in memory.
+    
+    Overlapping phrases are counted once, preferring the longest one
+    (with words "data" and "data club", "data club" counts only as the latter).
+    """
+    
+    def __init__(self, words: Iterable[str]):
+        """
+        Args:
+            words: Words (or phrases) to count; duplicates differing only in case
+                are merged, keeping the first spelling
+        """
+        spellings = {}
+        for word in words:
+            if word:
+                spellings.setdefault(word.lower(), word)
+        self.words = list(spellings.values())
+        keys = sorted({word.lower() for word in self.words}, key=len, reverse=True)
+        self.longest = len(keys[0]) if keys else 0
+        
+        # Lookarounds instead of \b so words starting or ending with
+        # punctuation (e.g. "c++") still need a non-word character around them
+        alternation = '|'.join(re.escape(key) for key in keys)
+        self.pattern = re.compile(rf'(?<!\w)(?:{alternation})(?!\w)', re.IGNORECASE) if keys else None
+    
+    def count(self, text: str) -> dict[str, int]:
+        """Count the words in a complete text."""
+        return self.count_chunks([text])
+    
+    def count_chunks(self, chunks: Iterable[str]) -> dict[str, int]:
+        """Count the words in text arriving as a sequence of chunks."""
+        scan = WordScan(self)
+        for chunk in chunks:
+            scan.feed(chunk)
+        return scan.finish()
+    
+    async def count_stream(self, chunks: AsyncIterable[str]) -> dict[str, int]:
+        """Count the words in text arriving as an async stream of chunks."""
+        scan = WordScan(self)
+        async for chunk in chunks:
+            scan.feed(chunk)
+        return scan.finish()
+
+class WordScan:
+    """Incremental scan state for one document."""
+    
+    def __init__(self, counter: WordCounter):
+        self.counter = counter
+        self.matches = Counter()
+        self._buffer = ''
+        self._pos = 0
+    
+    def feed(self, chunk: str) -> None:
+        """Scan a chunk, keeping back just enough text to finish a match split across chunks."""
+        pattern = self.counter.pattern
+        if pattern is None:
+            return
+        
+        buffer = self._buffer + chunk
+        # A match starting before `limit` is decided: the longest word and
+        # the character after it (needed for the lookahead) are all here
+        limit = len(buffer) - self.counter.longest
+        pos = self._pos
+        for match in pattern.finditer(buffer, pos):
+            if match.start() >= limit:
+                break
+            self.matches[match.group().lower()] += 1
+            pos = match.end()
+        
+        # Keep one character before the resume point for the lookbehind
+        resume = max(pos, limit)
+        keep_from = max(resume - 1, 0)
+        self._buffer = buffer[keep_from:]
+        self._pos = resume - keep_from
+    
+    def finish(self) -> dict[str, int]:
+        """Scan whatever is left and return counts keyed by the original words."""
+        pattern = self.counter.pattern
+        if pattern is not None:
+            for match in pattern.finditer(self._buffer, self._pos):
+                self.matches[match.group().lower()] += 1
+            self._buffer = ''
+            self._pos = 0
+        return {word: self.matches[word.lower()] for word in self.counter.words}